@@ -0,0 +1,288 @@
+"""Headless microbenchmarks for the audio hot paths of the conversation system.
+
+Runs on synthetic audio only (no microphone, speaker or network) and reports
+ns/sample, allocated memory blocks per iteration and peak traced memory for:
+
+- AudioProcessor.process_audio at several block sizes
+- reset() / get_interrupt_audio() buffer materialization
+- base64 encode / decode of pcm16 chunks
+- pre-upload DC removal and silence trimming
+- JSON event serialization in send_audio
+
+Usage:
+    python audio_benchmarks.py                      # run and compare to baseline
+    python audio_benchmarks.py --save-baseline      # store results as the new baseline
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from realtime_agent.audio import AudioProcessor, decode_audio_delta
+from realtime_agent.audio_backends import NullBackend
+from realtime_agent.audio_conditioning import condition_utterance
+from realtime_agent.conversation import ConversationSystem
+
+SAMPLE_RATE = 24000
+BLOCK_SIZES = (480, 1200, 2400, 4800)
+UTTERANCE_SECONDS = 5
+DEFAULT_BASELINE = "benchmarks_baseline.json"
+# Allocated-block counts move by a few blocks between runs on their own
+ALLOC_BLOCK_SLACK = 16
+MEMORY_PASSES = 3
+
+
+def synthetic_speech(num_samples, seed=0):
+    """Noise bursts well above the VAD threshold, as pcm16"""
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(num_samples) * 3000).astype(np.int16)
+
+
+def synthetic_silence(num_samples, seed=1):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(num_samples) * 20).astype(np.int16)
+
+
+def as_blocks(samples, block_size):
+    """Split into (block_size, 1) arrays, the shape sounddevice hands to callbacks"""
+    usable = len(samples) - len(samples) % block_size
+    return [block.reshape(-1, 1) for block in np.split(samples[:usable], usable // block_size)]
+
+
+class NullWebSocket:
+    """Accepts frames and discards them, counting the bytes sent"""
+    def __init__(self):
+        self.bytes_sent = 0
+
+    async def send(self, message):
+        self.bytes_sent += len(message)
+
+
+def measure(run_once, samples_per_iter, iterations, setup=None):
+    """Time run_once() and collect memory statistics in a separate pass.
+
+    Timing and allocation tracking are done separately because tracemalloc
+    slows allocation-heavy code down considerably.
+    """
+    timings = []
+    for _ in range(iterations):
+        state = setup() if setup else None
+        gc.disable()
+        start = time.perf_counter_ns()
+        run_once(state)
+        timings.append(time.perf_counter_ns() - start)
+        gc.enable()
+
+    # Allocation counts pick up stray interpreter allocations; the smallest
+    # of a few passes is the code's own
+    memory = []
+    for _ in range(MEMORY_PASSES):
+        state = setup() if setup else None
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run_once(state)
+        traced_after, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks_after = sys.getallocatedblocks()
+        memory.append((blocks_after - blocks_before, traced_after - traced_before,
+                       traced_peak - traced_before))
+    blocks, retained, peak = min(memory)
+
+    best = min(timings)
+    return {
+        "ns_per_sample": best / samples_per_iter,
+        "ms_per_iter": best / 1e6,
+        "alloc_blocks_per_iter": blocks,
+        "retained_bytes_per_iter": retained,
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_process_audio(block_size, iterations):
+    """One utterance (speech followed by trailing silence) fed block by block"""
+    speech = synthetic_speech(UTTERANCE_SECONDS * SAMPLE_RATE)
+    silence = synthetic_silence(SAMPLE_RATE)
+    blocks = as_blocks(np.concatenate([speech, silence]), block_size)
+    total = sum(len(b) for b in blocks)
+
+    def run_once(processor):
+        for block in blocks:
+            processor.process_audio(block)
+
+    result = measure(run_once, total, iterations, setup=AudioProcessor)
+    result["alloc_blocks_per_block"] = result["alloc_blocks_per_iter"] / len(blocks)
+    return result
+
+
+def bench_reset(iterations):
+    """Materialize a full utterance buffer into bytes"""
+    blocks = as_blocks(synthetic_speech(UTTERANCE_SECONDS * SAMPLE_RATE), 4800)
+
+    def setup():
+        processor = AudioProcessor()
+        for block in blocks:
+            processor.process_audio(block)
+        return processor
+
+    return measure(lambda p: p.reset(), UTTERANCE_SECONDS * SAMPLE_RATE, iterations, setup)
+
+
+def bench_get_interrupt_audio(iterations):
+    """Materialize two seconds of barge-in audio collected while the agent speaks"""
+    blocks = as_blocks(synthetic_speech(2 * SAMPLE_RATE), 4800)
+
+    def setup():
+        processor = AudioProcessor()
+        processor.is_speaking = True
+        for block in blocks:
+            processor.process_audio(block)
+        return processor
+
+    return measure(lambda p: p.get_interrupt_audio(), 2 * SAMPLE_RATE, iterations, setup)
+
+
+def bench_base64_encode(iterations):
+    pcm = synthetic_speech(UTTERANCE_SECONDS * SAMPLE_RATE).tobytes()
+    return measure(lambda _: base64.b64encode(pcm).decode('utf-8'),
+                   UTTERANCE_SECONDS * SAMPLE_RATE, iterations)
+
+
+def bench_base64_decode(iterations):
+    """Decode a batch of response.audio.delta payloads the way handle_response does"""
+    delta_samples = 2400
+    deltas = [base64.b64encode(synthetic_speech(delta_samples, seed=i).tobytes()).decode('utf-8')
+              for i in range(50)]
+
+    def run_once(_):
+        for delta in deltas:
+            decode_audio_delta(delta)
+
+    return measure(run_once, delta_samples * len(deltas), iterations)
+
+
+def bench_condition_utterance(iterations):
+    """DC removal and silence trimming of one utterance as captured by the VAD"""
+    silence = synthetic_silence(SAMPLE_RATE // 2)
+    pcm = np.concatenate([silence, synthetic_speech(UTTERANCE_SECONDS * SAMPLE_RATE),
+                          silence]).tobytes()
+    return measure(lambda _: condition_utterance(pcm, SAMPLE_RATE, 0.015),
+                   len(pcm) // 2, iterations)
+
+
+def bench_send_audio(iterations):
+    """base64 + JSON serialization of one utterance through send_audio"""
+    system = ConversationSystem(url="ws://benchmark.invalid", audio_backend=NullBackend())
+    system.tracer.enabled = False
+    system.upload_conditioner.enabled = False  # measured separately
+    pcm = synthetic_speech(UTTERANCE_SECONDS * SAMPLE_RATE).tobytes()
+    loop = asyncio.new_event_loop()
+    websocket = NullWebSocket()
+
+    def run_once(_):
+        loop.run_until_complete(system.send_audio(websocket, pcm))
+
+    try:
+        return measure(run_once, UTTERANCE_SECONDS * SAMPLE_RATE, iterations)
+    finally:
+        loop.close()
+
+
+def run_all(iterations):
+    results = {}
+    for block_size in BLOCK_SIZES:
+        results[f"process_audio[block={block_size}]"] = bench_process_audio(block_size, iterations)
+    results["reset"] = bench_reset(iterations)
+    results["get_interrupt_audio"] = bench_get_interrupt_audio(iterations)
+    results["base64_encode"] = bench_base64_encode(iterations)
+    results["base64_decode"] = bench_base64_decode(iterations)
+    results["condition_utterance"] = bench_condition_utterance(iterations)
+    results["send_audio_json"] = bench_send_audio(iterations)
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'benchmark':<30}{'ns/sample':>12}{'baseline':>12}{'blocks/iter':>14}"
+          f"{'baseline':>12}{'peak KiB':>12}")
+    for name, stats in results.items():
+        base = baseline.get(name, {}) if baseline else {}
+        base_ns = base.get("ns_per_sample")
+        base_blocks = base.get("alloc_blocks_per_iter")
+        print(f"{name:<30}{stats['ns_per_sample']:>12.2f}"
+              f"{'-' if base_ns is None else f'{base_ns:.2f}':>12}"
+              f"{stats['alloc_blocks_per_iter']:>14}"
+              f"{'-' if base_blocks is None else base_blocks:>12}{stats['peak_kib']:>12.1f}")
+
+
+def compare(results, baseline, tolerance, alloc_tolerance):
+    """Return (name, unit, before, after) for the benchmarks that got slower,
+    or allocate more blocks per iteration, than baseline beyond the tolerances"""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["ns_per_sample"]
+        after = stats["ns_per_sample"]
+        if before > 0 and after > before * (1 + tolerance):
+            regressions.append((name, "ns/sample", before, after))
+        before = baseline[name]["alloc_blocks_per_iter"]
+        after = stats["alloc_blocks_per_iter"]
+        if after > max(before, 0) * (1 + alloc_tolerance) + ALLOC_BLOCK_SLACK:
+            regressions.append((name, "blocks/iter", before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audio hot path microbenchmarks")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON file to compare against or save to")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="allowed slowdown in ns/sample before failing (0.20 = 20%%)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.10,
+                        help="allowed growth in allocated blocks per iteration, on top of "
+                             f"{ALLOC_BLOCK_SLACK} blocks of noise (0.10 = 10%%)")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.iterations)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+    for name, unit, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} {unit}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
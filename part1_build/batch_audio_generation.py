@@ -0,0 +1,227 @@
+"""Batch audio generation over a bounded pool of concurrent Realtime sessions.
+
+Runs the same flow as p1uc1_audio_generation_lost_robot.py (session.update ->
+conversation.item.create -> response.create -> stream audio deltas) for every
+entry in a prompts file and saves each result to its own WAV.
+
+The prompts file is either JSON lines:
+    {"id": "ivr_main_menu", "instructions": "You are an IVR voice...", "prompt": "Read the main menu."}
+or plain text with one prompt per line (used with --instructions). An optional
+"priority" (lower first, default 10) orders prompts when quotas are set with
+REALTIME_MAX_SESSIONS / REALTIME_RPM / REALTIME_TPM (see realtime_agent.admission).
+
+    python batch_audio_generation.py prompts.jsonl --out-dir audio_responses --concurrency 8
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+
+import websockets
+from dotenv import load_dotenv
+
+from realtime_agent.admission import PRIORITY_CALL, AdmissionScheduler
+from realtime_agent.wav_writer import StreamingWavWriter
+
+SAMPLE_RATE = 24000
+RESPONSE_TOKEN_ESTIMATE = 300
+DEFAULT_INSTRUCTIONS = "Read the user's text aloud clearly and naturally. Do not add anything."
+
+
+def default_url():
+    load_dotenv()
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("AZURE_OPENAI_API_KEY not found in .env file")
+    return (
+        "wss://aoai-ep-swedencentral02.openai.azure.com/openai/realtime?"
+        f"api-version=2024-10-01-preview&deployment=gpt-4o-realtime-preview&"
+        f"api-key={api_key}"
+    )
+
+
+def load_jobs(path, instructions):
+    """Read prompts as dicts with id, instructions and prompt"""
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+            else:
+                entry = {"prompt": line}
+            entry.setdefault("id", f"prompt_{line_number:05d}")
+            entry.setdefault("instructions", instructions)
+            # ids become file names
+            entry["id"] = re.sub(r"[^A-Za-z0-9_.-]", "_", str(entry["id"]))
+            jobs.append(entry)
+    return jobs
+
+
+async def generate(url, job, wav_path, voice, timeout, scheduler=None):
+    """Generate one prompt into wav_path and return the seconds of audio written"""
+    admission = (scheduler.call(job.get("priority", PRIORITY_CALL)) if scheduler
+                 else contextlib.nullcontext())
+    async with admission, websockets.connect(url, open_timeout=30, max_size=None) as ws:
+        await ws.send(json.dumps({
+            "type": "session.update",
+            "session": {
+                "voice": voice,
+                "instructions": job["instructions"],
+                "modalities": ["audio", "text"],
+                "input_audio_format": "pcm16",
+                "output_audio_format": "pcm16",
+            }
+        }))
+        while True:
+            data = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            if data.get("type") == "session.created":
+                break
+            if data.get("type") == "error":
+                raise RuntimeError(f"Session setup failed: {data}")
+
+        await ws.send(json.dumps({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_text", "text": job["prompt"]}]
+            }
+        }))
+        # Rough estimate: prompt text (~4 characters per token) plus the reply
+        estimate = len(job["prompt"]) // 4 + RESPONSE_TOKEN_ESTIMATE
+        if scheduler:
+            await scheduler.admit_response(estimate)
+        await ws.send(json.dumps({
+            "type": "response.create",
+            "response": {"modalities": ["audio", "text"]}
+        }))
+
+        with StreamingWavWriter(wav_path, sample_rate=SAMPLE_RATE) as writer:
+            while True:
+                data = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                if scheduler:
+                    scheduler.on_server_event(data)
+                if data["type"] == "response.audio.delta":
+                    audio_data = data.get("delta", "").strip()
+                    padding = -len(audio_data) % 4
+                    if padding:
+                        audio_data += "=" * padding
+                    writer.write(base64.b64decode(audio_data))
+                elif data["type"] == "response.done":
+                    if scheduler:
+                        usage = data.get("response", {}).get("usage", {})
+                        scheduler.record_usage(estimate, usage.get("total_tokens"))
+                    status = data.get("response", {}).get("status", "completed")
+                    if status != "completed":
+                        raise RuntimeError(f"Response ended with status {status}")
+                    break
+                elif data["type"] == "error":
+                    raise RuntimeError(f"Error response received: {data}")
+        if writer.error:
+            raise writer.error
+        return writer.frames_written / SAMPLE_RATE
+
+
+async def worker(name, queue, results, args, url, scheduler):
+    while True:
+        _, _, job = await queue.get()
+        try:
+            final_path = os.path.join(args.out_dir, f"{job['id']}.wav")
+            partial_path = final_path + ".partial"
+            for attempt in range(1, args.retries + 2):
+                started = time.monotonic()
+                try:
+                    seconds = await generate(url, job, partial_path, args.voice, args.timeout,
+                                             scheduler)
+                    os.replace(partial_path, final_path)
+                    results.append({"id": job["id"], "ok": True, "audio_seconds": seconds,
+                                    "wall_seconds": time.monotonic() - started,
+                                    "attempts": attempt})
+                    print(f"[{name}] {job['id']}: {seconds:.1f}s of audio")
+                    break
+                except Exception as e:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    if attempt > args.retries:
+                        results.append({"id": job["id"], "ok": False, "error": str(e),
+                                        "attempts": attempt})
+                        print(f"[{name}] {job['id']}: failed after {attempt} attempts: {e}")
+                        break
+                    backoff = args.backoff * 2 ** (attempt - 1)
+                    print(f"[{name}] {job['id']}: attempt {attempt} failed ({e}), "
+                          f"retrying in {backoff:.1f}s")
+                    await asyncio.sleep(backoff)
+        finally:
+            queue.task_done()
+
+
+async def run_batch(args):
+    url = args.url or default_url()
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = load_jobs(args.prompts, args.instructions)
+    if args.skip_existing:
+        jobs = [job for job in jobs
+                if not os.path.exists(os.path.join(args.out_dir, f"{job['id']}.wav"))]
+    print(f"Generating {len(jobs)} prompts with {args.concurrency} concurrent sessions")
+
+    # Lower priority values are generated first
+    queue = asyncio.PriorityQueue()
+    for index, job in enumerate(jobs):
+        queue.put_nowait((job.get("priority", PRIORITY_CALL), index, job))
+    scheduler = AdmissionScheduler.from_env()
+    results = []
+    started = time.monotonic()
+    workers = [asyncio.create_task(worker(f"w{i}", queue, results, args, url, scheduler))
+               for i in range(min(args.concurrency, len(jobs)))]
+    await queue.join()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    wall = time.monotonic() - started
+
+    succeeded = [r for r in results if r["ok"]]
+    audio_seconds = sum(r["audio_seconds"] for r in succeeded)
+    print("\n=== Batch report ===")
+    print(f"Succeeded: {len(succeeded)}/{len(results)}")
+    print(f"Audio generated: {audio_seconds:.1f}s in {wall:.1f}s wall time")
+    if wall > 0:
+        print(f"Throughput: {audio_seconds / wall:.2f} audio-seconds per wall-second")
+    if scheduler:
+        print(scheduler.log_line())
+    if args.report:
+        with open(args.report, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    return 0 if len(succeeded) == len(results) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch audio generation")
+    parser.add_argument("prompts", help="JSON lines or plain text file of prompts")
+    parser.add_argument("--out-dir", default="audio_responses")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--backoff", type=float, default=2.0, help="initial retry delay in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="seconds to wait for any single server event")
+    parser.add_argument("--voice", default="alloy")
+    parser.add_argument("--instructions", default=DEFAULT_INSTRUCTIONS,
+                        help="instructions for prompts that do not set their own")
+    parser.add_argument("--url", help="override the Realtime endpoint (e.g. a mock server)")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="skip prompts whose WAV already exists")
+    parser.add_argument("--report", help="write per-prompt results as JSON lines")
+    args = parser.parse_args(argv)
+    return asyncio.run(run_batch(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Hand a live call back and forth between two workers and time it.
+
+A scripted caller (see vad_comparison.py) talks to a conversation system
+against mock_realtime_server.py. After ``--turns`` turns it starts another
+utterance and, halfway through, the call is handed off: the running system
+stops at the next turn boundary and returns a CallSnapshot, which is
+serialized to bytes, parsed again and resumed by a fresh system on a new
+Realtime session with the conversation replayed. The caller keeps talking to
+the new system, so the interrupted utterance must still be answered.
+
+Reported per handoff: snapshot size, capture and serialization time, the
+time until the new session has replayed the context, and the latency of the
+turn that spanned the handoff.
+
+    python handoff_test.py --handoffs 5 --turns 2
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+os.environ["CALL_HANDOFF"] = "1"
+
+from load_test import start_server  # noqa: E402
+from realtime_agent.call_migration import CallSnapshot  # noqa: E402
+from realtime_agent.loop_lag import LoopLagMonitor  # noqa: E402
+from realtime_agent.personas import PERSONAS, create_system  # noqa: E402
+from vad_comparison import ScriptedCaller, TimedBackend  # noqa: E402
+
+
+def new_worker(args, url):
+    return create_system(args.persona, url=url, audio_backend=TimedBackend(),
+                         lag_monitor=LoopLagMonitor(enabled=False))
+
+
+async def hand_off(caller, run_task, args, url):
+    """Move the caller's call to a new system; returns (new run task, stats)"""
+    started = time.perf_counter()
+    snapshot = await caller.system.hand_off()
+    captured = time.perf_counter()
+    data = snapshot.to_bytes()
+    serialized = time.perf_counter()
+
+    target = new_worker(args, url)
+    target.resume_from(CallSnapshot.from_bytes(data))
+    caller.system = target
+    restored = time.perf_counter()
+    await run_task
+    run_task = asyncio.create_task(target.run())
+    while "replay_ms" not in target.startup and not run_task.done():
+        await asyncio.sleep(0.005)
+    ready = time.perf_counter()
+    return run_task, {
+        "bytes": len(data),
+        "items": len(snapshot.state["items"]),
+        "capture_ms": (captured - started) * 1000,
+        "serialize_ms": (serialized - captured) * 1000,
+        "restore_ms": (restored - serialized) * 1000,
+        "handoff_ms": (ready - started) * 1000,
+    }
+
+
+async def run(args):
+    server, url = start_server(argparse.Namespace(speed=1.0,
+                                                  response_seconds=args.response_seconds))
+    results = []
+    caller = ScriptedCaller(new_worker(args, url), seed=args.seed)
+    try:
+        with open(os.devnull, "w") as devnull, \
+                contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+            run_task = asyncio.create_task(caller.system.run())
+            await asyncio.sleep(0.5)
+            for _ in range(10):
+                await caller._block(20)
+            for _ in range(args.handoffs):
+                for _ in range(args.turns):
+                    await caller.turn()
+                await caller._speak(0.6)
+                handoff = asyncio.create_task(hand_off(caller, run_task, args, url))
+                # The caller keeps talking while the call moves
+                while not handoff.done():
+                    await caller._block(3000)
+                run_task, stats = handoff.result()
+                latency = await caller.reply_after(await caller._speak(0.4))
+                stats["turn_ms"] = latency * 1000 if latency is not None else None
+                results.append(stats)
+            run_task.cancel()
+            await asyncio.gather(run_task, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{'handoff':>7} {'bytes':>8} {'items':>5} {'capture':>9} {'serialize':>9} "
+          f"{'restore':>9} {'ready':>9} {'turn':>9}")
+
+    def ms(value):
+        return f"{value:.1f} ms" if value is not None else "-"
+    for number, stats in enumerate(results, 1):
+        print(f"{number:>7} {stats['bytes']:>8} {stats['items']:>5} {ms(stats['capture_ms']):>9} "
+              f"{ms(stats['serialize_ms']):>9} {ms(stats['restore_ms']):>9} "
+              f"{ms(stats['handoff_ms']):>9} {ms(stats['turn_ms']):>9}")
+    if results:
+        print(f"median handoff {statistics.median(r['handoff_ms'] for r in results):.1f} ms, "
+              f"median snapshot {statistics.median(r['bytes'] for r in results):.0f} bytes")
+    missed = sum(1 for r in results if r["turn_ms"] is None)
+    if missed:
+        print(f"{missed} turns spanning a handoff were not answered")
+    return 1 if missed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live call handoff between workers")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="assistant")
+    parser.add_argument("--handoffs", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=2, help="turns between handoffs")
+    parser.add_argument("--response-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Accuracy, latency and CPU cost of the on-host keyword spotter.
+
+Streams synthetic calls in 200 ms capture blocks through KeywordSpotter: a
+mix of other words, pauses and background noise with one command keyword at
+a random point. Each trial reports whether the keyword was heard, which
+block it fired in, and any false alarms. Latency is measured in audio time
+from the end of the keyword to the end of the block that detected it, plus
+the time spent processing that block.
+
+Keywords and distractors are synthesized from vowel formants, hiss
+noise and bursts with random rate, pitch and level, so the run needs no
+recordings; "start" is included as a near miss for "stop". The CPU figures
+carry over to real templates of similar length, but the threshold for real
+speech should be calibrated on recorded calls.
+
+    python keyword_benchmark.py --trials 200
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from realtime_agent.audio import BLOCK_SIZE, SAMPLE_RATE
+from realtime_agent.keyword_spotter import KeywordSpotter
+
+BLOCK_SECONDS = BLOCK_SIZE / SAMPLE_RATE
+
+FORMANTS = {"a": (730, 1090), "e": (530, 1840), "i": (270, 2290), "o": (570, 840),
+            "u": (300, 870), "l": (360, 1300), "n": (250, 1700)}
+# Rough phone sequences: vowels, "f" fricative noise, "b" burst, "_" closure
+WORDS = {
+    "stop": "f_oob", "agent": "ae_enb", "start": "f_aab", "hello": "eel_lu",
+    "okay": "o_bei", "account": "a_binu", "number": "nuub_i", "doctor": "b_ai_ai",
+}
+KEYWORDS = ("stop", "agent")
+
+
+def synthesize(word, rng):
+    """One spoken-ish rendering of ``word`` with random rate, pitch and level"""
+    rate = rng.uniform(0.85, 1.15)
+    f0 = rng.uniform(100, 180)
+    parts = []
+    for phone in WORDS[word]:
+        if phone == "f":
+            # "s"-like hiss: noise differenced twice, so most energy is above 4 kHz
+            noise = rng.standard_normal(int(0.11 * rate * SAMPLE_RATE))
+            parts.append(np.diff(noise, n=2, prepend=[0.0, 0.0]) * 0.15)
+        elif phone == "b":
+            burst = rng.standard_normal(int(0.025 * rate * SAMPLE_RATE))
+            parts.append(burst * np.linspace(1, 0, len(burst)) * 0.5)
+        elif phone == "_":
+            parts.append(np.zeros(int(0.04 * rate * SAMPLE_RATE)))
+        else:
+            t = np.arange(int(0.09 * rate * SAMPLE_RATE)) / SAMPLE_RATE
+            harmonics = np.arange(1, int(4000 / f0)) * f0
+            gains = sum(1.0 / (1.0 + ((harmonics - formant) / 90.0) ** 2)
+                        for formant in FORMANTS[phone])
+            vowel = (gains[:, None] * np.sin(2 * np.pi * harmonics[:, None] * t)).sum(axis=0)
+            parts.append(vowel / np.abs(vowel).max() * np.hanning(len(t)) ** 0.3)
+    audio = np.concatenate(parts)
+    return (audio / np.abs(audio).max() * rng.uniform(0.2, 0.6) * 32767).astype(np.int16)
+
+
+def synthetic_enrollment(rng, per_keyword=3):
+    return {keyword: [synthesize(keyword, rng) for _ in range(per_keyword)]
+            for keyword in KEYWORDS}
+
+
+def trial(spotter, keyword_audio, distractors, rng, noise_level=300):
+    """Stream one call; returns the detections and the keyword's start and end in seconds"""
+    pieces = [np.zeros(int(rng.uniform(0.1, 0.6) * SAMPLE_RATE), dtype=np.int16)]
+    for _ in range(rng.integers(1, 4)):
+        pieces.append(distractors[rng.integers(len(distractors))])
+        pieces.append(np.zeros(int(rng.uniform(0.05, 0.3) * SAMPLE_RATE), dtype=np.int16))
+    keyword_start = sum(len(piece) for piece in pieces)
+    pieces.append(keyword_audio)
+    pieces.append(np.zeros(int(0.6 * SAMPLE_RATE), dtype=np.int16))
+    audio = np.concatenate(pieces).astype(np.float32)
+    # Background noise falling off towards high frequencies, like room and line noise
+    noise = np.convolve(rng.standard_normal(len(audio)), np.ones(4) / 2, mode="same")
+    audio += noise * noise_level
+    audio = np.clip(audio, -32768, 32767).astype(np.int16)
+
+    spotter.reset()
+    detections = []
+    for index, start in enumerate(range(0, len(audio) - BLOCK_SIZE + 1, BLOCK_SIZE)):
+        started = time.perf_counter()
+        heard = spotter.process(audio[start:start + BLOCK_SIZE].reshape(-1, 1))
+        if heard:
+            detections.append((index, heard, time.perf_counter() - started))
+    keyword_end = keyword_start + len(keyword_audio)
+    return detections, keyword_start / SAMPLE_RATE, keyword_end / SAMPLE_RATE
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    spotter = KeywordSpotter.from_samples(synthetic_enrollment(rng), threshold=args.threshold)
+    distractors = [synthesize(word, rng) for word in WORDS if word not in KEYWORDS
+                   for _ in range(3)]
+
+    hits = misses = false_alarms = 0
+    latencies = []
+    for number in range(args.trials):
+        keyword = KEYWORDS[number % len(KEYWORDS)]
+        detections, keyword_start, keyword_end = trial(spotter, synthesize(keyword, rng),
+                                                       distractors, rng)
+        detected = False
+        for index, heard, seconds in detections:
+            block_end = (index + 1) * BLOCK_SECONDS
+            # A match may complete in the block before the keyword's trailing frames
+            # arrive, so count it from halfway through the keyword; a negative
+            # latency means it fired before the keyword ended
+            halfway = (keyword_start + keyword_end) / 2
+            if heard == keyword and halfway <= block_end <= keyword_end + 2 * BLOCK_SECONDS \
+                    and not detected:
+                detected = True
+                latencies.append(block_end - keyword_end + seconds)
+            else:
+                false_alarms += 1
+        hits += detected
+        misses += not detected
+
+    stats = spotter.metrics()
+    blocks = stats["blocks"]
+    mean_block = stats["cpu_seconds"] / blocks
+    print(f"trials {args.trials}: {hits} detected, {misses} missed, {false_alarms} false alarms "
+          f"over {blocks * BLOCK_SECONDS:.0f} s of audio (threshold {args.threshold})")
+    if latencies:
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(f"latency keyword end -> detection: "
+              f"p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+    print(f"CPU per 200 ms block: mean {mean_block * 1000:.2f} ms, "
+          f"p50 {stats['block_p50_ms']:.2f} ms, p99 {stats['block_p99_ms']:.2f} ms -> "
+          f"{mean_block / BLOCK_SECONDS:.2%} of one core per stream while the agent speaks "
+          f"(~{BLOCK_SECONDS / mean_block:.0f} streams per core)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keyword spotter benchmark")
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""Concurrency scaling curve for the conversation systems.
+
+Spawns N virtual callers in one process, each driving its own headless
+conversation against a local MockRealtimeServer (run as a separate process so
+its CPU is not charged to the callers). Callers speak WAV utterances (24 kHz
+mono pcm16) or synthetic speech, pause for a random think time between turns
+and sometimes barge in while the agent is talking. For every N in the sweep
+the report gives p50/p99 turn latency, CPU per call and dropped audio:
+
+- late input blocks: microphone blocks delivered more than one block period
+  late, which a real capture device would have overrun
+- playback underflows: response audio that arrived after the audio queued
+  before it (plus the device buffer) had already finished playing
+
+    python load_test.py --callers 1,2,4,8,16 --duration 30
+    python load_test.py --callers 1,4,16 --wav caller1.wav caller2.wav --output curve.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+from realtime_agent.audio_backends import AudioBackend, NullInputStream, NullOutputStream
+from realtime_agent.latency_tracing import LatencyHistogram
+from realtime_agent.loop_lag import LoopLagMonitor
+from realtime_agent.personas import PERSONAS, create_system
+
+SAMPLE_RATE = 24000
+BLOCK_SIZE = 4800
+BLOCK_SECONDS = BLOCK_SIZE / SAMPLE_RATE
+
+
+def load_utterances(paths):
+    """Read WAV files as int16 arrays; they must be 24 kHz mono pcm16"""
+    utterances = []
+    for path in paths:
+        with wave.open(path, "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise ValueError(f"{path} must be {SAMPLE_RATE} Hz mono 16-bit PCM")
+            utterances.append(np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16))
+    return utterances
+
+
+class PacedOutputStream(NullOutputStream):
+    """Plays written audio against a simulated device clock and counts
+    underflows, i.e. gaps inside a response where the queue ran dry"""
+    def __init__(self, speed, buffer_seconds=0.1):
+        super().__init__()
+        self.speed = speed
+        self.buffer_seconds = buffer_seconds
+        self.play_until = 0.0
+        self.underflows = 0
+        self._response_started = True
+
+    def new_response(self):
+        self._response_started = True
+
+    def write(self, audio):
+        now = time.monotonic()
+        duration = len(audio) / SAMPLE_RATE / self.speed
+        self.samples_written += len(audio)
+        if self._response_started:
+            # First audio of a response: the device buffer fills before playout
+            self._response_started = False
+            self.play_until = now + self.buffer_seconds / self.speed + duration
+            return False
+        underflow = now > self.play_until
+        if underflow:
+            self.underflows += 1
+        self.play_until = max(self.play_until, now) + duration
+        return underflow
+
+
+class LoadTestBackend(AudioBackend):
+    """Caller audio is fed to the callback directly; playback is paced"""
+    name = "load-test"
+
+    def __init__(self, speed, buffer_seconds):
+        self.speed = speed
+        self.buffer_seconds = buffer_seconds
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        return NullInputStream()
+
+    def open_output(self, samplerate, channels):
+        return PacedOutputStream(self.speed, self.buffer_seconds)
+
+
+class VirtualCaller:
+    """Talks to one conversation system: utterance, think time, sometimes a barge-in"""
+    def __init__(self, system, utterances, speed, think_time=(1.0, 4.0), barge_in_rate=0.2,
+                 seed=0):
+        self.system = system
+        self.utterances = utterances
+        self.speed = speed
+        self.think_time = think_time
+        self.barge_in_rate = barge_in_rate
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        self.turns = 0
+        self.barge_ins = 0
+        self.late_blocks = 0
+        self._next_block = None
+
+    def _utterance(self):
+        if self.utterances:
+            return self.random.choice(self.utterances)
+        seconds = self.random.uniform(0.5, 3.0)
+        return (self.rng.standard_normal(int(seconds * SAMPLE_RATE)) * 3000).astype(np.int16)
+
+    def _silence(self, seconds):
+        return (self.rng.standard_normal(int(seconds * SAMPLE_RATE)) * 20).astype(np.int16)
+
+    async def _feed(self, samples):
+        """Deliver samples block by block at the capture rate"""
+        period = BLOCK_SECONDS / self.speed
+        for start in range(0, len(samples), BLOCK_SIZE):
+            block = samples[start:start + BLOCK_SIZE]
+            if len(block) < BLOCK_SIZE:
+                block = np.pad(block, (0, BLOCK_SIZE - len(block)))
+            self.system.audio_callback(block.reshape(-1, 1), BLOCK_SIZE, None, None)
+            now = time.monotonic()
+            if self._next_block is None or now - self._next_block > period:
+                if self._next_block is not None:
+                    self.late_blocks += 1
+                self._next_block = now
+            self._next_block += period
+            await asyncio.sleep(max(0.0, self._next_block - time.monotonic()))
+
+    async def run(self):
+        processor = self.system.audio_processor
+        while True:
+            barge_in = self.random.random() < self.barge_in_rate
+            # Keep the line open with background noise while the agent talks
+            while processor.is_speaking:
+                if barge_in:
+                    await self._feed(self._silence(self.random.uniform(0.2, 0.8)))
+                    self.barge_ins += 1
+                    break
+                await self._feed(self._silence(0.2))
+            await self._feed(self._utterance())
+            self.turns += 1
+            await self._feed(self._silence(self.random.uniform(*self.think_time)))
+
+
+def track_responses(system):
+    """Tell the paced output stream where each response starts"""
+    handle_event = system.handle_event
+
+    async def tracked(websocket, event):
+        output = system.streams['output']
+        if event["type"] == "response.created" and isinstance(output, PacedOutputStream):
+            output.new_response()
+        return await handle_event(websocket, event)
+    system.handle_event = tracked
+
+
+def start_server(args):
+    """Run mock_realtime_server.py in a child process and return (process, url)"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_realtime_server.py")
+    process = subprocess.Popen(
+        [sys.executable, "-u", script, "--port", "0", "--speed", str(args.speed),
+         "--response-seconds", str(args.response_seconds)],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r"(ws://\S+)", line)
+    if not match:
+        process.kill()
+        raise RuntimeError(f"Mock server did not start: {line!r}")
+    return process, match.group(1)
+
+
+async def run_step(callers, url, utterances, args):
+    """Run ``callers`` concurrent calls for the step duration and measure them"""
+    backend = LoadTestBackend(args.speed, args.playout_buffer_ms / 1000)
+    # Degradation tiers would switch tracing off and turn calls away, hiding
+    # the raw capacity being measured; --lag-tiers keeps them on
+    lag_monitor = None if args.lag_tiers else LoopLagMonitor(enabled=False)
+    systems, run_tasks, caller_tasks, virtual = [], [], [], []
+    with open(os.devnull, "w") as devnull, \
+            contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+        for index in range(callers):
+            system = create_system(args.persona, url=url, audio_backend=backend,
+                                   lag_monitor=lag_monitor)
+            system.tracer.enabled = True
+            track_responses(system)
+            caller = VirtualCaller(system, utterances, args.speed,
+                                   think_time=(args.think_min, args.think_max),
+                                   barge_in_rate=args.barge_in_rate, seed=args.seed + index)
+            systems.append(system)
+            virtual.append(caller)
+            run_tasks.append(asyncio.create_task(system.run()))
+        # Let every call finish session setup before the callers start talking
+        await asyncio.sleep(0.5)
+        caller_tasks = [asyncio.create_task(caller.run()) for caller in virtual]
+
+        cpu_started, wall_started = time.process_time(), time.monotonic()
+        await asyncio.sleep(args.duration / args.speed)
+        cpu, wall = time.process_time() - cpu_started, time.monotonic() - wall_started
+
+        failed = sum(1 for task in run_tasks if task.done())
+        for task in caller_tasks + run_tasks:
+            task.cancel()
+        await asyncio.gather(*caller_tasks, *run_tasks, return_exceptions=True)
+
+    latency = LatencyHistogram()
+    for system in systems:
+        for sample in system.tracer.histograms["response"].samples:
+            latency.observe(sample)
+    summary = latency.summary()
+    return {
+        "callers": callers,
+        "turns": sum(caller.turns for caller in virtual),
+        "barge_ins": sum(caller.barge_ins for caller in virtual),
+        "latency_p50_ms": summary["p50"] * 1000 if summary["p50"] is not None else None,
+        "latency_p99_ms": summary["p99"] * 1000 if summary["p99"] is not None else None,
+        "cpu_per_call_pct": cpu / wall / callers * 100,
+        "late_input_blocks": sum(caller.late_blocks for caller in virtual),
+        "playback_underflows": sum(system.audio_budget.streams['output'].underflows
+                                   for system in systems),
+        "failed_calls": failed,
+    }
+
+
+def _ms(value):
+    return f"{value:.0f}" if value is not None else "-"
+
+
+def report(results, max_p99_ms):
+    print(f"\n=== Scaling curve ({max_p99_ms:.0f} ms p99 budget) ===")
+    print(f"{'callers':>7} {'turns':>6} {'p50 ms':>7} {'p99 ms':>7} {'cpu/call':>9} "
+          f"{'late in':>8} {'underflow':>9} {'failed':>6}")
+    sustained, degraded = 0, False
+    for row in results:
+        healthy = (row["latency_p99_ms"] is not None and row["latency_p99_ms"] <= max_p99_ms
+                   and not row["failed_calls"] and not row["playback_underflows"]
+                   and not row["late_input_blocks"])
+        degraded = degraded or not healthy
+        if not degraded:
+            sustained = row["callers"]
+        print(f"{row['callers']:>7} {row['turns']:>6} {_ms(row['latency_p50_ms']):>7} "
+              f"{_ms(row['latency_p99_ms']):>7} {row['cpu_per_call_pct']:>8.1f}% "
+              f"{row['late_input_blocks']:>8} {row['playback_underflows']:>9} "
+              f"{row['failed_calls']:>6}" + ("" if healthy else "  degraded"))
+    print(f"Sustained without degradation: {sustained} concurrent calls")
+    return sustained
+
+
+async def sweep(args):
+    utterances = load_utterances(args.wav) if args.wav else []
+    server, url = start_server(args)
+    results = []
+    try:
+        for callers in args.callers:
+            row = await run_step(callers, url, utterances, args)
+            results.append(row)
+            print(f"{callers} callers: {row['turns']} turns, "
+                  f"p50 {_ms(row['latency_p50_ms'])} ms, p99 {_ms(row['latency_p99_ms'])} ms, "
+                  f"{row['cpu_per_call_pct']:.1f}% CPU per call")
+    finally:
+        server.terminate()
+        server.wait()
+
+    max_p99_ms = args.max_p99_ms
+    if max_p99_ms is None:
+        baseline = results[0]["latency_p99_ms"] if results else None
+        max_p99_ms = 2 * baseline if baseline else float("inf")
+    sustained = report(results, max_p99_ms)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"max_p99_ms": max_p99_ms, "sustained_callers": sustained,
+                       "steps": results}, f, indent=2)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent virtual-caller load test")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="insurance")
+    parser.add_argument("--callers", default="1,2,4,8,16",
+                        type=lambda value: [int(n) for n in value.split(",")],
+                        help="comma-separated concurrency levels to sweep")
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="simulated seconds per concurrency level")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="how many times faster than real time to run")
+    parser.add_argument("--wav", nargs="*", help="caller utterances (24 kHz mono pcm16)")
+    parser.add_argument("--think-min", type=float, default=1.0)
+    parser.add_argument("--think-max", type=float, default=4.0)
+    parser.add_argument("--barge-in-rate", type=float, default=0.2,
+                        help="fraction of turns where the caller interrupts the agent")
+    parser.add_argument("--response-seconds", type=float, default=2.0)
+    parser.add_argument("--playout-buffer-ms", type=float, default=100.0,
+                        help="simulated output device buffer")
+    parser.add_argument("--max-p99-ms", type=float,
+                        help="p99 turn latency budget (default: twice the first step's p99)")
+    parser.add_argument("--lag-tiers", action="store_true",
+                        help="let the event-loop lag monitor degrade and refuse calls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the curve as JSON to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    return asyncio.run(sweep(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
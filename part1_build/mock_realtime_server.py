@@ -0,0 +1,314 @@
+"""Local stand-in for the Azure OpenAI Realtime WebSocket API.
+
+Implements just enough of the protocol for the conversation scripts to run
+against it without credentials or network: session.update, input audio
+append/commit, response.create/cancel and conversation.item.create/delete.
+Responses stream a synthetic pcm16 tone as response.audio.delta events and end
+with a response.done carrying a usage block. All delays are divided by
+``speed`` so soak and load tests can run faster than real time.
+
+With ``requests_per_minute`` / ``tokens_per_minute`` set, the server keeps
+per-minute counters across all sessions, sends rate_limits.updated after each
+response and answers response.create with a rate_limit_exceeded error once a
+limit is used up, like the real deployment.
+
+When a session enables input_audio_transcription, each commit is followed by
+a conversation.item.input_audio_transcription.completed event whose transcript
+is taken in turn from ``transcripts``.
+
+When a session enables ``server_vad`` turn detection, appended audio is
+analysed in 10 ms frames as it arrives: a frame louder than the configured
+threshold times ``VAD_LEVEL_SCALE`` (of full scale) is speech. The server
+sends input_audio_buffer.speech_started, and after ``silence_duration_ms`` of
+quiet speech_stopped, commits the buffer and starts a response on its own.
+
+    python mock_realtime_server.py --port 8765
+"""
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import uuid
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 24000
+VAD_LEVEL_SCALE = 0.05  # server_vad threshold 0.3 -> 0.015 of full scale
+
+
+class MockRealtimeServer:
+    """Scripted Realtime API server with configurable latency"""
+    def __init__(self, response_seconds=2.0, first_delta_delay=0.3,
+                 delta_seconds=0.1, speed=1.0, sample_rate=SAMPLE_RATE,
+                 requests_per_minute=None, tokens_per_minute=None, transcripts=None,
+                 answer_text="This is a synthetic answer from the mock server."):
+        self.response_seconds = response_seconds
+        self.first_delta_delay = first_delta_delay
+        self.delta_seconds = delta_seconds
+        self.speed = speed
+        self.sample_rate = sample_rate
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window_start = None
+        self._window_requests = 0
+        self._window_tokens = 0
+        self.rate_limited = 0
+        self.transcripts = transcripts or ["Synthetic caller question"]
+        self.answer_text = answer_text
+        self._transcript_index = 0
+        self.url = None
+        self.sessions = 0
+        self.responses = 0
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+        samples = np.arange(int(delta_seconds * sample_rate))
+        tone = (np.sin(2 * np.pi * 220 * samples / sample_rate) * 3000).astype(np.int16)
+        self._delta_payload = base64.b64encode(tone.tobytes()).decode('utf-8')
+
+    async def _sleep(self, seconds):
+        if self.speed:
+            await asyncio.sleep(seconds / self.speed)
+        else:
+            await asyncio.sleep(0)
+
+    async def _send(self, websocket, event):
+        await websocket.send(json.dumps(event))
+
+    def _minute_left(self):
+        """Roll the shared per-minute window and return seconds until reset.
+
+        Quotas are per wall-clock minute regardless of ``speed``."""
+        now = asyncio.get_running_loop().time()
+        if self._window_start is None or now - self._window_start >= 60.0:
+            self._window_start = now
+            self._window_requests = self._window_tokens = 0
+        return 60.0 - (now - self._window_start)
+
+    def _over_limit(self):
+        return ((self.requests_per_minute and self._window_requests >= self.requests_per_minute)
+                or (self.tokens_per_minute and self._window_tokens >= self.tokens_per_minute))
+
+    async def _send_rate_limits(self, websocket):
+        reset = self._minute_left()
+        limits = []
+        if self.requests_per_minute:
+            limits.append({"name": "requests", "limit": self.requests_per_minute,
+                           "remaining": max(0, self.requests_per_minute - self._window_requests),
+                           "reset_seconds": round(reset, 3)})
+        if self.tokens_per_minute:
+            limits.append({"name": "tokens", "limit": self.tokens_per_minute,
+                           "remaining": max(0, self.tokens_per_minute - self._window_tokens),
+                           "reset_seconds": round(reset, 3)})
+        await self._send(websocket, {"type": "rate_limits.updated", "rate_limits": limits})
+
+    async def _create_response(self, websocket, session):
+        """Start a response unless the per-minute limits are used up"""
+        limited = self.requests_per_minute or self.tokens_per_minute
+        if limited:
+            reset = self._minute_left()
+            if self._over_limit():
+                self.rate_limited += 1
+                await self._send(websocket, {"type": "error", "error": {
+                    "type": "requests", "code": "rate_limit_exceeded",
+                    "message": f"Rate limit reached. Please try again in {reset:.1f}s."}})
+                return
+            self._window_requests += 1
+        await self._cancel(websocket, session)
+        response_id = f"resp_{uuid.uuid4().hex[:12]}"
+        session["active_response"] = response_id
+        session["response_task"] = asyncio.ensure_future(
+            self._respond(websocket, session, response_id))
+
+    async def _respond(self, websocket, session, response_id):
+        """Stream one synthetic response"""
+        item_id = f"item_{uuid.uuid4().hex[:12]}"
+        self.responses += 1
+        await self._send(websocket, {"type": "response.created",
+                                     "response": {"id": response_id, "status": "in_progress"}})
+        await self._send(websocket, {"type": "response.output_item.added",
+                                     "response_id": response_id,
+                                     "item": {"id": item_id, "role": "assistant"}})
+        await self._sleep(self.first_delta_delay)
+        deltas = max(1, int(self.response_seconds / self.delta_seconds))
+        await self._send(websocket, {"type": "response.audio_transcript.delta",
+                                     "response_id": response_id, "delta": self.answer_text})
+        for _ in range(deltas):
+            await self._send(websocket, {"type": "response.audio.delta",
+                                         "response_id": response_id,
+                                         "delta": self._delta_payload})
+            await self._sleep(self.delta_seconds)
+        await self._send(websocket, {"type": "response.audio_transcript.done",
+                                     "response_id": response_id, "item_id": item_id,
+                                     "transcript": self.answer_text})
+        input_audio_tokens = session["input_audio_bytes"] // 2 // 240  # ~10 tokens per second
+        session["input_audio_bytes"] = 0
+        if self.requests_per_minute or self.tokens_per_minute:
+            self._minute_left()
+            self._window_tokens += input_audio_tokens + deltas * 5
+        session["active_response"] = None  # reported done; too late to cancel
+        await self._send(websocket, {
+            "type": "response.done",
+            "response": {
+                "id": response_id,
+                "status": "completed",
+                "usage": {
+                    "total_tokens": input_audio_tokens + deltas * 5,
+                    "input_tokens": input_audio_tokens,
+                    "output_tokens": deltas * 5,
+                    "input_token_details": {"text_tokens": 0, "audio_tokens": input_audio_tokens},
+                    "output_token_details": {"text_tokens": deltas, "audio_tokens": deltas * 4},
+                },
+            },
+        })
+        if self.requests_per_minute or self.tokens_per_minute:
+            await self._send_rate_limits(websocket)
+
+    async def _transcribe(self, websocket):
+        """Report the next scripted transcript for a committed utterance"""
+        await self._sleep(0.2)
+        transcript = self.transcripts[self._transcript_index % len(self.transcripts)]
+        self._transcript_index += 1
+        await self._send(websocket, {
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": f"item_{uuid.uuid4().hex[:12]}", "content_index": 0,
+            "transcript": transcript})
+
+    async def _commit(self, websocket, session):
+        await self._send(websocket, {"type": "input_audio_buffer.committed",
+                                     "item_id": f"item_{uuid.uuid4().hex[:12]}"})
+        if session["transcribe"]:
+            asyncio.ensure_future(self._transcribe(websocket))
+
+    async def _detect_turns(self, websocket, session, audio):
+        """Server-side VAD over one appended chunk, 10 ms frames at a time"""
+        vad = session["server_vad"]
+        samples = np.frombuffer(base64.b64decode(audio), dtype=np.int16)
+        frame = self.sample_rate // 100
+        for start in range(0, len(samples) - frame + 1, frame):
+            level = np.abs(samples[start:start + frame]).mean() / 32768.0
+            vad["audio_ms"] += 10
+            if level > vad["level"]:
+                vad["silent_ms"] = 0
+                if not vad["speaking"]:
+                    vad["speaking"] = True
+                    await self._send(websocket, {"type": "input_audio_buffer.speech_started",
+                                                 "audio_start_ms": vad["audio_ms"] - 10})
+            elif vad["speaking"]:
+                vad["silent_ms"] += 10
+                if vad["silent_ms"] >= vad["silence_ms"]:
+                    vad["speaking"] = False
+                    await self._send(websocket, {"type": "input_audio_buffer.speech_stopped",
+                                                 "audio_end_ms": vad["audio_ms"] - vad["silent_ms"]})
+                    await self._commit(websocket, session)
+                    await self._create_response(websocket, session)
+
+    async def _cancel(self, websocket, session):
+        """Cancel the active response, if it has not been reported done yet"""
+        response_id = session["active_response"]
+        if not response_id:
+            return
+        session["active_response"] = None
+        session["response_task"].cancel()
+        await self._send(websocket, {"type": "response.done",
+                                     "response": {"id": response_id, "status": "cancelled"}})
+
+    async def handler(self, websocket):
+        self.sessions += 1
+        session = {"input_audio_bytes": 0, "response_task": None, "active_response": None,
+                   "transcribe": False, "server_vad": None}
+        try:
+            async for message in websocket:
+                event = json.loads(message)
+                event_type = event.get("type")
+                if event_type == "session.update":
+                    config = event.get("session", {})
+                    session["transcribe"] = bool(config.get("input_audio_transcription"))
+                    turn_detection = config.get("turn_detection") or {}
+                    if turn_detection.get("type") == "server_vad":
+                        session["server_vad"] = {
+                            "level": turn_detection.get("threshold", 0.5) * VAD_LEVEL_SCALE,
+                            "silence_ms": turn_detection.get("silence_duration_ms", 500),
+                            "speaking": False, "silent_ms": 0, "audio_ms": 0}
+                    await self._send(websocket, {"type": "session.created",
+                                                 "session": {"id": f"sess_{uuid.uuid4().hex[:12]}"}})
+                elif event_type == "input_audio_buffer.append":
+                    session["input_audio_bytes"] += len(event.get("audio", "")) * 3 // 4
+                    if session["server_vad"]:
+                        await self._detect_turns(websocket, session, event.get("audio", ""))
+                elif event_type == "input_audio_buffer.commit":
+                    await self._commit(websocket, session)
+                elif event_type == "conversation.item.create":
+                    await self._send(websocket, {"type": "conversation.item.created",
+                                                 "item": event.get("item", {})})
+                elif event_type == "conversation.item.delete":
+                    await self._send(websocket, {"type": "conversation.item.deleted",
+                                                 "item_id": event.get("item_id")})
+                elif event_type == "response.create":
+                    await self._create_response(websocket, session)
+                elif event_type == "response.cancel":
+                    await self._cancel(websocket, session)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            task = session.get("response_task")
+            if task:
+                task.cancel()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving on the current event loop and return the ws:// URL"""
+        self._server = await websockets.serve(self.handler, host, port, max_size=None)
+        bound_port = next(iter(self._server.sockets)).getsockname()[1]
+        self.url = f"ws://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """Run the server on its own thread and event loop so it does not
+        compete with the system under test for loop time"""
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="mock-realtime-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop_thread(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+
+async def _serve_forever(args):
+    server = MockRealtimeServer(response_seconds=args.response_seconds,
+                                first_delta_delay=args.first_delta_delay, speed=args.speed,
+                                requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    url = await server.start(args.host, args.port)
+    print(f"Mock Realtime server listening on {url}")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in Realtime API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--response-seconds", type=float, default=2.0)
+    parser.add_argument("--first-delta-delay", type=float, default=0.3)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--rpm", type=int, help="requests per minute before rate limiting")
+    parser.add_argument("--tpm", type=int, help="tokens per minute before rate limiting")
+    asyncio.run(_serve_forever(parser.parse_args()))
@@ -5,7 +5,7 @@ import json
 from dotenv import load_dotenv
 import websockets
 import numpy as np
-import sounddevice as sd
+from realtime_agent.wav_writer import StreamingWavWriter
 
 # Load environment variables
 load_dotenv()
@@ -24,14 +24,25 @@ async def main():
         f"{api_key}"
     )
 
+    # Optional outputs: RESPONSE_WAV saves the response, PLAYBACK=0 skips the speakers
+    wav_path = os.getenv("RESPONSE_WAV")
+    playback = os.getenv("PLAYBACK", "1") != "0"
+    stream = None
+    wav_writer = None
+
     # Set up audio output stream
-    try:
-        stream = sd.OutputStream(samplerate=24000, channels=1, dtype=np.int16)
-        stream.start()
-        print("Audio stream started")
-    except Exception as e:
-        print(f"Error initializing audio stream: {e}")
-        return
+    if playback:
+        import sounddevice as sd  # only needed when playing through the speakers
+        try:
+            stream = sd.OutputStream(samplerate=24000, channels=1, dtype=np.int16)
+            stream.start()
+            print("Audio stream started")
+        except Exception as e:
+            print(f"Error initializing audio stream: {e}")
+            return
+    if wav_path:
+        wav_writer = StreamingWavWriter(wav_path, sample_rate=24000)
+        print(f"Saving response audio to {wav_path}")
 
     try:
         # Increased open_timeout from default 10s to 30s for the WebSocket handshake
@@ -102,7 +113,6 @@ async def main():
 
             # Step 4: Stream audio response
             print("Streaming audio...")
-            audio_buffer = [] 
             while True:
                 try:
                     response = await ws.recv()
@@ -118,10 +128,13 @@ async def main():
                                 if padding != 4:
                                     audio_data += "=" * padding
                                 
-                                # Decode and play audio
+                                # Decode, save and play audio
                                 audio_bytes = base64.b64decode(audio_data)
-                                audio = np.frombuffer(audio_bytes, dtype=np.int16)
-                                stream.write(audio)
+                                if wav_writer:
+                                    wav_writer.write(audio_bytes)
+                                if stream:
+                                    audio = np.frombuffer(audio_bytes, dtype=np.int16)
+                                    stream.write(audio)
                                 print(".", end="", flush=True)
                             except Exception as decode_error:
                                 print(f"\nError decoding audio: {decode_error}")
@@ -157,11 +170,14 @@ async def main():
         print(f"An unexpected error occurred: {e}")
     finally:
         # Clean up audio stream, ensuring stream was initialized and is active
-        if 'stream' in locals() and stream.active:
+        if stream and stream.active:
             await asyncio.sleep(1)  # Allow final audio to play
             stream.stop()
             stream.close()
             print("Audio stream closed")
+        if wav_writer:
+            wav_writer.close()
+            print(f"Saved {wav_writer.frames_written / 24000:.1f}s of audio to {wav_path}")
 
 if __name__ == "__main__":
     print("Starting real-time API test...")
@@ -0,0 +1,30 @@
+"""Shared core for the Realtime API voice agents.
+
+Public names are imported lazily (PEP 562) so importing the package, listing
+personas or printing CLI help does not pull in numpy, websockets or PortAudio.
+"""
+import importlib
+
+_EXPORTS = {
+    "AudioProcessor": "realtime_agent.audio",
+    "ConversationSystem": "realtime_agent.conversation",
+    "InsuranceConversationState": "realtime_agent.insurance",
+    "InsuranceConversationSystem": "realtime_agent.insurance",
+    "PERSONAS": "realtime_agent.personas",
+    "create_system": "realtime_agent.personas",
+    "create_backend": "realtime_agent.audio_backends",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'realtime_agent' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,287 @@
+"""Quota-aware admission control for concurrent Realtime sessions.
+
+Every conversation in a process shares one deployment, so concurrent
+sessions, requests per minute and tokens per minute are tracked against
+configured quotas with token buckets:
+
+    REALTIME_MAX_SESSIONS    concurrent sessions
+    REALTIME_RPM             response.create requests per minute
+    REALTIME_TPM             estimated tokens per minute
+    REALTIME_ADMISSION_MAX_QUEUE / REALTIME_ADMISSION_MAX_WAIT
+                             queue length and seconds a new call may wait
+
+New calls and responses wait in one priority queue; responses inside an
+admitted call go first and are never rejected, so load is shed by turning
+away new calls (``AdmissionRejected``) rather than stalling live ones.
+``rate_limits.updated`` and rate-limit errors from the server pull the
+buckets down to what the server reports.
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import math
+import os
+import re
+import time
+
+from .latency_tracing import LatencyHistogram
+
+PRIORITY_RESPONSE = 0
+PRIORITY_CALL = 10
+RATE_LIMIT_BACKOFF = 5.0  # seconds, when a rate-limit error gives no retry hint
+
+
+def retry_after(error):
+    """Seconds a rate-limit error asks to wait ("try again in 20ms"), or the default"""
+    match = re.search(r"try again in ([\d.]+)\s*(ms|s)", error.get("message", ""))
+    if not match:
+        return RATE_LIMIT_BACKOFF
+    return float(match.group(1)) / (1000 if match.group(2) == "ms" else 1)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted within the queue limits"""
+
+
+class TokenBucket:
+    """Refills ``per_minute`` tokens per minute up to ``burst``.
+
+    ``take`` may drive the bucket negative, which is how usage reported after
+    the fact (more tokens than estimated) is paid back.
+    """
+    def __init__(self, per_minute, burst=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.clock = clock
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` tokens are available (0 if they are now)"""
+        now = self._refill()
+        amount = min(amount, self.capacity)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < amount:
+            wait = max(wait, (amount - self.tokens) / self.rate)
+        return wait
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def pause(self, seconds):
+        """Stop granting for ``seconds`` and drop any saved-up burst"""
+        now = self._refill()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def sync(self, remaining, reset_seconds):
+        """Trust the server's view when it has less left than we think"""
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if remaining <= 0 and reset_seconds:
+            self.pause(reset_seconds)
+
+
+class _Kind:
+    """Admission counters and queue wait times for calls or responses"""
+    def __init__(self):
+        self.requested = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait = LatencyHistogram()
+
+    def summary(self):
+        wait = self.wait.summary()
+        return {
+            "requested": self.requested,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rejection_rate": self.rejected / self.requested if self.requested else 0.0,
+            "wait_p50_s": wait["p50"],
+            "wait_p95_s": wait["p95"],
+            "wait_p99_s": wait["p99"],
+        }
+
+
+class AdmissionScheduler:
+    """Admits calls and response.create requests against shared quotas"""
+    def __init__(self, max_sessions=None, requests_per_minute=None,
+                 tokens_per_minute=None, max_queue=100, max_wait=30.0,
+                 clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+        self.active_sessions = 0
+        self.stats = {"call": _Kind(), "response": _Kind()}
+        self.rate_limit_events = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = None
+
+    @classmethod
+    def from_env(cls):
+        """Scheduler configured from the environment, or None without quotas"""
+        def number(name, cast=int):
+            value = os.getenv(name)
+            return cast(value) if value else None
+        max_sessions = number("REALTIME_MAX_SESSIONS")
+        rpm = number("REALTIME_RPM")
+        tpm = number("REALTIME_TPM")
+        if not (max_sessions or rpm or tpm):
+            return None
+        return cls(max_sessions=max_sessions, requests_per_minute=rpm, tokens_per_minute=tpm,
+                   max_queue=number("REALTIME_ADMISSION_MAX_QUEUE") or 100,
+                   max_wait=number("REALTIME_ADMISSION_MAX_WAIT", float) or 30.0)
+
+    def _delay(self, kind, tokens):
+        """Seconds until a request of this kind could be granted, None if it
+        depends on a session being released"""
+        if kind == "call":
+            if self.max_sessions and self.active_sessions >= self.max_sessions:
+                return None
+            return 0.0
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.wait_time(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.wait_time(tokens))
+        return delay
+
+    def _grant(self, kind, tokens):
+        if kind == "call":
+            self.active_sessions += 1
+            return
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+    async def _acquire(self, kind, priority, tokens=0, max_wait=None):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        stats = self.stats[kind]
+        stats.requested += 1
+        if kind == "call" and len(self._waiting) >= self.max_queue:
+            stats.rejected += 1
+            raise AdmissionRejected(f"admission queue full ({len(self._waiting)} waiting)")
+
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+        started = self.clock()
+        try:
+            async with self._condition:
+                while True:
+                    delay = self._delay(kind, tokens) if self._waiting[0] == ticket else None
+                    if delay == 0:
+                        self._grant(kind, tokens)
+                        break
+                    timeout = delay
+                    if max_wait is not None:
+                        remaining = max_wait - (self.clock() - started)
+                        if remaining <= 0 or (delay is not None and delay > remaining):
+                            stats.rejected += 1
+                            raise AdmissionRejected(
+                                f"no {kind} capacity within {max_wait:.0f}s")
+                        timeout = remaining if delay is None else min(delay, remaining)
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            await self._notify()
+        stats.admitted += 1
+        stats.wait.observe(self.clock() - started)
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def admit_call(self, priority=PRIORITY_CALL):
+        """Wait for a session slot; raises AdmissionRejected when shedding load"""
+        await self._acquire("call", priority, max_wait=self.max_wait)
+
+    async def release_call(self):
+        self.active_sessions -= 1
+        await self._notify()
+
+    @contextlib.asynccontextmanager
+    async def call(self, priority=PRIORITY_CALL):
+        """Hold a session slot for the duration of a call"""
+        await self.admit_call(priority)
+        try:
+            yield self
+        finally:
+            await self.release_call()
+
+    async def admit_response(self, estimated_tokens, priority=PRIORITY_RESPONSE):
+        """Wait until a response.create fits the request and token budgets"""
+        await self._acquire("response", priority, tokens=estimated_tokens)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Charge (or refund) the difference between estimate and usage"""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    def on_server_event(self, event):
+        """Apply rate_limits.updated and rate-limit error events"""
+        if event.get("type") == "rate_limits.updated":
+            for limit in event.get("rate_limits", []):
+                bucket = {"requests": self.requests, "tokens": self.tokens}.get(limit.get("name"))
+                if bucket is not None and "remaining" in limit:
+                    bucket.sync(limit["remaining"], limit.get("reset_seconds", 0))
+        elif event.get("type") == "error":
+            error = event.get("error", {})
+            if error.get("code") != "rate_limit_exceeded":
+                return
+            self.rate_limit_events += 1
+            backoff = retry_after(error)
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.pause(backoff)
+
+    def metrics(self):
+        result = {
+            "active_sessions": self.active_sessions,
+            "queue_depth": len(self._waiting),
+            "rate_limit_events": self.rate_limit_events,
+            "calls": self.stats["call"].summary(),
+            "responses": self.stats["response"].summary(),
+        }
+        if self.tokens:
+            result["tokens_available"] = math.floor(self.tokens.tokens)
+        return result
+
+    def log_line(self):
+        calls, responses = self.stats["call"].summary(), self.stats["response"].summary()
+        p95 = responses["wait_p95_s"]
+        return (f"Admission | sessions {self.active_sessions}, queued {len(self._waiting)} | "
+                f"calls {calls['admitted']}/{calls['requested']} admitted "
+                f"({calls['rejection_rate']:.0%} rejected) | responses {responses['admitted']}, "
+                f"wait p95 {p95 if p95 is None else round(p95 * 1000)} ms | "
+                f"rate limited {self.rate_limit_events}x")
+
+
+_shared = None
+
+
+def shared_scheduler():
+    """Process-wide scheduler from the environment, so every conversation in
+    the process draws on the same quotas (None when no quota is set)"""
+    global _shared
+    if _shared is None:
+        _shared = AdmissionScheduler.from_env() or False
+    return _shared or None
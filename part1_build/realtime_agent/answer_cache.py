@@ -0,0 +1,212 @@
+"""Cache of validated insurance answers keyed by policy plan, question intent
+and the coverage table answer the reply was grounded in.
+
+Customers on the same plan ask the same coverage questions over and over. A
+completed model answer - its transcript and pcm16 audio - is stored under the
+plan named in the customer's policy file, a normalized form of the question
+and the caller's own table answer, so the next caller on that plan asking the
+same thing is answered from memory without a model turn. Policy files that
+share a plan name but differ in their numbers never share answers.
+
+Entries are evicted least-recently-used once ANSWER_CACHE_MAX_MB of audio is
+held. The caller's policy file is checked on every lookup and the files behind
+a plan's stored answers at most every ANSWER_CACHE_CHECK_SECONDS; if any of
+them changed, all of that plan's answers are dropped.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Words that carry no intent ("is my cardiologist covered?" -> cardiology covered)
+STOPWORDS = frozenset("""
+    a an and are can could do does for have how i if im in is it me much my of on
+    please tell the there to what whats which will with would you your
+""".split())
+
+# Different ways of naming the same thing map onto one intent term
+SYNONYMS = {
+    "cardiologist": "cardiology", "cardiologists": "cardiology", "heart": "cardiology",
+    "cardiac": "cardiology", "cardiovascular": "cardiology",
+    "endocrinologist": "endocrinology", "endocrinologists": "endocrinology",
+    "diabetes": "diabetic", "insulin": "diabetic",
+    "coverage": "covered", "cover": "covered", "covers": "covered",
+    "pay": "cost", "costs": "cost", "price": "cost",
+    "co-pay": "copay", "copays": "copay", "copayment": "copay",
+    "deductibles": "deductible",
+    "visits": "visit", "appointment": "visit", "appointments": "visit",
+    "meds": "medication", "medications": "medication", "drugs": "medication",
+    "prescription": "medication", "prescriptions": "medication",
+}
+
+# Shorter intents ("copay", "ok", "thank you") lean on earlier turns
+MIN_INTENT_TERMS = 2
+
+PLAN_PATTERN = re.compile(r"Plan Type:\s*(.+)")
+NAME_PATTERN = re.compile(r"Name:\s*(.+)")
+
+
+def normalize_intent(text):
+    """Reduce a question to a canonical, order-independent set of key terms"""
+    words = re.findall(r"[a-z0-9-]+", text.lower())
+    terms = {SYNONYMS.get(word, word) for word in words if word not in STOPWORDS}
+    return " ".join(sorted(terms))
+
+
+def is_specific(intent):
+    """Whether an intent stands on its own rather than following up a turn"""
+    return len(intent.split()) >= MIN_INTENT_TERMS
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class AnswerCache:
+    """LRU of (plan, intent, grounding) -> (transcript, pcm16 audio) with
+    per-plan invalidation"""
+    def __init__(self, max_bytes=64 * 1024 * 1024, check_seconds=5.0):
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._policies = {}  # path -> (signature, plan, private strings)
+        self._plan_files = {}  # plan -> {path: signature} of answers currently stored
+        self._plan_checked = {}  # plan -> monotonic time of the last file check
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        max_mb = float(os.getenv("ANSWER_CACHE_MAX_MB", "64"))
+        return cls(max_bytes=int(max_mb * 1024 * 1024),
+                   check_seconds=float(os.getenv("ANSWER_CACHE_CHECK_SECONDS", "5")))
+
+    def policy(self, path):
+        """Return (plan, private strings) for a policy file, re-reading it and
+        invalidating its plan's answers when the file has changed"""
+        signature = _signature(path)
+        with self._lock:
+            known = self._policies.get(path)
+            if known and known[0] == signature:
+                return known[1], known[2]
+        with open(path) as f:
+            text = f.read()
+        match = PLAN_PATTERN.search(text)
+        plan = match.group(1).strip() if match else os.path.basename(path)
+        private = [name.strip().lower() for name in NAME_PATTERN.findall(text)]
+        with self._lock:
+            if known:
+                self._invalidate(known[1])
+            if self._plan_files.get(plan, {}).get(path, signature) != signature:
+                self._invalidate(plan)
+            self._policies[path] = (signature, plan, private)
+        return plan, private
+
+    def _invalidate(self, plan):
+        stale = [key for key in self.entries if key[0] == plan]
+        for key in stale:
+            self.bytes -= len(self.entries.pop(key)[1])
+        self._plan_files.pop(plan, None)
+        self._plan_checked.pop(plan, None)
+        if stale:
+            self.invalidations += 1
+
+    def _check_plan(self, plan):
+        """Drop the plan's answers if any file they were built from changed"""
+        now = time.monotonic()
+        if now - self._plan_checked.get(plan, 0.0) < self.check_seconds:
+            return
+        self._plan_checked[plan] = now
+        for path, signature in list(self._plan_files.get(plan, {}).items()):
+            try:
+                changed = _signature(path) != signature
+            except OSError:
+                changed = True
+            if changed:
+                self._invalidate(plan)
+                return
+
+    def get(self, plan, intent, grounding=""):
+        """Return (transcript, audio) or None, counting the hit or miss.
+
+        ``grounding`` is the caller's coverage table answer the reply must
+        agree with.
+        """
+        key = (plan, intent, grounding)
+        with self._lock:
+            self._check_plan(plan)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, plan, intent, transcript, audio, policy_path, private=(), grounding=""):
+        """Store a completed answer if it is generic enough to share.
+
+        Answers without audio or transcript, to questions too short to stand
+        on their own, or that mention anything customer-specific (name,
+        customer number), are not cached.
+        """
+        lowered = transcript.lower()
+        if (not is_specific(intent) or not transcript.strip() or not audio
+                or any(value and value in lowered for value in private)):
+            self.rejected += 1
+            return False
+        signature = _signature(policy_path)
+        with self._lock:
+            key = (plan, intent, grounding)
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key)[1])
+            self.entries[key] = (transcript, bytes(audio))
+            self.bytes += len(audio)
+            self._plan_files.setdefault(plan, {})[policy_path] = signature
+            self.stores += 1
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def log_line(self):
+        stats = self.metrics()
+        return (f"Answer cache | {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%}) | {stats['entries']} entries, "
+                f"{stats['bytes'] / 1024 / 1024:.1f} MiB | {stats['stores']} stored, "
+                f"{stats['rejected']} rejected, {stats['evictions']} evicted, "
+                f"{stats['invalidations']} plan invalidations")
+
+
+_shared = None
+
+
+def shared_cache():
+    """Process-wide cache so every call in the process benefits from it"""
+    global _shared
+    if _shared is None:
+        _shared = AnswerCache.from_env()
+    return _shared
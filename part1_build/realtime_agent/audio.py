@@ -0,0 +1,208 @@
+import base64
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+BLOCK_SIZE = 4800  # 200 ms capture blocks
+FRAME_SECONDS = 0.01  # analysis frames for per-turn speech checks
+
+
+def frame_levels(samples, frame_size):
+    """Mean absolute level of each full frame, normalised to full scale"""
+    samples = np.asarray(samples).reshape(-1)
+    usable = len(samples) - len(samples) % frame_size
+    frames = samples[:usable].reshape(-1, frame_size)
+    return np.abs(frames).mean(axis=1) / 32768.0
+
+
+def decode_audio_delta(delta):
+    """Decode a base64 response.audio.delta payload into int16 samples"""
+    audio_data = delta.strip()
+    padding = -len(audio_data) % 4
+    if padding:
+        audio_data += "=" * padding
+    return np.frombuffer(base64.b64decode(audio_data), dtype=np.int16)
+
+
+def encode_audio(audio_data):
+    """Base64-encode pcm16 bytes for input_audio_buffer.append"""
+    return base64.b64encode(audio_data).decode('utf-8')
+
+
+class AudioProcessor:
+    """Client-side voice activity detection with barge-in capture.
+
+    Speech is collected into ``main_buffer`` until ``max_silence_duration``
+    of silence follows at least ``min_speech_duration`` of speech. While the
+    agent is speaking, audio above ``interrupt_threshold`` is collected into
+    ``interrupt_buffer`` instead. Buffers are bytearrays so each block is a
+    single memcpy rather than one Python int per byte.
+
+    With ``adaptive`` enabled the thresholds follow the call's noise floor: a
+    low percentile of recent block levels captured while the agent is silent,
+    scaled by ``speech_margin`` / ``interrupt_margin`` and clamped to
+    ``threshold_range``. The window starts filled with the level implied by
+    the constructor thresholds, so a call that opens with speech does not
+    mistake it for noise.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, vad_threshold=0.015,
+                 interrupt_threshold=0.02, min_speech_seconds=0.3,
+                 max_silence_seconds=0.8, adaptive=True, noise_window_blocks=64,
+                 noise_percentile=20, speech_margin=3.0, interrupt_margin=4.0,
+                 threshold_range=(0.004, 0.05)):
+        # Basic audio parameters
+        self.sample_rate = sample_rate
+        self.vad_threshold = vad_threshold
+        self.interrupt_threshold = interrupt_threshold
+
+        # Noise floor tracking
+        self.adaptive = adaptive
+        self.noise_levels = np.full(noise_window_blocks, vad_threshold / speech_margin)
+        self.noise_count = 0
+        self.noise_floor = None
+        self.noise_percentile = noise_percentile
+        self.speech_margin = speech_margin
+        self.interrupt_margin = interrupt_margin
+        self.threshold_range = threshold_range
+        self._samples_since_update = 0
+
+        # Turn quality counters
+        self.turns_triggered = 0
+        self.turns_with_speech = 0
+        self.last_turn_had_speech = None
+
+        # Frame tracking
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.min_speech_duration = int(min_speech_seconds * sample_rate)
+        self.max_silence_duration = int(max_silence_seconds * sample_rate)
+
+        # Audio buffers
+        self.main_buffer = bytearray()
+        self.interrupt_buffer = bytearray()
+
+        # State tracking
+        self.is_speaking = False
+        self.speech_detected = False
+        self.speech_end_time = None  # monotonic estimate of when speech stopped
+        self.is_interrupting = False
+
+    def process_audio(self, indata):
+        """Process incoming audio, handling both normal speech and interruptions"""
+        audio_level = np.abs(indata).mean() / 32768.0
+        if self.adaptive and not self.is_speaking:
+            self._track_noise(audio_level, len(indata))
+
+        # If we're currently speaking and detect a potential interruption
+        if self.is_speaking and audio_level > self.interrupt_threshold:
+            self.is_interrupting = True
+            self.interrupt_buffer.extend(indata)
+            return
+
+        # If we're collecting interrupted speech
+        if self.is_interrupting:
+            self.interrupt_buffer.extend(indata)
+            return
+
+        # Normal speech processing
+        if not self.is_speaking:
+            if audio_level > self.vad_threshold:
+                self.speech_detected = True
+                self.speech_frames += len(indata)
+                self.silence_frames = 0
+                self.main_buffer.extend(indata)
+            elif self.speech_detected:
+                if self.silence_frames == 0:
+                    # Speech ended at the start of this first silent block
+                    self.speech_end_time = time.monotonic() - len(indata) / self.sample_rate
+                self.silence_frames += len(indata)
+                if self.silence_frames < self.max_silence_duration:
+                    self.main_buffer.extend(indata)
+
+    def _track_noise(self, audio_level, num_samples):
+        """Add a block level to the ring; re-derive thresholds twice a second"""
+        window = len(self.noise_levels)
+        self.noise_levels[self.noise_count % window] = audio_level
+        self.noise_count += 1
+        self._samples_since_update += num_samples
+        if self._samples_since_update < self.sample_rate // 2:
+            return
+        self._samples_since_update = 0
+        self.noise_floor = float(np.percentile(self.noise_levels, self.noise_percentile))
+        low, high = self.threshold_range
+        self.vad_threshold = min(max(self.noise_floor * self.speech_margin, low), high)
+        self.interrupt_threshold = min(max(self.noise_floor * self.interrupt_margin,
+                                           self.vad_threshold), high)
+
+    def _count_turn(self, audio_data):
+        """Count the turn and whether at least min_speech_duration of it is voiced"""
+        frame_size = int(self.sample_rate * FRAME_SECONDS)
+        levels = frame_levels(np.frombuffer(audio_data, dtype=np.int16), frame_size)
+        voiced = np.count_nonzero(levels > self.vad_threshold) * frame_size
+        self.last_turn_had_speech = bool(voiced >= self.min_speech_duration)
+        self.turns_triggered += 1
+        self.turns_with_speech += self.last_turn_had_speech
+
+    def vad_stats(self):
+        """Current thresholds and turn counters for this call"""
+        return {
+            "noise_floor": self.noise_floor,
+            "vad_threshold": self.vad_threshold,
+            "interrupt_threshold": self.interrupt_threshold,
+            "turns_triggered": self.turns_triggered,
+            "turns_with_speech": self.turns_with_speech,
+            "phantom_turns": self.turns_triggered - self.turns_with_speech,
+        }
+
+    def check_interruption(self):
+        """Check if we're currently in an interruption state"""
+        return self.is_interrupting
+
+    def get_interrupt_audio(self):
+        """Get the interruption audio if available"""
+        if not self.interrupt_buffer:
+            return None
+        audio_data = bytes(self.interrupt_buffer)
+        self.interrupt_buffer.clear()
+        self.is_interrupting = False
+        return audio_data
+
+    def end_response(self):
+        """Agent finished speaking; barge-in audio not yet taken by the
+        conversation loop becomes the start of the next utterance"""
+        self.is_speaking = False
+        if self.is_interrupting:
+            self.is_interrupting = False
+            self.main_buffer.extend(self.interrupt_buffer)
+            self.speech_frames += len(self.interrupt_buffer) // 2
+            self.speech_detected = True
+            self.interrupt_buffer.clear()
+
+    def should_process(self):
+        """Check if we have enough speech to process"""
+        return (self.speech_detected and
+                self.speech_frames >= self.min_speech_duration and
+                self.silence_frames >= self.max_silence_duration)
+
+    def can_speculate(self, silence_samples):
+        """Enough speech followed by ``silence_samples`` of quiet, but not yet
+        the full silence window"""
+        return (self.speech_detected and
+                self.speech_frames >= self.min_speech_duration and
+                silence_samples <= self.silence_frames < self.max_silence_duration)
+
+    def snapshot(self):
+        """The utterance collected so far, leaving the buffer in place"""
+        return bytes(self.main_buffer)
+
+    def reset(self):
+        """Reset the main speech buffer and state"""
+        audio_data = bytes(self.main_buffer)
+        self.main_buffer.clear()
+        if self.speech_detected:
+            self._count_turn(audio_data)
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.speech_detected = False
+        return audio_data
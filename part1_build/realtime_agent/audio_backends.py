@@ -0,0 +1,293 @@
+"""Pluggable audio I/O for the conversation systems.
+
+A backend opens an input stream that delivers pcm16 blocks to a callback with
+the sounddevice signature ``callback(indata, frames, time, status)`` and an
+output stream with ``write(audio)``. Streams expose start/stop/close and
+``active`` like sounddevice streams, so the systems use them unchanged.
+
+Select one with the AUDIO_BACKEND environment variable:
+
+    sounddevice                                   default, PortAudio devices
+    wav:input=caller.wav,output=agent.wav,speed=0  read/write WAV files
+    null                                          no capture, discard playback
+    socket:host=127.0.0.1,port=9000               raw pcm16 over TCP
+
+File, null and socket backends never block on a sound card, so the
+conversation can run headless and faster than real time (speed=0).
+"""
+import os
+import socket
+import threading
+import time
+import wave
+
+import numpy as np
+
+from .wav_writer import StreamingWavWriter
+
+
+class AudioBackend:
+    """Interface for audio capture and playback"""
+    name = "base"
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        raise NotImplementedError
+
+    def open_output(self, samplerate, channels):
+        raise NotImplementedError
+
+
+class _Stream:
+    """Minimal stream with the start/stop/close lifecycle of sounddevice streams"""
+    def __init__(self):
+        self.active = False
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def abort(self):
+        """Stop at once, dropping audio written but not yet played"""
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+
+class NullOutputStream(_Stream):
+    """Discards audio as fast as it is written, counting samples"""
+    def __init__(self):
+        super().__init__()
+        self.samples_written = 0
+
+    def write(self, audio):
+        self.samples_written += len(audio)
+        return False  # never underflows
+
+
+class NullInputStream(_Stream):
+    """Captures nothing; audio is expected to be fed to the callback directly"""
+
+
+class _ThreadedInputStream(_Stream):
+    """Delivers blocks from ``read_block()`` to the callback on a worker thread,
+    mirroring how PortAudio calls the callback from its own thread"""
+    def __init__(self, callback, blocksize, samplerate, speed=1.0):
+        super().__init__()
+        self.callback = callback
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self.speed = speed
+        self.finished = threading.Event()
+        self._thread = None
+
+    def read_block(self):
+        raise NotImplementedError
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        next_time = time.monotonic()
+        try:
+            while self.active:
+                block = self.read_block()
+                if block is None:
+                    break
+                self.callback(block, len(block), None, None)
+                if self.speed:
+                    next_time += period / self.speed
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            self.finished.set()
+
+    def start(self):
+        super().start()
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        super().stop()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+
+class SoundDeviceBackend(AudioBackend):
+    """PortAudio devices through sounddevice (imported on first use)"""
+    name = "sounddevice"
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        import sounddevice as sd
+        return sd.InputStream(samplerate=samplerate, channels=channels, dtype=np.int16,
+                              callback=callback, blocksize=blocksize)
+
+    def open_output(self, samplerate, channels):
+        import sounddevice as sd
+        return sd.OutputStream(samplerate=samplerate, channels=channels, dtype=np.int16)
+
+
+class NullBackend(AudioBackend):
+    """No capture and a sink that discards playback at maximum speed"""
+    name = "null"
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        return NullInputStream()
+
+    def open_output(self, samplerate, channels):
+        return NullOutputStream()
+
+
+class WavInputStream(_ThreadedInputStream):
+    def __init__(self, path, callback, blocksize, samplerate, channels, speed):
+        super().__init__(callback, blocksize, samplerate, speed)
+        self.wav = wave.open(path, 'rb')
+        if (self.wav.getframerate() != samplerate or self.wav.getnchannels() != channels
+                or self.wav.getsampwidth() != 2):
+            raise ValueError(
+                f"{path} must be {samplerate} Hz, {channels} channel(s), 16-bit pcm")
+        self.channels = channels
+
+    def read_block(self):
+        data = self.wav.readframes(self.blocksize)
+        if not data:
+            return None
+        return np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+
+    def close(self):
+        super().close()
+        self.wav.close()
+
+
+class WavOutputStream(_Stream):
+    def __init__(self, path, samplerate, channels):
+        super().__init__()
+        self.writer = StreamingWavWriter(path, sample_rate=samplerate, channels=channels)
+
+    def write(self, audio):
+        self.writer.write(audio.tobytes())
+        return False
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+class WavFileBackend(AudioBackend):
+    """Reads caller audio from a WAV file and/or writes agent audio to one.
+
+    ``speed`` paces the input relative to real time; 0 feeds it as fast as
+    the callback returns.
+    """
+    name = "wav"
+
+    def __init__(self, input=None, output=None, speed=1.0):
+        self.input_path = input
+        self.output_path = output
+        self.speed = float(speed)
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        if not self.input_path:
+            return NullInputStream()
+        return WavInputStream(self.input_path, callback, blocksize, samplerate, channels,
+                              self.speed)
+
+    def open_output(self, samplerate, channels):
+        if not self.output_path:
+            return NullOutputStream()
+        return WavOutputStream(self.output_path, samplerate, channels)
+
+
+def _shutdown(sock):
+    """Shut both directions down, waking any thread blocked in recv()"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already shut down or closed
+
+
+class SocketInputStream(_ThreadedInputStream):
+    def __init__(self, sock, callback, blocksize, samplerate, channels):
+        # The peer paces the audio, so no additional sleeping here
+        super().__init__(callback, blocksize, samplerate, speed=0)
+        self.sock = sock
+        self.channels = channels
+        self.block_bytes = blocksize * channels * 2
+
+    def read_block(self):
+        data = bytearray()
+        while len(data) < self.block_bytes:
+            try:
+                chunk = self.sock.recv(self.block_bytes - len(data))
+            except OSError:
+                return None  # shut down by stop()
+            if not chunk:
+                return None
+            data += chunk
+        return np.frombuffer(bytes(data), dtype=np.int16).reshape(-1, self.channels)
+
+    def stop(self):
+        # The reader thread sits in recv() until the peer sends; shutting the
+        # socket down wakes it so the join below does not wait
+        self.active = False
+        _shutdown(self.sock)
+        super().stop()
+
+    def close(self):
+        self.stop()
+        self.sock.close()
+
+
+class SocketOutputStream(_Stream):
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+
+    def write(self, audio):
+        self.sock.sendall(audio.tobytes())
+        return False
+
+    def close(self):
+        super().close()
+        _shutdown(self.sock)
+        self.sock.close()
+
+
+class SocketPcmBackend(AudioBackend):
+    """Raw little-endian pcm16 over one TCP connection: caller audio is read
+    from the socket and agent audio is written back to it"""
+    name = "socket"
+
+    def __init__(self, host="127.0.0.1", port=9000):
+        self.address = (host, int(port))
+        self._sock = None
+
+    def _socket(self):
+        # The streams close the socket when the call ends; the next call reconnects
+        if self._sock is None or self._sock.fileno() == -1:
+            self._sock = socket.create_connection(self.address)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self._sock
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        return SocketInputStream(self._socket(), callback, blocksize, samplerate, channels)
+
+    def open_output(self, samplerate, channels):
+        return SocketOutputStream(self._socket())
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SoundDeviceBackend, NullBackend, WavFileBackend, SocketPcmBackend)
+}
+
+
+def create_backend(spec=None):
+    """Build a backend from a spec such as ``wav:input=in.wav,speed=0``"""
+    spec = spec or os.getenv("AUDIO_BACKEND", "sounddevice")
+    name, _, options = spec.partition(":")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend '{name}', expected one of {sorted(BACKENDS)}")
+    kwargs = dict(option.split("=", 1) for option in options.split(",") if option)
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,84 @@
+"""Pre-upload conditioning of captured utterances.
+
+The client-side VAD keeps up to ``max_silence_seconds`` of trailing silence
+and whatever low-level noise preceded speech. Before an utterance is
+base64-encoded and uploaded, ``condition_utterance`` removes the DC offset
+and trims leading and trailing silence down to a short guard interval, using
+per-frame energy computed in a single vectorized pass.
+
+Set UPLOAD_CONDITIONING=0 to upload captured audio unchanged.
+"""
+import os
+
+import numpy as np
+
+from .audio import FRAME_SECONDS, frame_levels
+
+GUARD_SECONDS = 0.1      # audio kept either side of the detected speech
+
+
+def condition_utterance(pcm, sample_rate, threshold, guard_seconds=GUARD_SECONDS,
+                        frame_seconds=FRAME_SECONDS):
+    """Return ``pcm`` (int16 bytes) with DC removed and silence trimmed.
+
+    Frames whose level exceeds ``threshold`` (the same mean-absolute measure
+    AudioProcessor uses) count as speech. If no frame qualifies the audio is
+    returned DC-corrected but untrimmed, so the server still sees the turn.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if not len(samples):
+        return pcm
+
+    # Remove DC offset; work in float32 and clip back to int16 range
+    audio = samples.astype(np.float32)
+    audio -= audio.mean()
+
+    frame_size = max(1, int(sample_rate * frame_seconds))
+    voiced = np.flatnonzero(frame_levels(audio, frame_size) > threshold)
+    if len(voiced):
+        guard = int(sample_rate * guard_seconds)
+        start = max(0, voiced[0] * frame_size - guard)
+        end = min(len(audio), (voiced[-1] + 1) * frame_size + guard)
+        audio = audio[start:end]
+
+    return np.clip(np.rint(audio), -32768, 32767).astype(np.int16).tobytes()
+
+
+class UploadConditioner:
+    """Applies condition_utterance and tracks bytes saved per turn and in total"""
+    def __init__(self, sample_rate, threshold, enabled=True, guard_seconds=GUARD_SECONDS):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.enabled = enabled
+        self.guard_seconds = guard_seconds
+        self.turns = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.last_saved = 0
+
+    @classmethod
+    def from_env(cls, sample_rate, threshold):
+        enabled = os.getenv("UPLOAD_CONDITIONING", "1") != "0"
+        return cls(sample_rate, threshold, enabled=enabled)
+
+    def __call__(self, pcm):
+        if not self.enabled:
+            return pcm
+        conditioned = condition_utterance(pcm, self.sample_rate, self.threshold,
+                                          self.guard_seconds)
+        self.turns += 1
+        self.bytes_in += len(pcm)
+        self.bytes_out += len(conditioned)
+        self.last_saved = len(pcm) - len(conditioned)
+        return conditioned
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_in - self.bytes_out
+
+    def log_line(self):
+        """One-line report for the last turn, with base64 payload savings"""
+        saved_ms = self.last_saved / 2 / self.sample_rate * 1000
+        return (f"Upload trimmed {self.last_saved} bytes ({saved_ms:.0f} ms, "
+                f"{self.last_saved * 4 // 3} base64 bytes); "
+                f"{self.bytes_saved} bytes saved over {self.turns} turns")
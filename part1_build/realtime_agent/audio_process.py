@@ -0,0 +1,406 @@
+"""Audio capture, playback and VAD in a dedicated process.
+
+With AUDIO_PROCESS=1 the conversation system starts a child process that
+owns the audio backend streams and the ``AudioProcessor``. The PortAudio
+callback then never waits on the conversation process's GIL, so JSON/base64
+work or a GC pause on the asyncio side cannot cause capture dropouts.
+
+The processes exchange pcm16 through two single-producer/single-consumer
+byte rings in ``multiprocessing.shared_memory``:
+
+- capture ring (child -> parent): finished utterances and barge-in audio
+- playback ring (parent -> child): decoded response audio
+
+Each message is a small struct header followed by raw pcm16 bytes, copied
+straight into the shared buffer; a semaphore release per message wakes the
+reader. Nothing is pickled after startup. VAD thresholds, counters and the
+agent-speaking flag live in a shared float64 state block.
+"""
+import multiprocessing as mp
+import os
+import queue
+import signal
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .audio import AudioProcessor
+from .callback_budget import CallbackBudgetMonitor
+
+HEADER = struct.Struct("<BdI")  # kind, monotonic timestamp, payload length
+UTTERANCE, INTERRUPT, PLAYBACK = 1, 2, 3
+RING_BYTES = 4 * 1024 * 1024  # ~87 s of 24 kHz mono pcm16 per direction
+
+# Slots of the shared state block
+(IS_SPEAKING, STOP, READY, VAD_THRESHOLD, INTERRUPT_THRESHOLD, NOISE_FLOOR,
+ TURNS_TRIGGERED, TURNS_WITH_SPEECH, CAPTURE_DROPS, OVERFLOWS, UNDERFLOWS,
+ CALLBACKS, FLUSH_TO) = range(13)
+STATE_SLOTS = 13
+
+
+class SharedRing:
+    """Single-producer/single-consumer message ring in shared memory.
+
+    The first 16 bytes hold the total bytes written and read as uint64
+    counters; each side only advances its own counter, after copying, so
+    the other side never sees a partial message.
+    """
+    def __init__(self, name=None, capacity=RING_BYTES, semaphore=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=16 + capacity)
+            self.shm.buf[:16] = bytes(16)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.capacity = self.shm.size - 16
+        self.positions = np.ndarray(2, dtype=np.uint64, buffer=self.shm.buf[:16])
+        self.data = np.ndarray(self.capacity, dtype=np.uint8, buffer=self.shm.buf[16:])
+        self.semaphore = semaphore if semaphore is not None else mp.Semaphore(0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _copy_in(self, position, payload):
+        start = position % self.capacity
+        first = min(len(payload), self.capacity - start)
+        self.data[start:start + first] = payload[:first]
+        if first < len(payload):
+            self.data[:len(payload) - first] = payload[first:]
+
+    def _copy_out(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        if first == size:
+            return self.data[start:start + size].tobytes()
+        return self.data[start:].tobytes() + self.data[:size - first].tobytes()
+
+    def write(self, kind, payload, timestamp=0.0):
+        """Append one message; returns False (dropping it) if the ring is full"""
+        payload = np.frombuffer(payload, dtype=np.uint8)
+        written, read = int(self.positions[0]), int(self.positions[1])
+        size = HEADER.size + len(payload)
+        if size > self.capacity - (written - read):
+            return False
+        self._copy_in(written, np.frombuffer(HEADER.pack(kind, timestamp, len(payload)),
+                                             dtype=np.uint8))
+        self._copy_in(written + HEADER.size, payload)
+        self.positions[0] = written + size
+        self.semaphore.release()
+        return True
+
+    def read(self, timeout=None):
+        """Return (kind, timestamp, payload) or None if nothing arrived in time"""
+        if not self.semaphore.acquire(timeout=timeout):
+            return None
+        read = int(self.positions[1])
+        if read == int(self.positions[0]):
+            return None  # wakeup for a message skipped by skip_to()
+        kind, timestamp, length = HEADER.unpack(self._copy_out(read, HEADER.size))
+        payload = self._copy_out(read + HEADER.size, length)
+        self.positions[1] = read + HEADER.size + length
+        return kind, timestamp, payload
+
+    def skip_to(self, position):
+        """Reader side: drop every message written before ``position``
+
+        ``position`` must be a write position the writer has published, so
+        it falls on a message boundary.
+        """
+        if position > int(self.positions[1]):
+            self.positions[1] = position
+
+    def close(self, unlink=False):
+        # Drop the numpy views before closing the mapping
+        self.positions = self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _attach_state(name):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(STATE_SLOTS, dtype=np.float64, buffer=shm.buf)
+
+
+def _audio_process_main(backend, sample_rate, blocksize, state_name,
+                        capture_name, capture_sem, playback_name, playback_sem):
+    """Child process entry point: run the streams until STOP is set"""
+    # Ctrl+C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    state_shm, state = _attach_state(state_name)
+    capture = SharedRing(capture_name, semaphore=capture_sem)
+    playback = SharedRing(playback_name, semaphore=playback_sem)
+    processor = AudioProcessor(sample_rate=sample_rate)
+    budget = CallbackBudgetMonitor(sample_rate=sample_rate)
+
+    def publish_vad():
+        state[VAD_THRESHOLD] = processor.vad_threshold
+        state[INTERRUPT_THRESHOLD] = processor.interrupt_threshold
+        state[NOISE_FLOOR] = processor.noise_floor if processor.noise_floor is not None else -1
+        state[TURNS_TRIGGERED] = processor.turns_triggered
+        state[TURNS_WITH_SPEECH] = processor.turns_with_speech
+
+    def send(kind, audio, timestamp=0.0):
+        if not capture.write(kind, audio, timestamp):
+            state[CAPTURE_DROPS] += 1
+
+    interrupt_sent = 0  # bytes of the interrupt buffer already forwarded
+
+    def callback(indata, frames, time_info, status):
+        nonlocal interrupt_sent
+        stream_budget = budget.streams['input']
+        start = stream_budget.begin()
+        if status:
+            stream_budget.record_status(status)
+            state[OVERFLOWS] = stream_budget.overflows
+            return
+        speaking = bool(state[IS_SPEAKING])
+        if processor.is_speaking and not speaking:
+            # Same as the in-process end_response(): barge-in audio becomes
+            # the start of the next utterance
+            processor.end_response()
+            interrupt_sent = 0
+        processor.is_speaking = speaking
+        processor.process_audio(indata)
+        if processor.check_interruption():
+            # The buffer keeps growing for the whole interruption, as in
+            # process; only the new audio is forwarded
+            send(INTERRUPT, bytes(processor.interrupt_buffer[interrupt_sent:]))
+            interrupt_sent = len(processor.interrupt_buffer)
+        elif processor.should_process():
+            speech_end_time = processor.speech_end_time or 0.0
+            send(UTTERANCE, processor.reset(), speech_end_time)
+        publish_vad()
+        state[CALLBACKS] += 1
+        stream_budget.end(start, frames)
+
+    publish_vad()
+    output = backend.open_output(samplerate=sample_rate, channels=1)
+    capture_stream = backend.open_input(callback=callback, samplerate=sample_rate,
+                                        channels=1, blocksize=blocksize)
+    output.start()
+    capture_stream.start()
+    state[READY] = 1
+
+    interval = float(os.getenv("AUDIO_BUDGET_LOG_INTERVAL", "30"))
+    next_log = time.monotonic() + interval
+    try:
+        while not state[STOP]:
+            if state[FLUSH_TO] > int(playback.positions[1]):
+                # Barge-in: drop the queued reply and whatever the device holds
+                playback.skip_to(int(state[FLUSH_TO]))
+                output.abort()
+                output.start()
+            message = playback.read(timeout=0.1)
+            if message:
+                audio = np.frombuffer(message[2], dtype=np.int16)
+                stream_budget = budget.streams['output']
+                start = stream_budget.begin()
+                if output.write(audio):
+                    stream_budget.underflows += 1
+                    state[UNDERFLOWS] = stream_budget.underflows
+                stream_budget.end(start, len(audio))
+            if interval > 0 and time.monotonic() >= next_log:
+                print("Audio process " + budget.log_line())
+                next_log += interval
+    finally:
+        for stream in (capture_stream, output):
+            stream.stop()
+            stream.close()
+        capture.close()
+        playback.close()
+        state = None
+        state_shm.close()
+
+
+class RemoteAudioProcessor:
+    """Conversation-side stand-in for AudioProcessor backed by the capture ring.
+
+    Implements the parts of the AudioProcessor interface ConversationSystem
+    uses; utterances arrive already segmented by the audio process.
+    """
+    def __init__(self, audio_process):
+        self.audio_process = audio_process
+        self.main_buffer = bytearray()
+        self.interrupt_buffer = bytearray()
+        self.speech_end_time = None
+        self._utterances = queue.SimpleQueue()
+
+    @property
+    def is_speaking(self):
+        return bool(self.audio_process.state[IS_SPEAKING])
+
+    @is_speaking.setter
+    def is_speaking(self, value):
+        self.audio_process.state[IS_SPEAKING] = 1.0 if value else 0.0
+
+    @property
+    def vad_threshold(self):
+        return float(self.audio_process.state[VAD_THRESHOLD])
+
+    @property
+    def interrupt_threshold(self):
+        return float(self.audio_process.state[INTERRUPT_THRESHOLD])
+
+    def _drain(self):
+        while True:
+            message = self.audio_process.capture.read(timeout=0)
+            if message is None:
+                return
+            kind, timestamp, payload = message
+            if kind == INTERRUPT:
+                # Once the agent stops, the audio process puts the barge-in
+                # audio into the next utterance itself
+                if self.is_speaking:
+                    self.interrupt_buffer.extend(payload)
+            elif kind == UTTERANCE:
+                self._utterances.put((timestamp or None, payload))
+
+    def end_response(self):
+        """The audio process carries barge-in audio over into the utterance
+        it is now collecting, so the forwarded copy is dropped here"""
+        self._drain()
+        self.is_speaking = False
+        self.interrupt_buffer.clear()
+
+    def should_process(self):
+        self._drain()
+        if self.main_buffer:
+            return True
+        if self._utterances.empty():
+            return False
+        self.speech_end_time, payload = self._utterances.get()
+        self.main_buffer.extend(payload)
+        return True
+
+    def reset(self):
+        audio_data = bytes(self.main_buffer)
+        self.main_buffer.clear()
+        return audio_data
+
+    def check_interruption(self):
+        self._drain()
+        return bool(self.interrupt_buffer)
+
+    def get_interrupt_audio(self):
+        if not self.interrupt_buffer:
+            return None
+        audio_data = bytes(self.interrupt_buffer)
+        self.interrupt_buffer.clear()
+        return audio_data
+
+    def vad_stats(self):
+        state = self.audio_process.state
+        floor = float(state[NOISE_FLOOR])
+        triggered, with_speech = int(state[TURNS_TRIGGERED]), int(state[TURNS_WITH_SPEECH])
+        return {
+            "noise_floor": floor if floor >= 0 else None,
+            "vad_threshold": float(state[VAD_THRESHOLD]),
+            "interrupt_threshold": float(state[INTERRUPT_THRESHOLD]),
+            "turns_triggered": triggered,
+            "turns_with_speech": with_speech,
+            "phantom_turns": triggered - with_speech,
+        }
+
+
+class RingOutputStream:
+    """Output stream that forwards playback audio to the audio process"""
+    def __init__(self, audio_process):
+        self.audio_process = audio_process
+        self.dropped = 0
+
+    def write(self, audio):
+        if not self.audio_process.playback.write(PLAYBACK, np.ascontiguousarray(audio)):
+            self.dropped += 1
+        return False  # underflows are counted in the audio process
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def abort(self):
+        """Ask the audio process to drop everything queued so far"""
+        self.audio_process.state[FLUSH_TO] = float(self.audio_process.playback.positions[0])
+
+    def close(self):
+        pass
+
+
+class AudioProcess:
+    """Owns the child process, its shared memory and the parent-side proxies.
+
+    ``processor`` stands in for the conversation's ``AudioProcessor``; the
+    object itself serves as its input stream: ``start()`` launches the child,
+    ``close()`` stops it and frees shared memory.
+    """
+    def __init__(self, backend, sample_rate, blocksize, start_timeout=10.0):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.start_timeout = start_timeout
+        self.context = mp.get_context("spawn")
+        self.state_shm = shared_memory.SharedMemory(create=True, size=STATE_SLOTS * 8)
+        self.state = np.ndarray(STATE_SLOTS, dtype=np.float64, buffer=self.state_shm.buf)
+        self.state[:] = 0
+        self.capture = SharedRing(semaphore=self.context.Semaphore(0))
+        self.playback = SharedRing(semaphore=self.context.Semaphore(0))
+        self.processor = RemoteAudioProcessor(self)
+        self.process = None
+        self.active = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.process = self.context.Process(
+            target=_audio_process_main, name="realtime-audio",
+            args=(self.backend, self.sample_rate, self.blocksize, self.state_shm.name,
+                  self.capture.name, self.capture.semaphore,
+                  self.playback.name, self.playback.semaphore),
+            daemon=True)
+        self.process.start()
+        deadline = time.monotonic() + self.start_timeout
+        while not self.state[READY]:
+            if not self.process.is_alive():
+                raise RuntimeError("Audio process exited during startup")
+            if time.monotonic() > deadline:
+                raise RuntimeError("Audio process did not start in time")
+            time.sleep(0.01)
+        self.active = True
+
+    def stop(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            self.state[STOP] = 1
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.capture.close(unlink=True)
+            self.playback.close(unlink=True)
+            # Keep the final counters readable after the shared block is gone
+            self.state = self.state.copy()
+            self.state_shm.close()
+            self.state_shm.unlink()
+
+    def stats(self):
+        """Counters maintained by the audio process"""
+        return {
+            "callbacks": int(self.state[CALLBACKS]),
+            "overflows": int(self.state[OVERFLOWS]),
+            "underflows": int(self.state[UNDERFLOWS]),
+            "capture_drops": int(self.state[CAPTURE_DROPS]),
+        }
@@ -0,0 +1,205 @@
+"""Structured audit log of calls, written off the event loop.
+
+``AuditLogger.log()`` only appends a dict to a bounded in-memory queue; a
+background thread serializes queued events in batches to JSON lines, rotates
+files by size and fsyncs on a configurable cadence. Enable it with
+AUDIT_LOG_DIR=<directory>; the other settings are
+
+    AUDIT_LOG_MAX_QUEUE      events held in memory (default 10000)
+    AUDIT_LOG_POLICY         when the queue is full: drop_oldest (default),
+                             drop_newest, or block (wait up to
+                             AUDIT_LOG_BLOCK_SECONDS, then drop the new event)
+    AUDIT_LOG_FSYNC          batch (fsync after every batch), interval
+                             (every AUDIT_LOG_FSYNC_SECONDS, default) or never
+    AUDIT_LOG_MAX_MB         size at which a new file is started (default 64)
+
+Files are named audit-<start time>-<sequence>.jsonl and are never deleted
+or renamed once written.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+FSYNC_MODES = ("batch", "interval", "never")
+
+
+class AuditLogger:
+    """Bounded, batched, write-behind JSONL logger"""
+    def __init__(self, directory, max_queue=10000, policy="drop_oldest", block_seconds=0.05,
+                 batch_size=256, flush_interval=0.2, fsync="interval", fsync_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, clock=time.time):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit queue policy '{policy}', expected one of {POLICIES}")
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode '{fsync}', expected one of {FSYNC_MODES}")
+        self.directory = directory
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_seconds = block_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.files = 0
+        self.high_water = 0
+        self.error = None
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._closing = False
+        self._file = None
+        self._file_bytes = 0
+        self._last_fsync = time.monotonic()
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls):
+        """Create a logger if AUDIT_LOG_DIR is set, otherwise return None"""
+        directory = os.getenv("AUDIT_LOG_DIR")
+        if not directory:
+            return None
+        return cls(directory,
+                   max_queue=int(os.getenv("AUDIT_LOG_MAX_QUEUE", "10000")),
+                   policy=os.getenv("AUDIT_LOG_POLICY", "drop_oldest"),
+                   block_seconds=float(os.getenv("AUDIT_LOG_BLOCK_SECONDS", "0.05")),
+                   fsync=os.getenv("AUDIT_LOG_FSYNC", "interval"),
+                   fsync_interval=float(os.getenv("AUDIT_LOG_FSYNC_SECONDS", "1.0")),
+                   max_bytes=int(float(os.getenv("AUDIT_LOG_MAX_MB", "64")) * 1024 * 1024))
+
+    def log(self, call_id, event_type, **fields):
+        """Queue one event; returns False if it was dropped"""
+        event = {"ts": self.clock(), "call_id": call_id, "type": event_type, **fields}
+        with self._condition:
+            if self._closing:
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    # Backpressure: wait briefly for the writer, then give up
+                    self._condition.wait_for(lambda: len(self._queue) < self.max_queue,
+                                             self.block_seconds)
+                    if len(self._queue) >= self.max_queue:
+                        self.dropped += 1
+                        return False
+            self._queue.append(event)
+            self.enqueued += 1
+            self.high_water = max(self.high_water, len(self._queue))
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def _open_next(self):
+        if self._file:
+            self._sync(force=True)
+            self._file.close()
+        self.files += 1
+        path = os.path.join(self.directory, f"audit-{self._started}-{self.files:04d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_bytes = self._file.tell()
+
+    def _sync(self, force=False):
+        if self.fsync == "never" and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == "batch" or now - self._last_fsync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+            self.fsyncs += 1
+
+    def _write_batch(self, batch):
+        data = "".join(json.dumps(event, default=str) + "\n" for event in batch)
+        if self._file is None or self._file_bytes + len(data) > self.max_bytes:
+            self._open_next()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(batch)
+        self.batches += 1
+        self._sync()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closing or len(self._queue) >= self.batch_size,
+                    self.flush_interval)
+                count = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+                closing = self._closing and not self._queue
+                self._condition.notify_all()  # wake producers waiting for room
+            try:
+                if batch:
+                    self._write_batch(batch)
+                elif self._file and self.fsync == "interval":
+                    self._sync()
+            except Exception as e:
+                self.error = e
+                print(f"Audit log write failed: {e}")
+            if closing:
+                break
+
+    def metrics(self):
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": len(self._queue),
+            "high_water": self.high_water,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "files": self.files,
+        }
+
+    def log_line(self):
+        stats = self.metrics()
+        return (f"Audit log | {stats['written']}/{stats['enqueued']} events written, "
+                f"{stats['dropped']} dropped ({self.policy}) | queue {stats['queued']}, "
+                f"high water {stats['high_water']}/{self.max_queue} | {stats['batches']} batches, "
+                f"{stats['fsyncs']} fsyncs ({self.fsync}), {stats['files']} files")
+
+    def close(self):
+        """Write everything still queued, fsync and close the current file"""
+        with self._condition:
+            if self._closing:
+                return
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._file:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+
+
+_shared = None
+
+
+def shared_audit_logger():
+    """Process-wide logger from the environment (None when AUDIT_LOG_DIR is unset)"""
+    global _shared
+    if _shared is None:
+        _shared = AuditLogger.from_env() or False
+        if _shared:
+            atexit.register(_shared.close)
+    return _shared or None
@@ -0,0 +1,163 @@
+"""Snapshot and restore of a live call so another worker can resume it.
+
+A ``CallSnapshot`` holds everything a call needs that is not on the wire:
+the call ID and persona, the ``AudioProcessor`` buffers, counters and
+adaptive thresholds, persona state (``call_state()``, e.g. the insurance
+conversation state) and the conversation items seen so far. Realtime
+sessions cannot be moved, so the new worker opens a fresh session and
+replays the items with conversation.item.create under their original IDs.
+
+Conversation items are only kept with CALL_HANDOFF=1 (the last
+CALL_HANDOFF_HISTORY items, default 40). A caller turn is kept as text once
+its transcript arrives and as its uploaded pcm16 audio until then, so enable
+input transcription to keep snapshots small.
+
+The binary format is a header (magic, version, metadata length), the
+metadata as zlib-compressed JSON and then the length-prefixed byte blobs it
+refers to by index (audio buffers, the noise level window, caller audio)::
+
+    python -m realtime_agent.call_migration call.snapshot
+"""
+import base64
+import json
+import struct
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+MAGIC = b"RTCS"
+VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+_BLOB = struct.Struct("<I")
+
+# Plain AudioProcessor attributes carried over as they are
+_PROCESSOR_FIELDS = ("vad_threshold", "interrupt_threshold", "noise_count", "noise_floor",
+                     "_samples_since_update", "turns_triggered", "turns_with_speech",
+                     "last_turn_had_speech", "speech_frames", "silence_frames",
+                     "speech_detected", "is_interrupting")
+
+
+class CallSnapshot:
+    """Serializable state of one call between turns"""
+    def __init__(self, state, blobs):
+        self.state = state
+        self.blobs = blobs
+
+    @classmethod
+    def capture(cls, system):
+        blobs = []
+
+        def blob(data):
+            blobs.append(bytes(data))
+            return len(blobs) - 1
+
+        processor = system.audio_processor
+        audio = {name: getattr(processor, name) for name in _PROCESSOR_FIELDS}
+        audio["main_buffer"] = blob(processor.main_buffer)
+        audio["interrupt_buffer"] = blob(processor.interrupt_buffer)
+        audio["noise_levels"] = blob(processor.noise_levels.astype(np.float64).tobytes())
+        # Monotonic clocks differ between hosts, so keep an age instead
+        if processor.speech_end_time is not None:
+            audio["speech_end_age"] = time.monotonic() - processor.speech_end_time
+
+        items = []
+        for item in system.history or ():
+            entry = {key: value for key, value in item.items() if key != "audio"}
+            if item.get("audio") is not None:
+                entry["audio"] = blob(item["audio"])
+            items.append(entry)
+        state = {"call": system.call_state(), "audio": audio, "items": items,
+                 "history": system.history is not None, "captured": time.time()}
+        return cls(state, blobs)
+
+    def restore(self, system):
+        """Load the snapshot into a system that has not started its call yet"""
+        system.restore_call_state(self.state["call"])
+        processor = system.audio_processor
+        audio = self.state["audio"]
+        for name in _PROCESSOR_FIELDS:
+            setattr(processor, name, audio[name])
+        processor.main_buffer = bytearray(self.blobs[audio["main_buffer"]])
+        processor.interrupt_buffer = bytearray(self.blobs[audio["interrupt_buffer"]])
+        processor.noise_levels = np.frombuffer(self.blobs[audio["noise_levels"]],
+                                               dtype=np.float64).copy()
+        if "speech_end_age" in audio:
+            processor.speech_end_time = time.monotonic() - audio["speech_end_age"]
+        if self.state["history"]:
+            maxlen = system.history.maxlen if system.history is not None else None
+            system.history = deque(maxlen=maxlen)
+            for entry in self.state["items"]:
+                item = dict(entry)
+                item["audio"] = self.blobs[entry["audio"]] if "audio" in entry else None
+                system.history.append(item)
+
+    def replay_events(self):
+        """conversation.item.create events rebuilding the conversation"""
+        events = []
+        for entry in self.state["items"]:
+            if entry["role"] == "user":
+                if entry.get("text") is not None:
+                    content = [{"type": "input_text", "text": entry["text"]}]
+                elif "audio" in entry:
+                    audio = base64.b64encode(self.blobs[entry["audio"]]).decode("utf-8")
+                    content = [{"type": "input_audio", "audio": audio}]
+                else:
+                    continue
+            else:
+                content = [{"type": "text", "text": entry.get("text") or ""}]
+            item = {"type": "message", "role": entry["role"], "content": content}
+            if entry.get("item_id"):
+                item["id"] = entry["item_id"]
+            events.append({"type": "conversation.item.create", "item": item})
+        return events
+
+    def to_bytes(self):
+        meta = zlib.compress(json.dumps(self.state, separators=(",", ":")).encode("utf-8"))
+        parts = [_HEADER.pack(MAGIC, VERSION, len(meta)), meta]
+        for data in self.blobs:
+            parts.append(_BLOB.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        view = memoryview(data)
+        magic, version, meta_len = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} call snapshot")
+        offset = _HEADER.size
+        state = json.loads(zlib.decompress(view[offset:offset + meta_len]))
+        offset += meta_len
+        blobs = []
+        while offset < len(view):
+            (size,) = _BLOB.unpack_from(view, offset)
+            offset += _BLOB.size
+            blobs.append(bytes(view[offset:offset + size]))
+            offset += size
+        return cls(state, blobs)
+
+    def summary(self):
+        items = self.state["items"]
+        return {
+            "call_id": self.state["call"]["call_id"],
+            "persona": self.state["call"]["persona"],
+            "bytes": len(self.to_bytes()),
+            "audio_bytes": sum(len(data) for data in self.blobs),
+            "items": len(items),
+            "items_as_audio": sum(1 for entry in items if "audio" in entry),
+            "buffered_seconds": (len(self.blobs[self.state["audio"]["main_buffer"]])
+                                 / 2 / SAMPLE_RATE),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            snapshot = CallSnapshot.from_bytes(f.read())
+        print(f"{path}: {snapshot.summary()}")
+        print(f"  state: {snapshot.state['call']}")
@@ -0,0 +1,99 @@
+"""Execution-time budget and xrun accounting for the audio capture/playback paths.
+
+Each stream keeps preallocated numpy rings of recent execution times and
+budget utilizations, so recording a callback only writes into existing arrays
+and bumps counters - nothing is appended, formatted or printed on the audio
+thread. Aggregation (rolling max, means) happens on the reader side.
+"""
+import asyncio
+import os
+import time
+
+import numpy as np
+
+
+class StreamBudget:
+    """Timing and xrun counters for one audio stream"""
+    def __init__(self, name, sample_rate, window=256):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.window = window
+        self.durations_ns = np.zeros(window, dtype=np.int64)
+        self.utilization = np.zeros(window, dtype=np.float64)
+        self.index = 0
+        self.calls = 0
+        self.total_ns = 0
+        self.overflows = 0
+        self.underflows = 0
+
+    def begin(self):
+        return time.perf_counter_ns()
+
+    def end(self, start_ns, frames):
+        """Record one callback/write that handled ``frames`` samples"""
+        elapsed = time.perf_counter_ns() - start_ns
+        slot = self.index
+        self.durations_ns[slot] = elapsed
+        # Budget is the wall time the block represents: frames / sample_rate
+        self.utilization[slot] = elapsed * self.sample_rate / (frames * 1e9) if frames else 0.0
+        self.index = (slot + 1) % self.window
+        self.calls += 1
+        self.total_ns += elapsed
+
+    def record_status(self, status):
+        """Count xruns reported in a sounddevice CallbackFlags value"""
+        if status.input_overflow or status.output_overflow:
+            self.overflows += 1
+        if status.input_underflow or status.output_underflow:
+            self.underflows += 1
+
+    def snapshot(self):
+        filled = min(self.calls, self.window)
+        if filled:
+            durations = self.durations_ns[:filled]
+            utilization = self.utilization[:filled]
+            max_ms = float(durations.max()) / 1e6
+            max_utilization = float(utilization.max())
+            mean_utilization = float(utilization.mean())
+        else:
+            max_ms = max_utilization = mean_utilization = 0.0
+        return {
+            "calls": self.calls,
+            "mean_ms": self.total_ns / self.calls / 1e6 if self.calls else 0.0,
+            "rolling_max_ms": max_ms,
+            "rolling_max_utilization": max_utilization,
+            "rolling_mean_utilization": mean_utilization,
+            "overflows": self.overflows,
+            "underflows": self.underflows,
+        }
+
+
+class CallbackBudgetMonitor:
+    """Collects StreamBudget instances and reports them as metrics or log lines"""
+    def __init__(self, sample_rate=24000, window=256):
+        self.streams = {
+            'input': StreamBudget('input', sample_rate, window),
+            'output': StreamBudget('output', sample_rate, window),
+        }
+
+    def metrics(self):
+        return {name: budget.snapshot() for name, budget in self.streams.items()}
+
+    def log_line(self):
+        parts = []
+        for name, stats in self.metrics().items():
+            parts.append(
+                f"{name}: {stats['calls']} calls, max {stats['rolling_max_ms']:.2f} ms "
+                f"({stats['rolling_max_utilization']:.0%} of budget), "
+                f"overflows {stats['overflows']}, underflows {stats['underflows']}")
+        return "Audio budget | " + " | ".join(parts)
+
+    async def log_periodically(self, interval=None):
+        """Print a budget line every AUDIO_BUDGET_LOG_INTERVAL seconds (0 disables)"""
+        if interval is None:
+            interval = float(os.getenv("AUDIO_BUDGET_LOG_INTERVAL", "30"))
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            print(self.log_line())
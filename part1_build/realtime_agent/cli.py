@@ -0,0 +1,47 @@
+"""Command-line entry point: python -m realtime_agent --persona insurance"""
+import time
+
+_CLI_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+
+from .personas import PERSONAS, create_system  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="realtime_agent",
+                                     description="Realtime API voice agent")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="assistant")
+    parser.add_argument("--list-personas", action="store_true")
+    parser.add_argument("--audio-backend",
+                        help="audio backend spec, e.g. 'null' or 'wav:input=caller.wav' "
+                             "(defaults to AUDIO_BACKEND or sounddevice)")
+    parser.add_argument("--audio-process", action="store_true", default=None,
+                        help="run capture, playback and VAD in a separate process "
+                             "(defaults to AUDIO_PROCESS=1)")
+    parser.add_argument("--server-vad", action="store_true", default=None,
+                        help="stream the microphone and let the server detect turns "
+                             "(defaults to SERVER_VAD=1)")
+    parser.add_argument("--url", help="Realtime endpoint override (e.g. a local mock server)")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="exit once ready for conversation and print cold-start timings")
+    args = parser.parse_args(argv)
+
+    if args.list_personas:
+        for name, persona in sorted(PERSONAS.items()):
+            print(f"{name:<12} {persona['description']}")
+        return 0
+
+    # The audio and network stack is only imported from here on
+    from .audio_backends import create_backend
+
+    system = create_system(args.persona, url=args.url,
+                           audio_backend=create_backend(args.audio_backend),
+                           audio_process=args.audio_process, server_vad=args.server_vad)
+    system.startup_origin = _CLI_STARTED
+    try:
+        asyncio.run(system.run(exit_when_ready=args.measure_startup))
+    except KeyboardInterrupt:
+        print("\nShutting down gracefully...")
+    return 0
@@ -0,0 +1,794 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+from collections import deque
+
+import websockets
+from dotenv import load_dotenv
+
+from .admission import AdmissionRejected, retry_after, shared_scheduler
+from .audit_log import shared_audit_logger
+from .audio import AudioProcessor, BLOCK_SIZE, SAMPLE_RATE, decode_audio_delta, encode_audio
+from .audio_backends import create_backend
+from .audio_conditioning import UploadConditioner
+from .call_migration import CallSnapshot
+from .callback_budget import CallbackBudgetMonitor
+from .endpoints import shared_endpoints
+from .event_trace import ChromeTracer
+from .keyword_spotter import KeywordSpotter
+from .latency_tracing import DEFAULT_OUTPUT, TurnLatencyTracer
+from .loop_lag import TIER_BUFFERED, TIER_NAMES, TIER_QUIET, TIER_REFUSE_CALLS, shared_lag_monitor
+from .personas import PERSONAS, TURN_DETECTION
+from .session_recording import KIND_WS_RECV, KIND_WS_SEND, SessionRecorder
+from .speculation import SpeculativeCommit
+from .usage import shared_usage_ledger
+
+
+def realtime_url(api_key, resource=None, deployment=None):
+    """Realtime endpoint URL; REALTIME_URL overrides the default (e.g. a local mock server)"""
+    override = os.getenv("REALTIME_URL")
+    if override and resource is None:
+        return override
+    return (
+        f"wss://{resource or 'aoai-ep-swedencentral02'}.openai.azure.com/openai/realtime?"
+        f"api-version=2024-10-01-preview&deployment={deployment or 'gpt-4o-realtime-preview'}&"
+        f"api-key={api_key}"
+    )
+
+
+class ConversationSystem:
+    """Voice conversation over the Realtime API with client-side VAD and barge-in.
+
+    With ``server_vad`` (SERVER_VAD=1) the microphone is streamed continuously
+    instead, and turns are driven by the server's speech_started/speech_stopped
+    events and the responses it creates on its own.
+    """
+    def __init__(self, persona="assistant", audio_backend=None, url=None, audio_process=None,
+                 scheduler=None, lag_monitor=None, endpoints=None, server_vad=None,
+                 speculation=None, keyword_spotter=None):
+        load_dotenv()
+        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
+        if not self.api_key and not (url or endpoints or os.getenv("REALTIME_URL")
+                                     or os.getenv("REALTIME_ENDPOINTS")):
+            raise ValueError("AZURE_OPENAI_API_KEY not found")
+        self.url = url or realtime_url(self.api_key)
+        # Several endpoints are raced per call and ranked by health (see endpoints.py)
+        if endpoints is None and url is None:
+            endpoints = shared_endpoints(
+                lambda resource, deployment: realtime_url(self.api_key, resource, deployment))
+        self.endpoints = endpoints
+        self.endpoint = None  # the endpoint serving this call, when racing
+        self._response_sent = None
+        self.persona = persona
+        self.persona_config = PERSONAS[persona]
+
+        self.audio_processor = AudioProcessor(sample_rate=SAMPLE_RATE)
+        self.upload_conditioner = UploadConditioner.from_env(
+            SAMPLE_RATE, self.audio_processor.vad_threshold)
+        self.streams = {'input': None, 'output': None}
+        self.audio_backend = audio_backend or create_backend()
+        # Run capture, playback and VAD in a separate process (see audio_process.py)
+        if audio_process is None:
+            audio_process = os.getenv("AUDIO_PROCESS") == "1"
+        self.audio_process = audio_process
+        if server_vad is None:
+            server_vad = os.getenv("SERVER_VAD") == "1"
+        if server_vad and audio_process:
+            raise ValueError("Server VAD streams capture from this process; "
+                             "it cannot be combined with the audio process")
+        self.server_vad = server_vad
+        self._mic_queue = None  # blocks waiting to be streamed in server VAD mode
+        self._response_active = False
+        self._response_requested = False  # response.create sent, response.done not yet seen
+        self._cancel_pending = False  # response.cancel sent, response.done not yet seen
+        # Send turns after a short pause and hold the reply (see speculation.py)
+        self.speculation = speculation or SpeculativeCommit.from_env()
+        if self.speculation.enabled and (server_vad or audio_process):
+            print("Speculative commit needs client-side VAD in this process; disabled")
+            self.speculation.enabled = False
+        self._held = None  # speculative response audio waiting for confirmation
+        self._first_audio_at = None
+        self._responses_done = 0
+        self._turn_items = []  # conversation items created for the current turn
+        # Spoken commands that stop the agent on the spot (see keyword_spotter.py)
+        self.keyword_spotter = keyword_spotter or KeywordSpotter.from_env()
+        if self.keyword_spotter and (server_vad or audio_process):
+            print("Keyword commands need client-side VAD in this process; disabled")
+            self.keyword_spotter = None
+        self._keyword_stop = False  # the current response was stopped by a command
+        self._keyword_cancel = None  # keeps the response.cancel send task referenced
+        self._ws = None
+        # Shared quotas across every conversation in the process (see admission.py)
+        self.scheduler = scheduler or shared_scheduler()
+        self.response_token_estimate = int(os.getenv("REALTIME_RESPONSE_TOKEN_ESTIMATE", "300"))
+        self.rate_limit_retries = int(os.getenv("REALTIME_RATE_LIMIT_RETRIES", "3"))
+        self._rate_limited = 0  # refused response.create attempts this turn
+        self._pending_estimate = 0
+
+        # Instrumentation; each piece is a no-op unless enabled from the environment
+        self.tracer = TurnLatencyTracer.from_env()
+        self.recorder = SessionRecorder.from_env()
+        self.audio_budget = CallbackBudgetMonitor(sample_rate=SAMPLE_RATE)
+        self.profiler = ChromeTracer.from_env()
+        self.profiler.instrument(
+            self, ["audio_callback", "setup_websocket_session", "send_audio"])
+        self.call_id = uuid.uuid4().hex[:12]
+        self.audit = shared_audit_logger()
+        self.verbose = True
+        # Tokens, audio and cost for this call, rolled up when it ends (see usage.py)
+        self.usage_ledger = shared_usage_ledger()
+        self.usage = self.usage_ledger.new_call()
+        # Items replayed when the call moves to another worker (see call_migration.py)
+        self.history = (deque(maxlen=int(os.getenv("CALL_HANDOFF_HISTORY", "40")))
+                        if os.getenv("CALL_HANDOFF") == "1" else None)
+        self._handoff = None  # future for the snapshot, once a handoff is requested
+        self._resume = None  # snapshot this call continues from
+        self._items_created = 0
+
+        # Degrade gracefully when the event loop falls behind (see loop_lag.py)
+        self.lag_monitor = lag_monitor or shared_lag_monitor()
+        self._tracing = None  # tracer and profiler flags, saved while degraded
+        self.lag_jitter_seconds = float(os.getenv("LOOP_LAG_JITTER_MS", "200")) / 1000
+        self.jitter_seconds = 0.0  # response audio held back before playout starts
+        self._jitter = []
+        self._jitter_samples = 0
+        self._playout_started = False
+
+        self.startup_origin = None  # set by the CLI so cold start includes imports
+        self.startup = {}
+        self._connected = None
+        self._discard_audio = False
+        self._loop = None
+
+    def audio_callback(self, indata, frames, time, status):
+        capture = self.audio_budget.streams['input']
+        start = capture.begin()
+        if status:
+            # Counted here and reported by the periodic budget log line
+            capture.record_status(status)
+            return
+        if self.recorder:
+            self.recorder.record_mic(indata)
+        if self._mic_queue is not None:
+            self._loop.call_soon_threadsafe(self._mic_queue.put_nowait, indata.tobytes())
+        elif self.keyword_spotter and self.audio_processor.is_speaking:
+            keyword = self.keyword_spotter.process(indata)
+            if keyword:
+                self._loop.call_soon_threadsafe(self._on_keyword, keyword)
+            else:
+                self.audio_processor.process_audio(indata)
+        else:
+            if self.keyword_spotter:
+                self.keyword_spotter.reset()
+            self.audio_processor.process_audio(indata)
+        capture.end(start, frames)
+
+    def connect(self, url=None):
+        """Open the Realtime API WebSocket connection"""
+        return websockets.connect(url or self.url, max_size=None)
+
+    async def _open_on(self, endpoint):
+        websocket = await self.connect(endpoint.url)
+        try:
+            created = await self.setup_websocket_session(websocket)
+        except BaseException:
+            await websocket.close()
+            raise
+        return websocket, created
+
+    @contextlib.asynccontextmanager
+    async def open_session(self):
+        """Connect and set up the session, racing endpoints when several are configured"""
+        if not self.endpoints or len(self.endpoints.endpoints) < 2:
+            async with self.connect() as ws:
+                self._connected = time.perf_counter()
+                if self.recorder:
+                    ws = self.recorder.wrap(ws)
+                await self.setup_websocket_session(ws)
+                yield ws
+            return
+        self.endpoint, (ws, created) = await self.endpoints.race(
+            self._open_on, close=lambda session: session[0].close())
+        self._connected = time.perf_counter()  # connect and setup overlap while racing
+        print(f"Session opened on {self.endpoint.name}")
+        self.audit_event("endpoint_selected", endpoint=self.endpoint.name)
+        try:
+            if self.recorder:
+                # The setup frames were exchanged before the race was decided
+                self.recorder.record_frame(KIND_WS_SEND, json.dumps(self.session_config()))
+                self.recorder.record_frame(KIND_WS_RECV, json.dumps(created))
+                ws = self.recorder.wrap(ws)
+            yield ws
+        finally:
+            await ws.close()
+
+    def _open_streams(self):
+        if self.audio_process:
+            from .audio_process import AudioProcess, RingOutputStream
+            process = AudioProcess(self.audio_backend, SAMPLE_RATE, BLOCK_SIZE)
+            self.audio_processor = process.processor
+            self.streams['input'] = process
+            self.streams['output'] = RingOutputStream(process)
+            process.start()
+            return
+        self.streams['output'] = self.audio_backend.open_output(
+            samplerate=SAMPLE_RATE, channels=1)
+        self.streams['input'] = self.audio_backend.open_input(
+            callback=self.audio_callback, samplerate=SAMPLE_RATE, channels=1,
+            blocksize=BLOCK_SIZE)
+        for stream in self.streams.values():
+            stream.start()
+
+    async def setup_audio(self):
+        """Initialize audio streams off the event loop so device probing
+        overlaps with the WebSocket handshake"""
+        await asyncio.to_thread(self._open_streams)
+
+    def session_config(self):
+        return {
+            "type": "session.update",
+            "session": {
+                "voice": self.persona_config["voice"],
+                "instructions": self.persona_config["instructions"],
+                "modalities": ["audio", "text"],
+                "input_audio_format": "pcm16",
+                "output_audio_format": "pcm16",
+                # Only one side decides when a turn ends
+                "turn_detection": dict(TURN_DETECTION) if self.server_vad else None,
+            }
+        }
+
+    async def setup_websocket_session(self, websocket):
+        """Initialize the conversation session"""
+        await websocket.send(json.dumps(self.session_config()))
+
+        while True:
+            response = json.loads(await websocket.recv())
+            if response["type"] == "session.created":
+                return response
+            if response["type"] == "error":
+                raise Exception(f"Session setup failed: {response}")
+
+    def customer_id(self):
+        """Customer the call is attributed to in usage records, if known"""
+        return None
+
+    def call_state(self):
+        """JSON-serializable state a worker resuming this call needs"""
+        return {"call_id": self.call_id, "persona": self.persona}
+
+    def restore_call_state(self, state):
+        if state["persona"] != self.persona:
+            raise ValueError(f"Snapshot of a {state['persona']} call cannot resume "
+                             f"as {self.persona}")
+        self.call_id = state["call_id"]
+
+    def remember(self, role, item_id=None, text=None, audio=None):
+        """Keep a conversation item for a later handoff"""
+        if self.history is not None:
+            self.history.append({"role": role, "item_id": item_id, "text": text, "audio": audio})
+
+    async def hand_off(self):
+        """Stop the call at the next turn boundary and return its CallSnapshot"""
+        if self.history is None:
+            raise ValueError("Handing off a call needs CALL_HANDOFF=1 to keep its context")
+        if self.server_vad or self.audio_process:
+            raise ValueError("Only in-process client-side VAD calls can be handed off")
+        self._handoff = asyncio.get_running_loop().create_future()
+        return await self._handoff
+
+    def resume_from(self, snapshot):
+        """Continue the call in ``snapshot``; capture can be fed from now on and
+        the conversation is replayed once run() has a session"""
+        snapshot.restore(self)
+        self._resume = snapshot
+
+    async def _replay_context(self, websocket):
+        """Rebuild the conversation on a fresh session from the snapshot"""
+        started = time.perf_counter()
+        events = self._resume.replay_events()
+        expected = self._items_created + len(events)
+        for event in events:
+            await websocket.send(json.dumps(event))
+        await self._receive_until(websocket, lambda: self._items_created >= expected,
+                                  timeout=5.0)
+        self.startup["replay_ms"] = (time.perf_counter() - started) * 1000
+        print(f"Resumed call {self.call_id}: {len(events)} items replayed in "
+              f"{self.startup['replay_ms']:.0f} ms")
+        self.audit_event("call_resumed", items=len(events))
+
+    def audit_event(self, event_type, **fields):
+        """Queue an event for the audit log (AUDIT_LOG_DIR); never blocks the loop for long"""
+        if self.audit:
+            self.audit.log(self.call_id, event_type, **fields)
+
+    async def send_audio(self, websocket, audio_data):
+        """Send audio data to the API and request a response"""
+        await self.upload_audio(websocket, audio_data)
+        await self.create_response(websocket)
+
+    async def upload_audio(self, websocket, audio_data):
+        """Append and commit one utterance to the input audio buffer"""
+        self.tracer.mark("send_start")
+        if self.upload_conditioner.enabled:
+            self.upload_conditioner.threshold = self.audio_processor.vad_threshold
+            audio_data = self.upload_conditioner(audio_data)
+            if self.verbose:
+                print(self.upload_conditioner.log_line())
+        await websocket.send(json.dumps({
+            "type": "input_audio_buffer.append",
+            "audio": encode_audio(audio_data)
+        }))
+        await websocket.send(json.dumps({"type": "input_audio_buffer.commit"}))
+        self.usage.uploaded_seconds += len(audio_data) / 2 / SAMPLE_RATE
+        self.remember("user", audio=audio_data)
+        self.audit_event("user_audio", seconds=round(len(audio_data) / 2 / SAMPLE_RATE, 3))
+        # ~10 input tokens per second of audio plus the expected reply
+        self._pending_estimate = (len(audio_data) // 2 // (SAMPLE_RATE // 10)
+                                  + self.response_token_estimate)
+
+    async def create_response(self, websocket, instructions=None):
+        """Ask the model to respond, within the admission quotas"""
+        if self.scheduler:
+            await self.scheduler.admit_response(self._pending_estimate)
+        response = {"modalities": ["audio", "text"]}
+        if instructions:
+            response["instructions"] = instructions
+        await websocket.send(json.dumps({"type": "response.create", "response": response}))
+        self._response_requested = True
+        self.tracer.mark("send_done")
+        self._response_sent = time.perf_counter()
+
+    def play_audio_delta(self, delta):
+        """Decode one response.audio.delta and write it to the output stream"""
+        self.tracer.mark("first_delta")
+        with self.profiler.span("base64.decode"):
+            audio = decode_audio_delta(delta)
+        if self._first_audio_at is None:
+            self._first_audio_at = time.monotonic()
+        if self._held is not None:
+            self._held.append(audio)  # speculative reply, not confirmed yet
+            return
+        self._queue_playout(audio)
+
+    def _queue_playout(self, audio):
+        """Play ``audio``, or keep it in the jitter buffer until playout starts"""
+        if self._playout_started or not self.jitter_seconds:
+            self._playout_started = True
+            self.play_audio(audio)
+            return
+        self._jitter.append(audio)
+        self._jitter_samples += len(audio)
+        if self._jitter_samples >= self.jitter_seconds * SAMPLE_RATE:
+            self._flush_jitter()
+
+    def _flush_jitter(self):
+        """Start playout with whatever the jitter buffer holds"""
+        self._playout_started = True
+        pending, self._jitter, self._jitter_samples = self._jitter, [], 0
+        for audio in pending:
+            self.play_audio(audio)
+
+    def play_audio(self, audio):
+        """Write int16 samples to the output stream"""
+        playback = self.audio_budget.streams['output']
+        start = playback.begin()
+        with self.profiler.span("stream.write"):
+            if self.streams['output'].write(audio):
+                playback.underflows += 1
+        self.usage.played_seconds += len(audio) / SAMPLE_RATE
+        playback.end(start, len(audio))
+        self.tracer.mark("first_playback")
+
+    async def handle_event(self, websocket, event):
+        """Handle one server event; return True once the response is complete"""
+        event_type = event["type"]
+        if self.scheduler:
+            self.scheduler.on_server_event(event)
+        if event_type == "response.created":
+            self.tracer.mark("response_created")
+            self._rate_limited = 0
+            # A response cancelled before it was created stays muted until done
+            self._discard_audio = self._cancel_pending
+            self._playout_started = False
+            self._response_active = True
+            self._first_audio_at = None
+            if self.server_vad:
+                self.audio_processor.is_speaking = True
+        elif event_type == "input_audio_buffer.speech_started" and self.server_vad:
+            await self._on_speech_started(websocket)
+        elif event_type == "input_audio_buffer.speech_stopped" and self.server_vad:
+            # The server commits the buffer and creates the response itself
+            self.tracer.mark("speech_end")
+            self._response_sent = time.perf_counter()
+        elif event_type == "input_audio_buffer.committed":
+            self._turn_items.append(event.get("item_id"))
+            if self.history and self.history[-1]["role"] == "user":
+                self.history[-1]["item_id"] = event.get("item_id")
+        elif event_type == "conversation.item.created":
+            self._items_created += 1
+        elif event_type == "response.output_item.added":
+            self._turn_items.append(event.get("item", {}).get("id"))
+        elif event_type == "response.audio.delta":
+            if self._response_sent is not None and self.endpoint:
+                self.endpoint.observe_ttfa(time.perf_counter() - self._response_sent)
+            self._response_sent = None
+            if "delta" in event and not self._discard_audio:
+                try:
+                    self.play_audio_delta(event["delta"])
+                except Exception as e:
+                    print(f"Audio processing error: {e}")
+        elif event_type == "conversation.item.input_audio_transcription.completed":
+            self.audit_event("customer_transcript", text=event.get("transcript", ""))
+            self._transcribed(event)
+        elif event_type == "response.audio_transcript.done":
+            self.audit_event("agent_transcript", text=event.get("transcript", ""))
+            self.remember("assistant", item_id=event.get("item_id"),
+                          text=event.get("transcript", ""))
+        elif event_type == "response.done":
+            response = event.get("response", {})
+            self._response_active = False
+            self._response_requested = False
+            self._cancel_pending = False
+            self._responses_done += 1
+            self.usage.observe_response(response)
+            if self.server_vad:
+                self.audio_processor.is_speaking = False
+                self.tracer.end_turn()
+            if self._jitter and not self._discard_audio:
+                self._flush_jitter()
+            self.audit_event("response_done", response_id=response.get("id"),
+                             status=response.get("status"), usage=response.get("usage"))
+            if self.scheduler:
+                usage = response.get("usage", {})
+                self.scheduler.record_usage(self._pending_estimate, usage.get("total_tokens"))
+                self._pending_estimate = 0
+            # A cancelled response ends the turn as well: the interruption is
+            # answered as the next caller turn once the caller stops talking
+            return True
+        elif event_type == "error":
+            print(f"Error response received: {event}")
+            self.audit_event("error", error=event.get("error"))
+            error = event.get("error", {})
+            # The server creates responses itself in server VAD mode
+            if error.get("code") == "rate_limit_exceeded" and not self.server_vad:
+                # response.create was refused; without a scheduler to wait for
+                # capacity, or after a few tries, the turn ends here
+                if not self.scheduler or self._rate_limited >= self.rate_limit_retries:
+                    self._rate_limited = 0
+                    return True
+                self._rate_limited += 1
+                if not (self.scheduler.requests or self.scheduler.tokens):
+                    # No quota buckets to pause, so back off here, doubling each try
+                    await asyncio.sleep(retry_after(error) * 2 ** (self._rate_limited - 1))
+                await self.create_response(websocket)
+        return False
+
+    def _transcribed(self, event):
+        """Keep a transcribed caller turn as text rather than audio"""
+        for item in reversed(self.history or ()):
+            if item["item_id"] and item["item_id"] == event.get("item_id"):
+                item["text"], item["audio"] = event.get("transcript", ""), None
+                break
+
+    async def _on_speech_started(self, websocket):
+        """Barge-in: the caller started talking over the agent"""
+        if not self._response_active or self._discard_audio:
+            return
+        print("Interrupted!")
+        self.audit_event("interrupted")
+        self._discard_audio = True
+        self._jitter, self._jitter_samples = [], 0
+        self.audio_processor.is_speaking = False
+        await websocket.send(json.dumps({"type": "response.cancel"}))
+
+    def _on_keyword(self, keyword):
+        """A spoken command while the agent talks: stop playback and the
+        response here instead of uploading the command as a caller turn"""
+        if not self.audio_processor.is_speaking or self._discard_audio:
+            return
+        print(f"Keyword command: {keyword}")
+        self.audit_event("keyword_command", keyword=keyword)
+        self._discard_audio = True
+        self._jitter, self._jitter_samples = [], 0
+        # Drop what the output device still has queued, then keep it open
+        self.streams['output'].abort()
+        self.streams['output'].start()
+        self.audio_processor.get_interrupt_audio()  # the command itself
+        self._keyword_stop = True
+        if self._response_requested:
+            self._cancel_pending = True
+            self._keyword_cancel = asyncio.ensure_future(
+                self._ws.send(json.dumps({"type": "response.cancel"})))
+
+    async def _barge_in(self, websocket):
+        """The caller talked over the agent: stop playback and the response,
+        and let the VAD collect the whole interruption as the next turn.
+        Returns True when there is no response left to wait for."""
+        print("Interrupted!")
+        self.audit_event("interrupted")
+        self._discard_audio = True
+        self._jitter, self._jitter_samples = [], 0
+        self.streams['output'].abort()
+        self.streams['output'].start()
+        # Barge-in audio so far becomes the start of the next utterance
+        self.audio_processor.end_response()
+        if not self._response_requested:
+            return True
+        self._cancel_pending = True
+        await websocket.send(json.dumps({"type": "response.cancel"}))
+        return False
+
+    def _barge_in_ready(self):
+        """Whether interruption audio is long enough to rule out a command"""
+        if not self.keyword_spotter:
+            return True
+        heard = len(self.audio_processor.interrupt_buffer) / 2 / SAMPLE_RATE
+        return heard >= self.keyword_spotter.command_seconds
+
+    async def _stream_microphone(self, websocket):
+        """Forward captured blocks to the input audio buffer as they arrive"""
+        while True:
+            block = await self._mic_queue.get()
+            self.usage.uploaded_seconds += len(block) / 2 / SAMPLE_RATE
+            await websocket.send(json.dumps({
+                "type": "input_audio_buffer.append",
+                "audio": encode_audio(block)
+            }))
+
+    async def converse_server_vad(self, websocket):
+        """Conversation loop when the server detects turns"""
+        streamer = asyncio.create_task(self._stream_microphone(websocket))
+        try:
+            while True:
+                with self.profiler.span("ws.recv"):
+                    message = await websocket.recv()
+                with self.profiler.span("json.loads"):
+                    event = json.loads(message)
+                with self.profiler.span(event["type"]):
+                    await self.handle_event(websocket, event)
+        finally:
+            streamer.cancel()
+            await asyncio.gather(streamer, return_exceptions=True)
+
+    async def handle_response(self, websocket):
+        """Handle AI response with interruption support"""
+        self.audio_processor.is_speaking = True
+        try:
+            while True:
+                if self.audio_processor.check_interruption() and self._barge_in_ready():
+                    if await self._barge_in(websocket):
+                        break
+
+                with self.profiler.span("ws.recv"):
+                    message = await websocket.recv()
+                with self.profiler.span("json.loads"):
+                    event = json.loads(message)
+
+                with self.profiler.span(event["type"]):
+                    if await self.handle_event(websocket, event):
+                        break
+        finally:
+            self.audio_processor.end_response()
+            self._keyword_stop = False
+
+    async def _receive_until(self, websocket, condition, timeout=None):
+        """Handle server events until ``condition()`` holds, checking it at
+        least every 20 ms; gives up after ``timeout`` seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        receive = asyncio.create_task(websocket.recv())
+        try:
+            while not condition() and (deadline is None or time.monotonic() < deadline):
+                received, _ = await asyncio.wait({receive}, timeout=0.02)
+                if received:
+                    event = json.loads(receive.result())
+                    receive = asyncio.create_task(websocket.recv())
+                    with self.profiler.span(event["type"]):
+                        await self.handle_event(websocket, event)
+        finally:
+            receive.cancel()
+            await asyncio.gather(receive, return_exceptions=True)
+
+    async def speculate(self, websocket):
+        """Send the turn after a short pause and play the reply only once the
+        full silence window confirms it; cancel it if the caller resumes"""
+        processor = self.audio_processor
+        resume_level = int(self.speculation.silence_seconds * SAMPLE_RATE)
+        self.speculation.attempts += 1
+        self.tracer.mark("speech_end", processor.speech_end_time)
+        self._turn_items = []
+        self._held = []
+        self._first_audio_at = None
+        sent = time.monotonic()
+        await self.send_audio(websocket, processor.snapshot())
+        speculative_item = self.history[-1] if self.history else None
+        responses_done = self._responses_done
+
+        def finished():
+            return self._responses_done > responses_done
+
+        await self._receive_until(websocket, lambda: processor.should_process()
+                                  or processor.silence_frames < resume_level)
+
+        if not processor.should_process():
+            # The caller kept talking: withdraw the reply and the partial question
+            self.speculation.misses += 1
+            self.audit_event("speculation", outcome="cancelled")
+            if self.verbose:
+                print("Caller resumed; speculative response cancelled")
+            if not finished():
+                await websocket.send(json.dumps({"type": "response.cancel"}))
+                await self._receive_until(websocket, finished, timeout=2.0)
+            self._held = None
+            self._discard_audio = True
+            deleted = set(filter(None, self._turn_items))
+            for item_id in deleted:
+                await websocket.send(json.dumps({"type": "conversation.item.delete",
+                                                 "item_id": item_id}))
+            if self.history:
+                kept = [item for item in self.history
+                        if item["item_id"] not in deleted and item is not speculative_item]
+                self.history = deque(kept, maxlen=self.history.maxlen)
+            self.tracer.discard_turn()
+            return
+
+        confirmed = time.monotonic()
+        processor.reset()  # already uploaded; this only counts the turn
+        self.audit_event("speculation", outcome="confirmed")
+        held, self._held = self._held, None
+        for audio in held:
+            self._queue_playout(audio)
+        if not finished():
+            await self.handle_response(websocket)
+        elif self._jitter:
+            self._flush_jitter()
+        self.speculation.observe_hit(sent, confirmed, self._first_audio_at)
+        self.tracer.end_turn()
+
+    async def _setup_audio_timed(self):
+        started = time.perf_counter()
+        await self.setup_audio()
+        self.startup["audio_ms"] = (time.perf_counter() - started) * 1000
+
+    def _report_startup(self, run_started, connected, session_ready):
+        origin = self.startup_origin or run_started
+        self.startup.update({
+            "before_run_ms": (run_started - origin) * 1000,
+            "connect_ms": (connected - run_started) * 1000,
+            "session_ms": (session_ready - connected) * 1000,
+            "ready_ms": (time.perf_counter() - origin) * 1000,
+        })
+        print(f"Ready for conversation in {self.startup['ready_ms']:.0f} ms "
+              f"(startup {self.startup['before_run_ms']:.0f} ms, "
+              f"audio {self.startup.get('audio_ms', 0):.0f} ms, "
+              f"connect {self.startup['connect_ms']:.0f} ms, "
+              f"session {self.startup['session_ms']:.0f} ms)")
+
+    def _apply_lag_tier(self, tier):
+        quiet = tier >= TIER_QUIET
+        if quiet and self._tracing is None:
+            self._tracing = (self.tracer.enabled, self.profiler.enabled)
+            self.tracer.enabled = self.profiler.enabled = False
+        elif not quiet and self._tracing is not None:
+            self.tracer.enabled, self.profiler.enabled = self._tracing
+            self._tracing = None
+        self.verbose = not quiet
+        self.jitter_seconds = self.lag_jitter_seconds if tier >= TIER_BUFFERED else 0.0
+
+    def _on_lag_tier(self, old, new):
+        self._apply_lag_tier(new)
+        self.audit_event("lag_tier_changed", old=TIER_NAMES[old], new=TIER_NAMES[new])
+
+    def report_call(self):
+        """Print end-of-call summaries"""
+        self._report_vad()
+        if self.scheduler:
+            print(self.scheduler.log_line())
+        print(self.usage.log_line())
+        if self.speculation.attempts:
+            print(self.speculation.log_line())
+        if self.keyword_spotter and self.keyword_spotter.blocks:
+            print(self.keyword_spotter.log_line())
+        if self.lag_monitor.enabled:
+            print(self.lag_monitor.log_line())
+        if self.endpoint:
+            print(self.endpoints.log_line())
+        if self.audit:
+            print(self.audit.log_line())
+
+    def _report_vad(self):
+        stats = self.audio_processor.vad_stats()
+        if not stats["turns_triggered"]:
+            return
+        floor = stats["noise_floor"]
+        print(f"VAD: {stats['turns_triggered']} turns triggered, "
+              f"{stats['turns_with_speech']} with speech, {stats['phantom_turns']} phantom; "
+              f"noise floor {floor if floor is None else round(floor, 4)}, "
+              f"thresholds {stats['vad_threshold']:.4f}/{stats['interrupt_threshold']:.4f}")
+
+    @contextlib.asynccontextmanager
+    async def _call_slot(self):
+        """Watch loop lag and hold an admission slot for the duration of the call"""
+        async with self.lag_monitor.watch() as monitor:
+            if monitor.tier >= TIER_REFUSE_CALLS:
+                raise AdmissionRejected(f"event loop degraded ({TIER_NAMES[monitor.tier]})")
+            self._apply_lag_tier(monitor.tier)
+            monitor.add_listener(self._on_lag_tier)
+            try:
+                async with self.scheduler.call() if self.scheduler else contextlib.nullcontext():
+                    yield
+            finally:
+                monitor.remove_listener(self._on_lag_tier)
+
+    async def run(self, exit_when_ready=False):
+        """Main conversation loop"""
+        run_started = time.perf_counter()
+        self._loop = asyncio.get_running_loop()
+        if self.server_vad:
+            self._mic_queue = asyncio.Queue()
+        budget_log = asyncio.create_task(self.audio_budget.log_periodically())
+        audio_ready = asyncio.create_task(self._setup_audio_timed())
+        call_started = None
+        try:
+            async with self._call_slot(), self.open_session() as ws:
+                session_ready = time.perf_counter()
+                self._ws = ws
+                await audio_ready
+                self._report_startup(run_started, self._connected, session_ready)
+                if exit_when_ready:
+                    return
+                if self._resume is not None:
+                    await self._replay_context(ws)
+                call_started = time.perf_counter()
+                self.audit_event("call_started", persona=self.persona,
+                                 turn_detection="server" if self.server_vad else "client")
+                if self.server_vad:
+                    await self.converse_server_vad(ws)
+                    return
+
+                speculate_after = int(self.speculation.silence_seconds * SAMPLE_RATE)
+                while True:
+                    if self._handoff is not None:
+                        snapshot = CallSnapshot.capture(self)
+                        self.audit_event("call_handed_off", items=len(snapshot.state["items"]))
+                        self._handoff.set_result(snapshot)
+                        return
+                    if (self.speculation.enabled
+                            and self.audio_processor.can_speculate(speculate_after)):
+                        await self.speculate(ws)
+                    elif self.audio_processor.should_process():
+                        self.tracer.mark("speech_end", self.audio_processor.speech_end_time)
+                        audio_data = self.audio_processor.reset()
+                        await self.send_audio(ws, audio_data)
+                        await self.handle_response(ws)
+                        self.tracer.end_turn()
+                    await asyncio.sleep(0.05)
+        except AdmissionRejected as e:
+            print(f"Call not admitted: {e}")
+            self.audit_event("call_rejected", reason=str(e))
+        finally:
+            if call_started is not None:
+                self.usage_ledger.record(self.usage, self.persona,
+                                         duration=time.perf_counter() - call_started,
+                                         new_call=self._resume is None)
+                self.audit_event("call_usage", persona=self.persona,
+                                 customer_id=self.customer_id(), **self.usage.summary())
+            if self._handoff is not None and not self._handoff.done():
+                self._handoff.set_exception(RuntimeError("Call ended before it was handed off"))
+            self.audit_event("call_ended")
+            budget_log.cancel()
+            if not audio_ready.done():
+                audio_ready.cancel()
+            await asyncio.gather(audio_ready, return_exceptions=True)
+            for stream in self.streams.values():
+                if stream:
+                    stream.stop()
+                    stream.close()
+            self.profiler.write()
+            self.report_call()
+            self.tracer.export(os.getenv("LATENCY_TRACE_OUTPUT", DEFAULT_OUTPUT))
+            if self.recorder:
+                self.recorder.close()
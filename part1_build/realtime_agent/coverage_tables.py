@@ -0,0 +1,292 @@
+"""Structured coverage tables compiled from the policy documents.
+
+Policy files list benefits as regular bullet lines, for example
+
+    - Cardiology Visits: $45 copay, 85% coverage after deductible
+    - Rehabilitation Programs: 85% coverage, up to 36 sessions
+    - Pre-authorization required for non-emergency procedures
+
+``compile_policy`` turns a document into a ``CoverageTable`` of
+``CoverageRow`` (category, service, copay, coverage %, limits, pre-auth),
+plus the plan-level deductible and out-of-pocket maximum, so numeric coverage
+questions are answered by a dictionary lookup instead of a model turn. Only
+a question that clearly names one row is answered; anything weaker or
+ambiguous is left to the model.
+
+Compiled tables are cached as JSON in COVERAGE_CACHE_DIR (default
+``$XDG_CACHE_HOME/realtime_agent/coverage``, i.e. ``~/.cache/...``). A cache
+file is used only if its compiler version and the source file's mtime and
+size match; otherwise the policy is recompiled and the cache rewritten.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import NamedTuple, Optional
+
+from .answer_cache import STOPWORDS, SYNONYMS, normalize_intent
+
+COMPILER_VERSION = 1
+
+# Terms too generic to identify a service on their own
+GENERIC_TERMS = frozenset(["covered", "cost", "copay", "visit", "care", "plan", "policy",
+                           "insurance", "get", "need", "see", "seeing", "am", "be", "about",
+                           "know", "want", "check", "program", "programs"])
+# Question words a row with a known pre-authorization rule answers
+PRE_AUTH_TERMS = frozenset(["pre", "authorization", "preauthorization", "approval"])
+
+
+class CoverageRow(NamedTuple):
+    category: str
+    service: str
+    copay: Optional[float]
+    coverage_pct: Optional[int]
+    after_deductible: bool
+    limits: Optional[str]
+    pre_auth: Optional[bool]
+    source: str
+
+
+class CoverageTable(NamedTuple):
+    plan: Optional[str]
+    policy_number: Optional[str]
+    customer_number: Optional[str]
+    deductible: Optional[float]
+    out_of_pocket_max: Optional[float]
+    rows: tuple
+
+
+_MONEY = r"\$([\d,]+(?:\.\d+)?)"
+
+
+def _money(value):
+    return float(value.replace(",", ""))
+
+
+def _field(text, label):
+    match = re.search(rf"{label}:\s*(.+)", text)
+    return match.group(1).strip() if match else None
+
+
+def parse_benefit(category, line):
+    """Parse one bullet line into a CoverageRow, or None if it has no benefit terms"""
+    pre_auth_match = re.match(r"Pre-authorization (not )?required for (.+)", line, re.I)
+    if pre_auth_match:
+        service = pre_auth_match.group(2).strip().capitalize()
+        return CoverageRow(category, service, None, None, False, None,
+                           not pre_auth_match.group(1), line)
+
+    if ":" in line:
+        service, details = (part.strip() for part in line.split(":", 1))
+    else:
+        match = re.match(r"(.+?)\s+(covered at \d+%|fully covered|coverage included)(.*)",
+                         line, re.I)
+        if not match:
+            return None
+        service, details = match.group(1), match.group(2) + match.group(3)
+
+    copay = re.search(_MONEY + r"\s*copay", details)
+    coverage = re.search(r"(\d+)%", details)
+    coverage_pct = int(coverage.group(1)) if coverage else None
+    if re.search(r"fully covered", details, re.I):
+        coverage_pct = 100
+    limits = re.search(r"(up to [^,]+|\d+ (?:visits|sessions)[^,]*|for \d+-day supply)",
+                       details, re.I)
+    pre_auth = None
+    if re.search(r"with pre-authorization", details, re.I):
+        pre_auth = True
+    if copay is None and coverage_pct is None and limits is None and pre_auth is None:
+        if not re.search(r"included", details, re.I):
+            return None
+    return CoverageRow(category, service, _money(copay.group(1)) if copay else None,
+                       coverage_pct, "after deductible" in details.lower(),
+                       limits.group(1) if limits else None, pre_auth, line)
+
+
+def compile_policy(text):
+    """Compile a policy document's text into a CoverageTable"""
+    rows = []
+    category = "General"
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("#### "):
+            category = line[5:].strip()
+        elif line.startswith("- ") and category != "General":
+            row = parse_benefit(category, line[2:].strip())
+            if row:
+                rows.append(row)
+
+    deductible = re.search(_MONEY + r" annual deductible", text)
+    out_of_pocket = re.search(_MONEY + r" out-of-pocket maximum", text)
+    return CoverageTable(
+        plan=_field(text, "Plan Type"),
+        policy_number=_field(text, "Policy Number"),
+        customer_number=_field(text, "Customer Number"),
+        deductible=_money(deductible.group(1)) if deductible else None,
+        out_of_pocket_max=_money(out_of_pocket.group(1)) if out_of_pocket else None,
+        rows=tuple(rows),
+    )
+
+
+def describe(row):
+    """Render a row as a sentence the agent can say"""
+    parts = []
+    # "for 90-day supply" qualifies the copay; other limits stand on their own
+    supply = row.copay is not None and row.limits and row.limits.startswith("for ")
+    if row.copay is not None:
+        parts.append(f"a ${row.copay:g} copay" + (f" {row.limits}" if supply else ""))
+    if row.coverage_pct == 100:
+        parts.append("full coverage")
+    elif row.coverage_pct is not None:
+        parts.append(f"{row.coverage_pct}% coverage"
+                     + (" after your deductible" if row.after_deductible else ""))
+    if row.limits and not supply:
+        parts.append(row.limits)
+    pre_auth = {True: " Pre-authorization is required.",
+                False: " No pre-authorization is needed.", None: ""}[row.pre_auth]
+    if not parts:
+        if pre_auth:
+            return f"For {row.service.lower()}:{pre_auth}"
+        return f"{row.service} is included in your plan."
+    return f"For {row.service.lower()}, your plan has " + ", ".join(parts) + "." + pre_auth
+
+
+@functools.lru_cache(maxsize=4096)
+def _terms(text):
+    """Content words of ``text``; hyphenated words are split, so the written
+    "out-of-pocket" and the spoken "out of pocket" give the same terms"""
+    parts = {SYNONYMS.get(part, part)
+             for term in normalize_intent(text).split() for part in term.split("-")
+             if len(part) > 1}  # the "s" of "what's"
+    return frozenset(parts - STOPWORDS - GENERIC_TERMS)
+
+
+def _match(row, terms):
+    """(terms matched, share of the row's terms matched) or None if the
+    question is not about this row"""
+    key = _terms(row.service)
+    matched = len(terms & key)
+    # Every term of the service, or all but one of a longer name ("eye exam")
+    if not matched or matched < len(key) - (len(key) >= 3):
+        return None
+    explained = key | _terms(row.category)
+    if row.pre_auth is not None:
+        explained |= PRE_AUTH_TERMS
+    # "Is my heart medication covered?" is not about cardiology visits
+    if not terms <= explained:
+        return None
+    return matched, matched / len(key)
+
+
+def answer(table, question):
+    """Deterministic answer to a coverage question, or None unless exactly
+    one row matches it best"""
+    terms = _terms(question)
+    # Plan-wide amounts, unless the question is about a benefit: "does insulin
+    # count toward my deductible" is not asking for the deductible
+    if not any(terms & _terms(row.service) for row in table.rows):
+        if "deductible" in terms and table.deductible is not None:
+            return f"Your plan has a ${table.deductible:,.0f} annual deductible."
+        if {"out", "pocket"} <= terms and table.out_of_pocket_max is not None:
+            return f"Your out-of-pocket maximum is ${table.out_of_pocket_max:,.0f} per year."
+    scored = []
+    for row in table.rows:
+        score = _match(row, terms)
+        if score:
+            scored.append((score, row))
+    if not scored:
+        return None
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if len(scored) > 1 and scored[0][0] == scored[1][0]:
+        return None  # a tie is a guess
+    return describe(scored[0][1])
+
+
+def _to_json(table, signature):
+    data = table._asdict()
+    data["rows"] = [row._asdict() for row in table.rows]
+    return {"version": COMPILER_VERSION, "source": list(signature), "table": data}
+
+
+def _from_json(data):
+    table = dict(data["table"])
+    table["rows"] = tuple(CoverageRow(**row) for row in table["rows"])
+    return CoverageTable(**table)
+
+
+class CoverageTables:
+    """Loads compiled tables for policy files through the in-memory and on-disk caches"""
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.compiled = 0
+        self.loaded_from_disk = 0
+        self._tables = {}  # path -> (signature, table)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        cache_home = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return cls(os.getenv("COVERAGE_CACHE_DIR",
+                             os.path.join(cache_home, "realtime_agent", "coverage")))
+
+    def _cache_path(self, path):
+        # Policies from different directories may share a file name
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)}-{digest}.json")
+
+    def _read_cache(self, path, signature):
+        try:
+            with open(self._cache_path(path)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != COMPILER_VERSION or data.get("source") != list(signature):
+            return None
+        return _from_json(data)
+
+    def _write_cache(self, path, signature, table):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self._cache_path(path)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_to_json(table, signature), f)
+        os.replace(tmp_path, cache_path)
+
+    def load(self, path):
+        """Return the CoverageTable for a policy file, recompiling if it changed"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            known = self._tables.get(path)
+            if known and known[0] == signature:
+                return known[1]
+        table = self._read_cache(path, signature) if self.cache_dir else None
+        if table is not None:
+            self.loaded_from_disk += 1
+        else:
+            with open(path) as f:
+                table = compile_policy(f.read())
+            self.compiled += 1
+            if self.cache_dir:
+                try:
+                    self._write_cache(path, signature, table)
+                except OSError as e:
+                    print(f"Could not write coverage cache for {path}: {e}")
+        with self._lock:
+            self._tables[path] = (signature, table)
+        return table
+
+
+if __name__ == "__main__":
+    import sys
+    tables = CoverageTables.from_env()
+    for policy_path in sys.argv[1:]:
+        compiled = tables.load(policy_path)
+        print(f"{policy_path}: {compiled.plan}, deductible {compiled.deductible}, "
+              f"out-of-pocket max {compiled.out_of_pocket_max}")
+        for benefit in compiled.rows:
+            print(f"  {benefit.category:<24} {benefit.service:<32} copay={benefit.copay} "
+                  f"coverage={benefit.coverage_pct} limits={benefit.limits} "
+                  f"pre_auth={benefit.pre_auth}")
@@ -0,0 +1,241 @@
+"""Latency-aware routing across several Realtime endpoints or deployments.
+
+REALTIME_ENDPOINTS lists the endpoints to use, comma separated. Each entry is
+either a full ws:// or wss:// URL or an Azure resource name with an optional
+deployment (``aoai-ep-eastus2/gpt-4o-realtime-preview``), which is expanded
+with AZURE_OPENAI_API_KEY like the default endpoint.
+
+Every endpoint keeps its recent session setup times, recorded for every
+endpoint in a race (losers finish setting up in the background for up to
+``setup_timeout`` seconds and are then closed or cancelled), and the time
+to first audio (response.create sent to the first response.audio.delta
+received) of the calls it served. New calls race the REALTIME_HEDGE
+(default 2) best-ranked endpoints and keep whichever answers
+``session.created`` first, so a region that slows down drops down the
+ranking. Endpoints with no recent samples are not ranked: they fill free
+hedge slots and get one extra probe slot every REALTIME_PROBE_EVERY
+(default 10) calls, so recovered regions are measured again.
+"""
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+FAILURE_PENALTY = 10.0  # seconds added to an endpoint's score after a failure
+
+
+class Endpoint:
+    """One Realtime endpoint and its rolling health"""
+    def __init__(self, url, name=None, window=50, window_seconds=300.0,
+                 failure_cooldown=60.0, clock=time.monotonic):
+        self.url = url
+        self.name = name or urlparse(url).netloc  # never the full URL, it may carry a key
+        self.window_seconds = window_seconds
+        self.failure_cooldown = failure_cooldown
+        self.clock = clock
+        self.ttfa = deque(maxlen=window)  # (monotonic time, seconds)
+        self.setup = deque(maxlen=window)
+        self.races = 0
+        self.wins = 0
+        self.failures = 0
+        self.last_failure = None
+
+    def _recent(self, samples):
+        cutoff = self.clock() - self.window_seconds
+        return [value for when, value in samples if when >= cutoff]
+
+    def observe_ttfa(self, seconds):
+        self.ttfa.append((self.clock(), seconds))
+
+    def observe_setup(self, seconds):
+        self.setup.append((self.clock(), seconds))
+
+    def record_failure(self):
+        self.failures += 1
+        self.last_failure = self.clock()
+
+    def ttfa_p50(self):
+        recent = self._recent(self.ttfa)
+        return statistics.median(recent) if recent else None
+
+    def setup_p50(self):
+        recent = self._recent(self.setup)
+        return statistics.median(recent) if recent else None
+
+    def has_samples(self):
+        return bool(self._recent(self.setup) or self._recent(self.ttfa))
+
+    def score(self, ttfa_default=0.0):
+        """Expected seconds from connecting to first audio; lower is better.
+
+        Endpoints that have not served a call lately have no time to first
+        audio; ``ttfa_default`` stands in for it.
+        """
+        ttfa = self.ttfa_p50()
+        score = (self.setup_p50() or 0.0) + (ttfa_default if ttfa is None else ttfa)
+        if self.last_failure is not None and self.clock() - self.last_failure < self.failure_cooldown:
+            score += FAILURE_PENALTY
+        return score
+
+
+class EndpointPool:
+    """Ranks endpoints by health and opens sessions on the best of them"""
+    def __init__(self, endpoints, hedge=2, probe_every=10, setup_timeout=5.0):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.hedge = max(1, hedge)
+        self.probe_every = max(1, probe_every)
+        self.setup_timeout = setup_timeout
+        self.picks = 0
+        self._settling = set()  # background tasks timing the losers of past races
+
+    @classmethod
+    def from_env(cls, build_url):
+        """Pool for REALTIME_ENDPOINTS, or None when it is not set.
+
+        ``build_url(resource, deployment)`` expands entries that are not URLs.
+        """
+        entries = [entry.strip() for entry in os.getenv("REALTIME_ENDPOINTS", "").split(",")
+                   if entry.strip()]
+        if not entries:
+            return None
+        endpoints = []
+        for entry in entries:
+            if entry.startswith(("ws://", "wss://")):
+                endpoints.append(Endpoint(entry))
+            else:
+                resource, _, deployment = entry.partition("/")
+                endpoints.append(Endpoint(build_url(resource, deployment or None), name=entry))
+        return cls(endpoints, hedge=int(os.getenv("REALTIME_HEDGE", "2")),
+                   probe_every=int(os.getenv("REALTIME_PROBE_EVERY", "10")))
+
+    def _ttfa_default(self):
+        """Median time to first audio across endpoints, for those without one"""
+        known = [p50 for p50 in (endpoint.ttfa_p50() for endpoint in self.endpoints)
+                 if p50 is not None]
+        return statistics.median(known) if known else 0.0
+
+    def ranked(self):
+        """Endpoints with recent samples best first, then the rest in configured order"""
+        default = self._ttfa_default()
+        sampled = [endpoint for endpoint in self.endpoints if endpoint.has_samples()]
+        # Stable sort keeps the configured order among equally scored endpoints
+        sampled.sort(key=lambda endpoint: endpoint.score(default))
+        return sampled + [endpoint for endpoint in self.endpoints if not endpoint.has_samples()]
+
+    def pick(self):
+        """Endpoints to race for the next session, best first.
+
+        Every ``probe_every`` picks an endpoint without recent samples joins
+        the race as an extra candidate.
+        """
+        self.picks += 1
+        ranked = self.ranked()
+        picked = ranked[:self.hedge]
+        unsampled = [endpoint for endpoint in ranked[self.hedge:] if not endpoint.has_samples()]
+        if unsampled and self.picks % self.probe_every == 0:
+            picked.append(unsampled[0])
+        return picked
+
+    async def race(self, open_session, close=lambda websocket: websocket.close()):
+        """Run ``open_session(endpoint)`` on the picked endpoints at once.
+
+        Returns ``(endpoint, result)`` for the first session to be set up.
+        The others keep going in the background so their setup time is
+        measured, and are passed to ``close`` once set up. Raises the last
+        error if every candidate fails.
+        """
+        candidates = self.pick()
+        tasks = {}
+        for endpoint in candidates:
+            endpoint.races += 1
+            tasks[asyncio.create_task(self._timed(endpoint, open_session))] = endpoint
+        error = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    endpoint = tasks.pop(task)
+                    if task.exception() is None:
+                        endpoint.wins += 1
+                        if tasks:
+                            self._settle(tasks, close)
+                            tasks = {}
+                        return endpoint, task.result()
+                    error = task.exception()
+                    endpoint.record_failure()
+                    print(f"Realtime endpoint {endpoint.name} failed: {error}")
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if not isinstance(result, BaseException):
+                    await close(result)
+
+    def _settle(self, tasks, close):
+        """Let the losers of a race finish setting up, then close them"""
+        async def settle():
+            _, pending = await asyncio.wait(tasks, timeout=self.setup_timeout)
+            for task in pending:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for endpoint, result in zip(tasks.values(), results):
+                if isinstance(result, asyncio.CancelledError):
+                    continue  # timed out; _timed recorded how long it waited
+                if isinstance(result, BaseException):
+                    endpoint.record_failure()
+                    print(f"Realtime endpoint {endpoint.name} failed: {result}")
+                else:
+                    await close(result)
+
+        task = asyncio.create_task(settle())
+        self._settling.add(task)
+        task.add_done_callback(self._settling.discard)
+
+    async def _timed(self, endpoint, open_session):
+        started = time.perf_counter()
+        try:
+            result = await open_session(endpoint)
+        except asyncio.CancelledError:
+            # Cancelled or timed out: the endpoint took at least this long
+            endpoint.observe_setup(time.perf_counter() - started)
+            raise
+        endpoint.observe_setup(time.perf_counter() - started)
+        return result
+
+    def metrics(self):
+        default = self._ttfa_default()
+        return {
+            endpoint.name: {
+                "score_s": endpoint.score(default) if endpoint.has_samples() else None,
+                "ttfa_p50_s": endpoint.ttfa_p50(),
+                "setup_p50_s": endpoint.setup_p50(),
+                "races": endpoint.races,
+                "wins": endpoint.wins,
+                "failures": endpoint.failures,
+            }
+            for endpoint in self.endpoints
+        }
+
+    def log_line(self):
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f} ms"
+        parts = [f"{name}: ttfa {ms(stats['ttfa_p50_s'])}, setup {ms(stats['setup_p50_s'])}, "
+                 f"won {stats['wins']}/{stats['races']}, {stats['failures']} failures"
+                 for name, stats in self.metrics().items()]
+        return "Endpoints | " + " | ".join(parts)
+
+
+_shared = None
+
+
+def shared_endpoints(build_url):
+    """Process-wide pool so endpoint health carries over between calls"""
+    global _shared
+    if _shared is None:
+        _shared = EndpointPool.from_env(build_url) or False
+    return _shared or None
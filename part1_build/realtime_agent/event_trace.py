@@ -0,0 +1,123 @@
+"""Opt-in Chrome/Perfetto trace-event profiler for the conversation event loop.
+
+Set CHROME_TRACE=trace.json to record spans for the session setup, send
+path, response handlers and the audio callback, tagged with the thread that
+ran them. Load the file in chrome://tracing or https://ui.perfetto.dev to
+see how the PortAudio capture thread overlaps with the asyncio loop.
+
+Each span is recorded as one complete ("X") event when it ends, so turning
+the tracer off mid-span never leaves a half-open span. Only the latest
+CHROME_TRACE_MAX_EVENTS (default 200000) spans are kept, so an hour-long
+call cannot grow the trace without limit.
+
+When tracing is disabled ``instrument`` leaves methods untouched and ``span``
+returns a shared no-op context manager.
+"""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.tracer.begin()
+
+    def __exit__(self, *exc_info):
+        self.tracer.end(self.name, self.start)
+        return False
+
+
+class ChromeTracer:
+    """Collects the latest trace events in memory and writes them as trace.json"""
+    def __init__(self, path=None, max_events=200000):
+        self.path = path
+        self.enabled = path is not None
+        self.events = deque(maxlen=max_events)
+        self.recorded = 0
+        self.pid = os.getpid()
+        self.origin_ns = time.perf_counter_ns()
+        self._thread_names = {}  # tid -> metadata event, kept however old
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("CHROME_TRACE") or None,
+                   max_events=int(os.getenv("CHROME_TRACE_MAX_EVENTS", "200000")))
+
+    def begin(self):
+        """Start time of a span, or None while tracing is off"""
+        return time.perf_counter_ns() if self.enabled else None
+
+    def end(self, name, start):
+        """Record the span started at ``start`` as one complete event"""
+        if start is None or not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        tid = threading.get_native_id()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = {
+                "ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid,
+                "args": {"name": threading.current_thread().name},
+            }
+        # deque.append is atomic under the GIL, so callback threads can record too
+        self.events.append({
+            "ph": "X", "name": name, "pid": self.pid, "tid": tid,
+            "ts": (start - self.origin_ns) / 1000, "dur": (now - start) / 1000,
+        })
+        self.recorded += 1
+
+    def span(self, name):
+        """Context manager recording a complete event around a block"""
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def wrap(self, name, func):
+        """Return func wrapped in a span; coroutine functions are awaited inside it"""
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def traced_coroutine(*args, **kwargs):
+                start = self.begin()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.end(name, start)
+            return traced_coroutine
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            start = self.begin()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.end(name, start)
+        return traced
+
+    def instrument(self, obj, method_names):
+        """Replace the named bound methods on obj with traced versions"""
+        if not self.enabled:
+            return
+        for method_name in method_names:
+            setattr(obj, method_name, self.wrap(method_name, getattr(obj, method_name)))
+
+    def write(self, path=None):
+        if not self.enabled:
+            return
+        path = path or self.path
+        events = list(self._thread_names.values()) + list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        dropped = self.recorded - len(self.events)
+        print(f"Trace with {len(self.events)} events written to {path}"
+              + (f" ({dropped} older events dropped)" if dropped else ""))
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import re
+
+import numpy as np
+
+from .answer_cache import is_specific, normalize_intent, shared_cache
+from .audio import SAMPLE_RATE
+from .conversation import ConversationSystem
+from .coverage_tables import CoverageTables, answer
+
+POLICY_DIR = os.getenv(
+    "POLICY_DOCUMENTS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "policy_documents"))
+
+# Compiled coverage tables shared by every call in the process
+coverage_tables = CoverageTables.from_env()
+
+
+class InsuranceConversationState:
+    """Manages the state and flow of insurance-related conversations"""
+    def __init__(self, audit_event=None):
+        self.current_state = "greeting"  # Initial state
+        self.customer_id = None  # Stores customer ID when provided
+        self.customer_query = None  # Stores the current query
+        self.policy_checked = False  # Tracks if policy has been checked
+        self.audit_event = audit_event  # Records transitions in the audit log
+
+    def update_state(self, new_state):
+        """Update the conversation state and log the transition"""
+        print(f"Conversation state changing from {self.current_state} to {new_state}")
+        if self.audit_event:
+            self.audit_event("state_changed", old=self.current_state, new=new_state)
+        self.current_state = new_state
+
+
+class InsuranceConversationSystem(ConversationSystem):
+    """Main system for handling insurance-related voice conversations.
+
+    Caller audio is transcribed. Once the caller is identified, response.create
+    waits for each utterance's transcript, and coverage questions the compiled
+    policy table can answer are read out verbatim (COVERAGE_ANSWERS=0 turns
+    this off). With ANSWER_CACHE=1 a question already answered for the
+    caller's plan is played from the answer cache instead of asking the model
+    again.
+    """
+    def __init__(self, persona="insurance", answer_cache=None, table_answers=None, **kwargs):
+        super().__init__(persona=persona, **kwargs)
+        self.conversation_state = InsuranceConversationState(self.audit_event)
+        if answer_cache is None and os.getenv("ANSWER_CACHE") == "1":
+            answer_cache = shared_cache()
+        if table_answers is None:
+            # An explicitly requested speculative commit wins over the default
+            table_answers = (os.getenv("COVERAGE_ANSWERS", "1") == "1"
+                             and not self.speculation.enabled)
+        if (answer_cache or table_answers) and self.server_vad:
+            # Both replace or ground response.create, which the server sends itself here
+            if answer_cache:
+                print("Answer cache needs client-side turn detection; disabled with server VAD")
+            answer_cache = None
+            table_answers = False
+        if answer_cache and self.speculation.enabled:
+            # response.create waits for the transcript, so there is nothing to speculate on
+            print("Speculative commit is not used with the answer cache")
+            self.speculation.enabled = False
+        self.answer_cache = answer_cache
+        self.table_answers = table_answers or bool(answer_cache)
+        self._awaiting_transcript = False
+        # (plan, intent, table answer, policy path, private strings) being answered
+        self._question = None
+        self._answer_text = []
+        self._answer_audio = bytearray()
+
+    def session_config(self):
+        config = super().session_config()
+        if self.table_answers:
+            config["session"]["input_audio_transcription"] = {"model": "whisper-1"}
+        return config
+
+    def policy_path(self):
+        """Policy file of the identified customer, if there is one"""
+        customer_id = self.conversation_state.customer_id
+        if not customer_id:
+            return None
+        path = os.path.join(POLICY_DIR, f"insurance_policy_{customer_id}.txt")
+        return path if os.path.exists(path) else None
+
+    def customer_id(self):
+        return self.conversation_state.customer_id
+
+    def call_state(self):
+        state = self.conversation_state
+        return {**super().call_state(), "insurance": {
+            "current_state": state.current_state, "customer_id": state.customer_id,
+            "customer_query": state.customer_query, "policy_checked": state.policy_checked}}
+
+    def restore_call_state(self, state):
+        super().restore_call_state(state)
+        for name, value in state["insurance"].items():
+            setattr(self.conversation_state, name, value)
+
+    def coverage_answer(self, question):
+        """Answer from the customer's compiled coverage table, if it can"""
+        policy_path = self.policy_path()
+        if not policy_path:
+            return None
+        return answer(coverage_tables.load(policy_path), question)
+
+    async def send_audio(self, websocket, audio_data):
+        if not self.table_answers or not (self.answer_cache or self.policy_path()):
+            return await super().send_audio(websocket, audio_data)
+        # response.create waits for the transcript, which decides between a
+        # table-grounded, cached or free model turn
+        await self.upload_audio(websocket, audio_data)
+        self._awaiting_transcript = True
+
+    async def _barge_in(self, websocket):
+        # The interrupted utterance is not answered once its transcript arrives
+        self._awaiting_transcript = False
+        return await super()._barge_in(websocket)
+
+    def play_audio(self, audio):
+        super().play_audio(audio)
+        if self._question is not None:
+            self._answer_audio.extend(audio.tobytes())
+
+    async def _on_transcript(self, websocket, transcript):
+        """Pick up the customer ID, then answer from cache or ask the model"""
+        self.audit_event("customer_transcript", text=transcript)
+        state = self.conversation_state
+        id_match = re.search(r'\b\d{5}\b', transcript)
+        if id_match and not state.customer_id:
+            state.customer_id = id_match.group(0)
+            state.update_state("have_id")
+            if self.policy_path():
+                coverage_tables.load(self.policy_path())  # compile before the first question
+        if not self._awaiting_transcript:
+            return False
+        self._awaiting_transcript = False
+
+        policy_path = self.policy_path()
+        # Identification turns are specific to one caller and never cached
+        if policy_path and not id_match:
+            known = self.coverage_answer(transcript)
+            intent = normalize_intent(transcript)
+            # Only self-contained questions about one benefit in the table are
+            # shared between callers; "and for that?" depends on earlier turns
+            if known and self.answer_cache and is_specific(intent):
+                plan, private = self.answer_cache.policy(policy_path)
+                # Keyed by this caller's table answer too: another policy file
+                # with the same plan name may have different numbers
+                cached = self.answer_cache.get(plan, intent, known)
+                if cached:
+                    return await self._play_cached(websocket, *cached)
+                self._question = (plan, intent, known, policy_path,
+                                  private + [state.customer_id])
+            if known:
+                # Grounded in the policy table; the model only voices it
+                await self.create_response(
+                    websocket, instructions=f"Tell the caller exactly this: {known}")
+                return False
+        await self.create_response(websocket)
+        return False
+
+    async def _play_cached(self, websocket, transcript, audio):
+        """Play a cached answer and add it to the conversation for the model"""
+        print(f"Agent (cached): {transcript}")
+        self.remember("assistant", text=transcript)
+        self.audit_event("agent_transcript", text=transcript, cached=True)
+        await websocket.send(json.dumps({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": transcript}]
+            }
+        }))
+        samples = np.frombuffer(audio, dtype=np.int16)
+        chunk = SAMPLE_RATE // 10
+        for start in range(0, len(samples), chunk):
+            if self._keyword_stop:
+                return True  # stopped by a spoken command
+            if self.audio_processor.check_interruption():
+                return False  # the conversation loop handles the barge-in
+            self.play_audio(samples[start:start + chunk])
+            await asyncio.sleep(0)
+        return True
+
+    def _store_answer(self, status):
+        plan, intent, known, policy_path, private = self._question
+        if status == "completed" and not self._discard_audio:
+            self.answer_cache.put(plan, intent, "".join(self._answer_text),
+                                  self._answer_audio, policy_path, private, grounding=known)
+        self._question = None
+
+    async def handle_event(self, websocket, event):
+        event_type = event["type"]
+        if self.table_answers:
+            if event_type == "conversation.item.input_audio_transcription.completed":
+                self._transcribed(event)
+                return await self._on_transcript(websocket, event.get("transcript", ""))
+            if event_type == "conversation.item.input_audio_transcription.failed":
+                if self._awaiting_transcript:
+                    self._awaiting_transcript = False
+                    await self.create_response(websocket)
+                return False
+            if event_type == "response.created":
+                self._answer_text = []
+                self._answer_audio = bytearray()
+            elif event_type == "response.audio_transcript.delta":
+                self._answer_text.append(event.get("delta", ""))
+            elif event_type == "response.done" and self._question is not None:
+                self._store_answer(event.get("response", {}).get("status"))
+        if event_type != "response.text":
+            return await super().handle_event(websocket, event)
+
+        # Process transcribed text
+        customer_text = event.get('text', '').lower()
+        print(f"\nCustomer: {customer_text}")
+        self.audit_event("customer_text", text=customer_text)
+
+        # Generate appropriate response based on conversation state
+        agent_response = await self._process_insurance_query(customer_text)
+        print(f"Agent: {agent_response}")
+        self.audit_event("agent_text", text=agent_response)
+
+        # Send response back
+        await websocket.send(json.dumps({
+            "type": "text.generate",
+            "text": agent_response
+        }))
+        return False
+
+    async def _process_insurance_query(self, customer_text: str) -> str:
+        """Process customer input based on current conversation state"""
+        state = self.conversation_state
+
+        # Look for customer ID in text
+        id_match = re.search(r'\b\d{5}\b', customer_text)
+
+        if state.current_state == "greeting":
+            if any(word in customer_text for word in ["coverage", "policy", "insurance", "check"]):
+                state.update_state("need_id")
+                return ("I'll be happy to help you check your coverage. Could you please provide "
+                        "your customer ID number? It's the 5-digit number on your insurance card.")
+            return ("Hello, this is Alex from AtlasMedical Insurance. How may I assist you "
+                    "with your insurance coverage today?")
+
+        elif state.current_state == "need_id":
+            if id_match:
+                state.customer_id = id_match.group(0)
+                state.update_state("have_id")
+                return ("Thank you for providing your ID number. What specific coverage "
+                        "information would you like to check? For example, you can ask about "
+                        "specialist visits or specific procedures.")
+            return ("I apologize, but I need your 5-digit customer ID number to check your "
+                    "coverage details. Could you please provide that?")
+
+        elif state.current_state == "have_id":
+            # Here we would check the policy document
+            if not self.policy_path():
+                return ("I'm having trouble accessing your policy information. Could you "
+                        "please verify your customer ID?")
+            known = self.coverage_answer(customer_text)
+            if known:
+                return known
+            return ("I can help you with that coverage question. What specific aspect "
+                    "would you like to know about?")
+
+    def report_call(self):
+        super().report_call()
+        if self.answer_cache:
+            print(self.answer_cache.log_line())
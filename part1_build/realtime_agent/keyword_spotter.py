@@ -0,0 +1,209 @@
+"""On-host keyword spotting for spoken commands while the agent talks.
+
+Saying "stop" over the agent normally takes effect only once the barge-in
+audio has been uploaded and answered. With KEYWORD_TEMPLATES pointing at a
+directory of enrollment recordings (``stop.wav``, ``stop_2.wav``,
+``agent.wav``, ...; 24 kHz mono pcm16, the keyword is the file name up to the
+first ``_``), every capture block heard while the agent is speaking is
+matched against them on the capture thread, and a match stops playback and
+cancels the response locally.
+
+Features are log-mel energies (25 ms windows every 10 ms, 32 bands) computed
+for all frames of a block in one vectorized pass, with each frame's mean
+removed so the match does not depend on level. Templates are matched with
+subsequence DTW against the last couple of seconds of frames; the cost is the
+mean of 1 - cosine similarity along the best path, and a keyword fires when
+it drops below KEYWORD_THRESHOLD (default 0.16) for an alignment ending in the
+newest block. Detection latency is therefore bounded by the 200 ms capture
+block.
+
+While a spotter is active, ordinary barge-in waits until the interruption has
+lasted ``command_seconds`` (the longest template said half again as slowly,
+plus a block), so a command is not first uploaded as a caller turn.
+"""
+import functools
+import glob
+import os
+import time
+import wave
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+from .latency_tracing import LatencyHistogram
+
+WINDOW_SECONDS = 0.025
+HOP_SECONDS = 0.01
+N_FFT = 1024
+N_MELS = 32
+MEL_RANGE = (80.0, 7600.0)
+
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+
+@functools.lru_cache(maxsize=4)
+def mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS, mel_range=MEL_RANGE):
+    """Triangular mel filters, shape (n_fft // 2 + 1, n_mels)"""
+    low, high = _hz_to_mel(np.array(mel_range))
+    edges = _mel_to_hz(np.linspace(low, high, n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (centre - lower)
+    falling = (upper - bins) / (upper - centre)
+    return np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+
+
+def log_mel(samples, sample_rate=SAMPLE_RATE):
+    """Unit-length, mean-removed log-mel frames of int16 ``samples``, shape (frames, N_MELS)"""
+    window = int(WINDOW_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    samples = np.asarray(samples, dtype=np.float32).reshape(-1) / 32768.0
+    if len(samples) < window:
+        return np.empty((0, N_MELS), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, window)[::hop]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(window).astype(np.float32), N_FFT)) ** 2
+    features = np.log(spectrum.astype(np.float32) @ mel_filterbank(sample_rate) + 1e-8)
+    features -= features.mean(axis=1, keepdims=True)
+    features /= np.linalg.norm(features, axis=1, keepdims=True) + 1e-8
+    return features
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE, ratio=0.1):
+    """Cut an enrollment recording down to the frames near its peak level"""
+    samples = np.asarray(samples).reshape(-1)
+    hop = int(HOP_SECONDS * sample_rate)
+    usable = len(samples) - len(samples) % hop
+    levels = np.abs(samples[:usable].astype(np.float32)).reshape(-1, hop).mean(axis=1)
+    loud = np.flatnonzero(levels > levels.max() * ratio)
+    if not len(loud):
+        return samples
+    return samples[loud[0] * hop:(loud[-1] + 1) * hop]
+
+
+def match_cost(template, query):
+    """Subsequence DTW of ``template`` (T frames) anywhere in ``query`` (N frames).
+
+    Steps are (1, 1), (1, 2) and (2, 1) template/query frames, so the local
+    speaking rate may be half to twice the template's and the whole template
+    cannot collapse onto one query frame; each template frame is one
+    vectorized row update. Returns the mean cost of the best alignment ending
+    at each query frame, shape (N,).
+    """
+    cost = 1.0 - template @ query.T
+    earlier, acc = None, cost[0].copy()
+    for index in range(1, len(cost)):
+        best = np.full_like(acc, np.inf)
+        best[1:] = acc[:-1]
+        np.minimum(best[2:], acc[:-2], out=best[2:])
+        if earlier is not None:
+            # Two template frames for one query frame, through (index - 1, j)
+            np.minimum(best[1:], earlier[:-1] + cost[index - 1, 1:], out=best[1:])
+        earlier, acc = acc, cost[index] + best
+    return acc / len(template)
+
+
+@functools.lru_cache(maxsize=8)
+def load_templates(directory):
+    """Keyword -> tuple of template features, from ``<keyword>[_n].wav`` files"""
+    templates = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        with wave.open(path, "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise ValueError(f"{path} must be {SAMPLE_RATE} Hz mono 16-bit PCM")
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        keyword = os.path.splitext(os.path.basename(path))[0].split("_")[0].lower()
+        templates.setdefault(keyword, []).append(log_mel(trim_silence(samples)))
+    return {keyword: tuple(features) for keyword, features in templates.items()}
+
+
+class KeywordSpotter:
+    """Streams capture blocks through template matching for one call"""
+    def __init__(self, templates, threshold=0.16, sample_rate=SAMPLE_RATE):
+        if not templates:
+            raise ValueError("KeywordSpotter needs at least one template")
+        self.templates = templates
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self._window = int(WINDOW_SECONDS * sample_rate)
+        self._hop = int(HOP_SECONDS * sample_rate)
+        longest = max(len(features) for group in templates.values() for features in group)
+        self._max_frames = 2 * longest + int(0.2 / HOP_SECONDS)  # slowest match plus a block
+        # Speech over the agent longer than this is not a command
+        self.command_seconds = 1.5 * longest * HOP_SECONDS + 0.2
+        self._frames = np.empty((0, N_MELS), dtype=np.float32)
+        self._tail = np.empty(0, dtype=np.int16)
+        self.blocks = 0
+        self.detections = {keyword: 0 for keyword in templates}
+        self.block_seconds = LatencyHistogram()
+
+    @classmethod
+    def from_env(cls):
+        """Spotter for KEYWORD_TEMPLATES, or None when it is not set"""
+        directory = os.getenv("KEYWORD_TEMPLATES")
+        if not directory:
+            return None
+        return cls(load_templates(directory),
+                   threshold=float(os.getenv("KEYWORD_THRESHOLD", "0.16")))
+
+    @classmethod
+    def from_samples(cls, recordings, **kwargs):
+        """Spotter from ``{keyword: [int16 arrays]}`` enrollment recordings"""
+        return cls({keyword: tuple(log_mel(trim_silence(samples)) for samples in group)
+                    for keyword, group in recordings.items()}, **kwargs)
+
+    def reset(self):
+        """Forget buffered audio, e.g. when the agent stops speaking"""
+        if len(self._frames) or len(self._tail):
+            self._frames = self._frames[:0]
+            self._tail = self._tail[:0]
+
+    def process(self, indata):
+        """Add one capture block; return the keyword heard in it, if any"""
+        started = time.perf_counter()
+        samples = np.concatenate([self._tail, np.asarray(indata, dtype=np.int16).reshape(-1)])
+        new_frames = log_mel(samples, self.sample_rate)
+        consumed = len(new_frames) * self._hop
+        self._tail = samples[consumed:] if len(new_frames) else samples
+        self._frames = np.concatenate([self._frames, new_frames])[-self._max_frames:]
+
+        heard = None
+        if len(new_frames):
+            best = self.threshold
+            for keyword, group in self.templates.items():
+                for template in group:
+                    if len(self._frames) < len(template) // 2:
+                        continue
+                    # Only alignments ending in this block, so one utterance fires once
+                    cost = match_cost(template, self._frames)[-len(new_frames):].min()
+                    if cost < best:
+                        best, heard = cost, keyword
+        if heard:
+            self.detections[heard] += 1
+            self._frames = self._frames[:0]
+        self.blocks += 1
+        self.block_seconds.observe(time.perf_counter() - started)
+        return heard
+
+    def metrics(self):
+        cpu = self.block_seconds.summary()
+        return {
+            "blocks": self.blocks,
+            "detections": dict(self.detections),
+            "block_p50_ms": cpu["p50"] * 1000 if cpu["p50"] is not None else None,
+            "block_p99_ms": cpu["p99"] * 1000 if cpu["p99"] is not None else None,
+            "cpu_seconds": cpu["sum"],
+        }
+
+    def log_line(self):
+        stats = self.metrics()
+        heard = ", ".join(f"{keyword} {count}x" for keyword, count in stats["detections"].items()
+                          if count) or "none"
+        p99 = stats["block_p99_ms"]
+        return (f"Keywords | heard {heard} | {stats['blocks']} blocks, p99 "
+                f"{'-' if p99 is None else f'{p99:.2f} ms'} per block")
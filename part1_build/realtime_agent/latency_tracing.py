@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import tempfile
+import time
+from collections import deque
+
+# (stage name, start mark, end mark) - every stage is measured between two
+# monotonic timestamps recorded during a single conversation turn
+STAGES = (
+    ("vad_decision", "speech_end", "send_start"),
+    ("upload", "send_start", "send_done"),
+    ("server_ack", "send_done", "response_created"),
+    ("first_delta", "response_created", "first_delta"),
+    ("playback_start", "first_delta", "first_playback"),
+    ("end_to_end", "speech_end", "first_playback"),
+    ("response", "send_start", "first_playback"),
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Outside the working tree, so runs from a checkout leave nothing behind
+DEFAULT_OUTPUT = os.path.join(tempfile.gettempdir(), "latency_metrics.prom")
+
+
+class LatencyHistogram:
+    """Keeps a bounded window of stage durations and reports percentiles"""
+    def __init__(self, max_samples=10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        """Nearest-rank percentile over the retained samples"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        result = {"count": self.count, "sum": self.total}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.percentile(q)
+        return result
+
+
+class TurnLatencyTracer:
+    """Records per-turn timestamps from end of speech to first played sample.
+
+    Every hook starts with an ``enabled`` check so a disabled tracer costs a
+    single attribute lookup per call.
+    """
+    def __init__(self, enabled=False, clock=time.monotonic):
+        self.enabled = enabled
+        self.clock = clock
+        self.histograms = {name: LatencyHistogram() for name, _, _ in STAGES}
+        self.turns = 0
+        self._marks = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build a tracer controlled by the LATENCY_TRACE environment variable"""
+        return cls(enabled=os.getenv("LATENCY_TRACE", "0") == "1")
+
+    def mark(self, event, timestamp=None):
+        """Record the first occurrence of an event in the current turn"""
+        if not self.enabled or event in self._marks:
+            return
+        self._marks[event] = self.clock() if timestamp is None else timestamp
+
+    def end_turn(self):
+        """Fold the current turn's marks into the stage histograms"""
+        if not self.enabled:
+            return
+        marks = self._marks
+        if marks:
+            for name, start, end in STAGES:
+                if start in marks and end in marks:
+                    self.histograms[name].observe(marks[end] - marks[start])
+            self.turns += 1
+        self._marks = {}
+
+    def discard_turn(self):
+        """Forget the current turn's marks without recording it"""
+        self._marks = {}
+
+    def summary(self):
+        return {name: hist.summary() for name, hist in self.histograms.items()}
+
+    def export_prometheus(self, path):
+        """Write a Prometheus text-format file (node_exporter textfile style)"""
+        lines = [
+            "# HELP realtime_turn_stage_seconds Per-turn latency by pipeline stage",
+            "# TYPE realtime_turn_stage_seconds summary",
+        ]
+        for name, stats in self.summary().items():
+            for q in QUANTILES:
+                value = stats[f"p{int(q * 100)}"]
+                if value is not None:
+                    lines.append(
+                        f'realtime_turn_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'realtime_turn_stage_seconds_sum{{stage="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'realtime_turn_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        # Write to a temp file and rename so scrapers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export_jsonl(self, path):
+        """Append one JSON line per stage with the current percentiles"""
+        now = time.time()
+        with open(path, "a") as f:
+            for name, stats in self.summary().items():
+                f.write(json.dumps({"ts": now, "stage": name, **stats}) + "\n")
+
+    def export(self, path):
+        """Export using the format implied by the file extension"""
+        if not self.enabled:
+            return
+        if path.endswith(".jsonl"):
+            self.export_jsonl(path)
+        else:
+            self.export_prometheus(path)
+        print(f"Latency metrics for {self.turns} turns written to {path}")
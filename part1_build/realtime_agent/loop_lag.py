@@ -0,0 +1,164 @@
+"""Event-loop lag sentinel with graceful degradation tiers.
+
+A background task sleeps for ``interval`` seconds and measures how late it
+wakes up. Audio decode, playback writes and WebSocket reads all share the
+loop, so that scheduling delay is what callers hear as choppy audio. When the
+lag stays above a threshold the process steps down through cumulative tiers:
+
+    0 normal
+    1 quiet         turn tracing, the Chrome trace and per-turn logging are off
+    2 buffered      response audio is buffered (LOOP_LAG_JITTER_MS) before playout
+    3 refuse_calls  new calls are turned away
+
+LOOP_LAG_THRESHOLDS_MS sets the lag for tiers 1-3 (default "25,75,200"); a
+tier is entered once ``sustain`` consecutive samples exceed its threshold and
+left once no sample in the last LOOP_LAG_RECOVER_SECONDS did. Set
+LOOP_LAG_MONITOR=0 to disable the monitor.
+"""
+import asyncio
+import contextlib
+import os
+import time
+from collections import deque
+
+from .latency_tracing import LatencyHistogram
+
+TIER_NORMAL = 0
+TIER_QUIET = 1
+TIER_BUFFERED = 2
+TIER_REFUSE_CALLS = 3
+TIER_NAMES = ("normal", "quiet", "buffered", "refuse_calls")
+
+
+class LoopLagMonitor:
+    """Measures asyncio scheduling delay and maps it onto degradation tiers"""
+    def __init__(self, thresholds=(0.025, 0.075, 0.2), interval=0.05, sustain=3,
+                 recover_seconds=5.0, enabled=True, clock=time.monotonic):
+        if len(thresholds) != len(TIER_NAMES) - 1:
+            raise ValueError(f"Expected {len(TIER_NAMES) - 1} lag thresholds, got {thresholds}")
+        self.thresholds = tuple(sorted(thresholds))
+        self.interval = interval
+        self.sustain = sustain
+        self.enabled = enabled
+        self.clock = clock
+        self.tier = TIER_NORMAL
+        self.lag = LatencyHistogram()
+        self.max_lag = 0.0
+        self.transitions = {name: 0 for name in TIER_NAMES}  # entries into each tier
+        self.tier_seconds = [0.0] * len(TIER_NAMES)
+        self.history = deque(maxlen=100)  # (wall time, old tier, new tier, lag seconds)
+        self._recent = deque(maxlen=max(sustain, int(recover_seconds / interval)))
+        self._listeners = []
+        self._users = 0
+        self._task = None
+        self._tier_since = clock()
+
+    @classmethod
+    def from_env(cls):
+        thresholds = os.getenv("LOOP_LAG_THRESHOLDS_MS", "25,75,200")
+        return cls(thresholds=tuple(float(ms) / 1000 for ms in thresholds.split(",")),
+                   interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "50")) / 1000,
+                   recover_seconds=float(os.getenv("LOOP_LAG_RECOVER_SECONDS", "5")),
+                   enabled=os.getenv("LOOP_LAG_MONITOR", "1") != "0")
+
+    def add_listener(self, callback):
+        """Call ``callback(old_tier, new_tier)`` on every tier change"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _tier_for(self, lag):
+        return sum(1 for threshold in self.thresholds if lag >= threshold)
+
+    def observe(self, lag):
+        """Record one lag sample and change tier if warranted"""
+        self.lag.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+        self._recent.append(lag)
+        if len(self._recent) >= self.sustain:
+            sustained = min(list(self._recent)[-self.sustain:])
+            target = self._tier_for(sustained)
+            if target > self.tier:
+                return self._set_tier(target, lag)
+        if self.tier > TIER_NORMAL and len(self._recent) == self._recent.maxlen:
+            # Step down only after a whole recovery window below the threshold
+            target = self._tier_for(max(self._recent))
+            if target < self.tier:
+                self._set_tier(target, lag)
+
+    def _set_tier(self, tier, lag):
+        old, now = self.tier, self.clock()
+        self.tier_seconds[old] += now - self._tier_since
+        self._tier_since = now
+        self.tier = tier
+        self.transitions[TIER_NAMES[tier]] += 1
+        self.history.append((time.time(), old, tier, lag))
+        self._recent.clear()
+        print(f"Event loop lag {lag * 1000:.0f} ms: degradation tier "
+              f"{TIER_NAMES[old]} -> {TIER_NAMES[tier]}")
+        for callback in list(self._listeners):
+            callback(old, tier)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.observe(max(0.0, loop.time() - expected))
+
+    @contextlib.asynccontextmanager
+    async def watch(self):
+        """Keep the sampling task running while at least one call is inside"""
+        if not self.enabled:
+            yield self
+            return
+        self._users += 1
+        if self._task is None or self._task.done():
+            # A tier left over from before the loop went idle says nothing about now
+            if self.tier != TIER_NORMAL:
+                self._set_tier(TIER_NORMAL, 0.0)
+            self._task = asyncio.create_task(self._run())
+        try:
+            yield self
+        finally:
+            self._users -= 1
+            if not self._users:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+                self._task = None
+
+    def metrics(self):
+        lag = self.lag.summary()
+        seconds = list(self.tier_seconds)
+        seconds[self.tier] += self.clock() - self._tier_since
+        return {
+            "tier": TIER_NAMES[self.tier],
+            "samples": lag["count"],
+            "lag_p50_ms": lag["p50"] * 1000 if lag["p50"] is not None else None,
+            "lag_p99_ms": lag["p99"] * 1000 if lag["p99"] is not None else None,
+            "lag_max_ms": self.max_lag * 1000,
+            "transitions": dict(self.transitions),
+            "tier_seconds": dict(zip(TIER_NAMES, seconds)),
+        }
+
+    def log_line(self):
+        stats = self.metrics()
+        p99 = stats["lag_p99_ms"]
+        entered = ", ".join(f"{name} {count}x" for name, count in stats["transitions"].items()
+                            if count)
+        return (f"Loop lag | p99 {p99 if p99 is None else round(p99, 1)} ms, "
+                f"max {stats['lag_max_ms']:.1f} ms over {stats['samples']} samples | "
+                f"tier {stats['tier']}" + (f" | entered {entered}" if entered else ""))
+
+
+_shared = None
+
+
+def shared_lag_monitor():
+    """Process-wide monitor; every conversation on the loop sees the same tier"""
+    global _shared
+    if _shared is None:
+        _shared = LoopLagMonitor.from_env()
+    return _shared
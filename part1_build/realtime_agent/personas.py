@@ -0,0 +1,46 @@
+"""Agent personas selectable from the command line.
+
+Kept free of heavy imports so ``--list-personas`` and ``--help`` stay instant;
+the conversation system class is imported only when a persona is created.
+"""
+import importlib
+
+PERSONAS = {
+    "assistant": {
+        "description": "General-purpose voice assistant",
+        "system": "realtime_agent.conversation:ConversationSystem",
+        "voice": "alloy",
+        "instructions": "You are a helpful AI assistant. Keep responses brief.",
+    },
+    "insurance": {
+        "description": "Alex, AtlasMedical Insurance customer service",
+        "system": "realtime_agent.insurance:InsuranceConversationSystem",
+        "voice": "alloy",
+        "instructions": """You are Alex, a professional customer service representative
+                for AtlasMedical Insurance. Start with: 'Hello, this is Alex from AtlasMedical
+                Insurance. How may I assist you with your insurance coverage today?'
+                Always ask for customer ID (5-digit number) before providing policy information.
+                Keep responses professional but warm.""",
+    },
+}
+
+# Shared server-side turn detection settings for every persona
+TURN_DETECTION = {
+    "type": "server_vad",
+    "threshold": 0.3,
+    "prefix_padding_ms": 150,
+    "silence_duration_ms": 600,
+}
+
+
+def system_class(name):
+    """Import and return the conversation system class for a persona"""
+    module_name, _, class_name = PERSONAS[name]["system"].partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_system(name, **kwargs):
+    """Build the conversation system for a persona"""
+    if name not in PERSONAS:
+        raise ValueError(f"Unknown persona '{name}', expected one of {sorted(PERSONAS)}")
+    return system_class(name)(persona=name, **kwargs)
@@ -0,0 +1,306 @@
+"""Record and replay full conversation sessions.
+
+A recording is a compact binary log of the microphone blocks fed to
+``audio_callback`` and every WebSocket frame sent and received, each with a
+monotonic timestamp relative to the start of the recording. Paths ending in
+``.gz`` are gzip-compressed.
+
+Record a live call by setting SESSION_RECORD=<path> when running any
+persona. Replay it without audio devices or network:
+
+    python -m realtime_agent.session_recording call.rtrec --persona insurance --speed 1
+    python -m realtime_agent.session_recording call.rtrec --speed 0   # as fast as possible
+
+During replay every recorded frame and mic block is released only after the
+system has sent as many frames as it had at that point in the original call;
+mic blocks also wait until the system has taken as many received frames. Turns
+therefore stay causally ordered even when replaying faster than real time, and
+``--speed 0`` replays the same conversation as ``--speed 1``.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .audio_backends import NullBackend
+from .personas import PERSONAS, create_system
+
+MAGIC = b"RTREC\x01"
+RECORD_HEADER = struct.Struct("<BdI")  # kind, seconds since start, payload length
+
+KIND_MIC = 1
+KIND_WS_SEND = 2
+KIND_WS_RECV = 3
+BINARY_FLAG = 0x80  # set on WebSocket frames that were bytes rather than text
+
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode, buffering=1 << 20)
+
+
+class SessionRecorder:
+    """Appends timestamped mic blocks and WebSocket frames to a binary log"""
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.file = _open(path, "wb")
+        self.file.write(MAGIC)
+        self.start = clock()
+        self.lock = threading.Lock()  # mic blocks arrive on the PortAudio thread
+        self.records = 0
+        print(f"Recording session to {path}")
+
+    @classmethod
+    def from_env(cls):
+        """Create a recorder if SESSION_RECORD is set, otherwise return None"""
+        path = os.getenv("SESSION_RECORD")
+        return cls(path) if path else None
+
+    def _write(self, kind, payload):
+        header = RECORD_HEADER.pack(kind, self.clock() - self.start, len(payload))
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(header)
+            self.file.write(payload)
+            self.records += 1
+
+    def record_mic(self, indata):
+        self._write(KIND_MIC, indata.tobytes())
+
+    def record_frame(self, kind, message):
+        if isinstance(message, str):
+            self._write(kind, message.encode("utf-8"))
+        else:
+            self._write(kind | BINARY_FLAG, bytes(message))
+
+    def wrap(self, websocket):
+        return RecordingWebSocket(websocket, self)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        print(f"Session recording closed ({self.records} records)")
+
+
+class RecordingWebSocket:
+    """Passes frames through to the real connection while recording them"""
+    def __init__(self, websocket, recorder):
+        self.websocket = websocket
+        self.recorder = recorder
+
+    async def send(self, message):
+        self.recorder.record_frame(KIND_WS_SEND, message)
+        await self.websocket.send(message)
+
+    async def recv(self):
+        message = await self.websocket.recv()
+        self.recorder.record_frame(KIND_WS_RECV, message)
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self.websocket, name)
+
+
+def read_records(path):
+    """Yield (kind, timestamp, payload) tuples from a recording"""
+    with _open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) < RECORD_HEADER.size:
+                print("Warning: recording is truncated")
+                return
+            kind, timestamp, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                print("Warning: recording is truncated")
+                return
+            if kind & ~BINARY_FLAG in (KIND_WS_SEND, KIND_WS_RECV) and not kind & BINARY_FLAG:
+                payload = payload.decode("utf-8")
+            yield kind & ~BINARY_FLAG, timestamp, payload
+
+
+class SessionReplayer:
+    """Drives a conversation system from a recording instead of mic and network.
+
+    ``speed`` is a multiplier on recorded timing (1.0 = real time); 0 replays
+    as fast as the system consumes events.
+    """
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.mic_blocks = []   # (sends_before, recvs_before, timestamp, pcm16 bytes)
+        self.received = deque()  # (sends_before, timestamp, frame)
+        self.recorded_sends = []
+        for kind, timestamp, payload in read_records(path):
+            sends_before = len(self.recorded_sends)
+            if kind == KIND_MIC:
+                self.mic_blocks.append((sends_before, len(self.received), timestamp, payload))
+            elif kind == KIND_WS_SEND:
+                self.recorded_sends.append((timestamp, payload))
+            elif kind == KIND_WS_RECV:
+                self.received.append((sends_before, timestamp, payload))
+
+        self.delivered = 0
+        self.sent = []
+        self.send_times = []
+        self.progress = None
+        self.start = None
+        self.exhausted = None
+
+    async def _wait_until_released(self, sends_before, timestamp, recvs_before=0):
+        """Wait for causality (enough frames sent and received) and, unless
+        speed is 0, for timing"""
+        async with self.progress:
+            await self.progress.wait_for(lambda: len(self.sent) >= sends_before
+                                         and self.delivered >= recvs_before)
+        if not self.speed:
+            await asyncio.sleep(0)
+            return
+        if sends_before:
+            anchor_replay = self.send_times[sends_before - 1]
+            anchor_recorded = self.recorded_sends[sends_before - 1][0]
+        else:
+            anchor_replay, anchor_recorded = self.start, 0.0
+        delay = anchor_replay + (timestamp - anchor_recorded) / self.speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send(self, message):
+        self.sent.append(message)
+        self.send_times.append(time.monotonic())
+        async with self.progress:
+            self.progress.notify_all()
+
+    async def recv(self):
+        if not self.received:
+            # Nothing left to deliver; park until the replay is torn down
+            await asyncio.Future()
+        # Only taken off the queue once released, so a cancelled recv() loses nothing
+        sends_before, timestamp, frame = self.received[0]
+        await self._wait_until_released(sends_before, timestamp)
+        self.received.popleft()
+        self.delivered += 1
+        async with self.progress:
+            self.progress.notify_all()
+        if not self.received:
+            self.exhausted.set()
+        return frame
+
+    async def feed_microphone(self, system):
+        for sends_before, recvs_before, timestamp, pcm in self.mic_blocks:
+            await self._wait_until_released(sends_before, timestamp, recvs_before)
+            indata = np.frombuffer(pcm, dtype=np.int16).reshape(-1, 1)
+            system.audio_callback(indata, len(indata), None, None)
+
+    def attach(self, system):
+        """Point the system's audio and connection at this replay"""
+        replayer = self
+
+        class _Connection:
+            async def __aenter__(self):
+                return replayer
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        system.audio_backend = NullBackend()
+        system.connect = lambda: _Connection()
+        system.endpoints = None  # replay a single connection, never a race
+
+    async def run(self, system, timeout=None):
+        """Replay the recording through system.run() and return a report"""
+        self.progress = asyncio.Condition()
+        self.exhausted = asyncio.Event()
+        if not self.received:
+            self.exhausted.set()
+        self.start = time.monotonic()
+        self.attach(system)
+
+        run_task = asyncio.create_task(system.run())
+        feeder = asyncio.create_task(self.feed_microphone(system))
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(feeder, self.exhausted.wait()), timeout)
+            # Let the system finish handling the last frame before tearing down
+            await asyncio.sleep(0.1)
+        except asyncio.TimeoutError:
+            print("Replay timed out before the recording was fully consumed")
+        finally:
+            for task in (feeder, run_task):
+                task.cancel()
+            await asyncio.gather(feeder, run_task, return_exceptions=True)
+        return self.report(system, time.monotonic() - self.start)
+
+    def report(self, system, wall_time):
+        recorded_types = [_frame_type(frame) for _, frame in self.recorded_sends]
+        replayed_types = [_frame_type(frame) for frame in self.sent]
+        divergence = next(
+            (i for i, (a, b) in enumerate(zip(recorded_types, replayed_types)) if a != b), None)
+        recorded_duration = max(
+            [t for _, _, t, _ in self.mic_blocks] + [t for _, t, _ in self.received] + [0.0])
+        output = system.streams.get('output')
+        return {
+            "recorded_seconds": recorded_duration,
+            "replay_seconds": wall_time,
+            "frames_sent": len(self.sent),
+            "frames_recorded_sent": len(self.recorded_sends),
+            "first_divergence": divergence,
+            "samples_played": getattr(output, "samples_written", 0),
+        }
+
+
+def _frame_type(frame):
+    if isinstance(frame, bytes):
+        return "<binary>"
+    try:
+        return json.loads(frame).get("type")
+    except ValueError:
+        return None
+
+
+def load_system(persona):
+    """Build a conversation system without requiring real credentials"""
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "replay")
+    os.environ.pop("SESSION_RECORD", None)  # never overwrite a recording while replaying it
+    return create_system(persona, audio_backend=NullBackend())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded conversation session")
+    parser.add_argument("recording")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="assistant")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="timing multiplier; 0 replays as fast as possible")
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--trace", action="store_true", help="enable per-turn latency tracing")
+    args = parser.parse_args(argv)
+
+    system = load_system(args.persona)
+    if args.trace:
+        system.tracer.enabled = True
+    replayer = SessionReplayer(args.recording, speed=args.speed)
+    report = asyncio.run(replayer.run(system, timeout=args.timeout))
+
+    print("\n=== Replay report ===")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if args.trace:
+        for stage, stats in system.tracer.summary().items():
+            print(f"{stage}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Speculative early commit of client-VAD turns.
+
+The client-side VAD waits ``max_silence_seconds`` (800 ms) of quiet before it
+sends a turn. With SPECULATIVE_COMMIT=1 the utterance is committed and
+response.create is sent once SPECULATIVE_SILENCE_MS (default 250) of quiet
+has followed enough speech. The reply's audio is held back, not played, until
+the full silence window confirms the turn (a hit) and is then played at once.
+If the caller speaks again first (a miss) the response is cancelled and the
+speculative user and assistant items are deleted from the conversation; the
+whole utterance is sent as usual once the caller really stops.
+
+Latency saved on a hit is how much earlier the first reply audio is ready
+than it would have been had response.create been sent at confirmation.
+"""
+import os
+
+from .latency_tracing import LatencyHistogram
+
+
+class SpeculativeCommit:
+    """Settings and hit/miss accounting for speculative turns"""
+    def __init__(self, enabled=False, silence_seconds=0.25):
+        self.enabled = enabled
+        self.silence_seconds = silence_seconds
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved = LatencyHistogram()
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.getenv("SPECULATIVE_COMMIT") == "1",
+                   silence_seconds=float(os.getenv("SPECULATIVE_SILENCE_MS", "250")) / 1000)
+
+    def observe_hit(self, sent, confirmed, first_audio):
+        """Count a confirmed turn; ``first_audio`` is None if no audio arrived"""
+        self.hits += 1
+        if first_audio is not None:
+            # Without speculation the reply would start ttfa after confirmation
+            ttfa = first_audio - sent
+            self.saved.observe(confirmed + ttfa - max(confirmed, first_audio))
+
+    def metrics(self):
+        saved = self.saved.summary()
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / self.attempts if self.attempts else None,
+            "saved_p50_ms": saved["p50"] * 1000 if saved["p50"] is not None else None,
+            "saved_total_s": saved["sum"],
+        }
+
+    def log_line(self):
+        stats = self.metrics()
+        rate = stats["hit_rate"]
+        p50 = stats["saved_p50_ms"]
+        return (f"Speculation | {stats['hits']}/{stats['attempts']} hits"
+                f"{'' if rate is None else f' ({rate:.0%})'}, {stats['misses']} cancelled | "
+                f"saved p50 {'-' if p50 is None else f'{p50:.0f} ms'}, "
+                f"total {stats['saved_total_s']:.2f} s")
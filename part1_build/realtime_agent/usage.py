@@ -0,0 +1,163 @@
+"""Per-call token, audio and cost accounting from response.done usage.
+
+Each call keeps a ``CallUsage``: responses and cancellations, input/output
+text and audio tokens from every ``response.done`` usage block, tokens spent
+on responses that were cancelled, and seconds of audio uploaded and played.
+When the call ends it is folded into the process-wide ``UsageLedger``, which
+keeps totals per persona and per UTC hour for capacity planning, and written
+to the audit log as a ``call_usage`` event with the customer, if known.
+
+Set USAGE_REPORT to a path to rewrite the rollups after every call, as JSON
+or, for a ``.prom`` path, as Prometheus counters. Costs use USAGE_PRICES, US
+dollars per million tokens (default
+``text_in=5,text_out=20,audio_in=100,audio_out=200``).
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+TOKEN_KINDS = ("input_text", "input_audio", "output_text", "output_audio")
+DEFAULT_PRICES = "text_in=5,text_out=20,audio_in=100,audio_out=200"
+_PRICE_KEYS = {"text_in": "input_text", "audio_in": "input_audio",
+               "text_out": "output_text", "audio_out": "output_audio"}
+
+
+def parse_prices(spec):
+    """``text_in=5,audio_out=200`` -> dollars per token by token kind"""
+    prices = dict.fromkeys(TOKEN_KINDS, 0.0)
+    for entry in spec.split(","):
+        name, _, value = entry.partition("=")
+        if name.strip() not in _PRICE_KEYS:
+            raise ValueError(f"Unknown USAGE_PRICES entry: {entry!r}")
+        prices[_PRICE_KEYS[name.strip()]] = float(value) / 1_000_000
+    return prices
+
+
+class CallUsage:
+    """Counters for one call; plain attribute updates on the hot path"""
+    def __init__(self, prices):
+        self.prices = prices
+        self.responses = 0
+        self.cancelled = 0
+        self.tokens = dict.fromkeys(TOKEN_KINDS, 0)
+        self.cancelled_tokens = 0
+        self.uploaded_seconds = 0.0
+        self.played_seconds = 0.0
+
+    def observe_response(self, response):
+        """Add the usage block of one response.done"""
+        self.responses += 1
+        usage = response.get("usage") or {}
+        inputs = usage.get("input_token_details") or {}
+        outputs = usage.get("output_token_details") or {}
+        self.tokens["input_text"] += inputs.get("text_tokens", 0)
+        self.tokens["input_audio"] += inputs.get("audio_tokens", 0)
+        self.tokens["output_text"] += outputs.get("text_tokens", 0)
+        self.tokens["output_audio"] += outputs.get("audio_tokens", 0)
+        if response.get("status") == "cancelled":
+            self.cancelled += 1
+            self.cancelled_tokens += usage.get("total_tokens", 0)
+
+    def cost(self):
+        return sum(self.tokens[kind] * self.prices[kind] for kind in TOKEN_KINDS)
+
+    def summary(self):
+        return {
+            "responses": self.responses,
+            "cancelled": self.cancelled,
+            **{f"{kind}_tokens": count for kind, count in self.tokens.items()},
+            "cancelled_tokens": self.cancelled_tokens,
+            "uploaded_seconds": round(self.uploaded_seconds, 3),
+            "played_seconds": round(self.played_seconds, 3),
+            "cost_usd": round(self.cost(), 6),
+        }
+
+    def log_line(self):
+        stats = self.summary()
+        return (f"Usage | {stats['responses']} responses, {stats['cancelled']} cancelled "
+                f"({stats['cancelled_tokens']} tokens) | in {stats['input_text_tokens']} text/"
+                f"{stats['input_audio_tokens']} audio tokens, out {stats['output_text_tokens']} "
+                f"text/{stats['output_audio_tokens']} audio | audio up "
+                f"{stats['uploaded_seconds']:.1f} s, played {stats['played_seconds']:.1f} s | "
+                f"${stats['cost_usd']:.4f}")
+
+
+class UsageLedger:
+    """Rolls finished calls up per persona and per UTC hour"""
+    def __init__(self, prices=None, report_path=None, max_hours=168):
+        self.prices = prices or parse_prices(DEFAULT_PRICES)
+        self.report_path = report_path
+        self.max_hours = max_hours
+        self.by_persona = {}
+        self.by_hour = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(prices=parse_prices(os.getenv("USAGE_PRICES", DEFAULT_PRICES)),
+                   report_path=os.getenv("USAGE_REPORT"))
+
+    def _add(self, totals, usage, new_call):
+        totals["calls"] = totals.get("calls", 0) + new_call
+        for name, value in usage.summary().items():
+            totals[name] = totals.get(name, 0) + value
+
+    def new_call(self):
+        return CallUsage(self.prices)
+
+    def record(self, usage, persona, duration=None, new_call=True):
+        """Fold one finished call into the rollups; a call resumed from another
+        worker adds its usage without counting as another call"""
+        self._add(self.by_persona.setdefault(persona, {}), usage, new_call)
+        hour = time.strftime("%Y-%m-%dT%H:00Z", time.gmtime())
+        totals = self.by_hour.setdefault(hour, {})
+        self._add(totals, usage, new_call)
+        if duration is not None:
+            totals["call_seconds"] = totals.get("call_seconds", 0) + duration
+        while len(self.by_hour) > self.max_hours:
+            self.by_hour.popitem(last=False)
+        if self.report_path:
+            self.export(self.report_path)
+
+    def metrics(self):
+        return {"by_persona": self.by_persona, "by_hour": dict(self.by_hour)}
+
+    def export_prometheus(self, path):
+        """Token, response and audio counters per persona"""
+        lines = ["# TYPE realtime_usage_tokens_total counter"]
+        for persona, totals in self.by_persona.items():
+            for kind in TOKEN_KINDS:
+                lines.append(f'realtime_usage_tokens_total{{persona="{persona}",kind="{kind}"}} '
+                             f'{totals[f"{kind}_tokens"]}')
+        for name in ("calls", "responses", "cancelled", "cancelled_tokens",
+                     "uploaded_seconds", "played_seconds", "cost_usd"):
+            lines.append(f"# TYPE realtime_usage_{name}_total counter")
+            for persona, totals in self.by_persona.items():
+                lines.append(f'realtime_usage_{name}_total{{persona="{persona}"}} {totals[name]}')
+        self._write(path, "\n".join(lines) + "\n")
+
+    def export(self, path):
+        """Write the rollups in the format implied by the file extension"""
+        if path.endswith(".prom"):
+            self.export_prometheus(path)
+        else:
+            self._write(path, json.dumps(self.metrics(), indent=2))
+
+    @staticmethod
+    def _write(path, text):
+        # Write to a temp file and rename so readers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+_shared = None
+
+
+def shared_usage_ledger():
+    """Process-wide ledger so every call lands in the same rollups"""
+    global _shared
+    if _shared is None:
+        _shared = UsageLedger.from_env()
+    return _shared
@@ -0,0 +1,69 @@
+import queue
+import threading
+import wave
+
+
+class StreamingWavWriter:
+    """Write-behind WAV sink for streamed pcm16 audio.
+
+    ``write()`` only enqueues the chunk; a background thread appends it to the
+    file, so the event loop never waits on disk. At most ``max_pending``
+    chunks are queued: if the disk stalls, further chunks are dropped and
+    counted in ``dropped_chunks``, so memory stays bounded however long the
+    call is. The RIFF/data chunk sizes are patched when the writer is closed.
+    """
+    def __init__(self, path, sample_rate=24000, channels=1, sample_width=2,
+                 max_pending=256):
+        self.path = path
+        self.frames_written = 0
+        self.dropped_chunks = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(sample_width)
+        self._wav.setframerate(sample_rate)
+        self._frame_size = channels * sample_width
+        self._thread = threading.Thread(target=self._drain, name="wav-writer", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self.error:
+                continue  # keep draining so write() and close() never wait on a dead writer
+            try:
+                # writeframesraw leaves the header alone; close() patches the sizes
+                self._wav.writeframesraw(chunk)
+                self.frames_written += len(chunk) // self._frame_size
+            except Exception as e:
+                self.error = e
+
+    def write(self, pcm_bytes):
+        """Queue raw pcm16 bytes (or anything exposing the buffer protocol)"""
+        try:
+            self._queue.put_nowait(bytes(pcm_bytes))
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    def close(self):
+        """Flush pending chunks, patch the header and close the file"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._wav.close()
+        if self.error:
+            print(f"Error writing {self.path}: {self.error}")
+        if self.dropped_chunks:
+            print(f"{self.path}: {self.dropped_chunks} chunks dropped while the disk was behind")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
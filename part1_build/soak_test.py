@@ -0,0 +1,225 @@
+"""Long-call soak test for the conversation systems.
+
+Drives any realtime_agent persona headless against a
+local MockRealtimeServer with a synthetic caller that alternates speech and
+silence, at an accelerated speed. At regular (simulated) intervals it samples
+RSS, live Python object count, event-loop lag (p90 of the interval),
+per-turn response latency and the size of the AudioProcessor buffers
+between turns, then fits a line through the steady-state samples and fails
+if any of them trends upward over the run. The run also fails if the
+conversation system stops before the end, or if a metric has fewer than
+MIN_SAMPLES steady-state samples to judge (reported as inconclusive).
+
+    python soak_test.py --duration 7200 --speed 20 --persona insurance
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from mock_realtime_server import MockRealtimeServer
+from realtime_agent.audio_backends import NullBackend
+from realtime_agent.personas import PERSONAS, create_system
+
+SAMPLE_RATE = 24000
+BLOCK_SIZE = 4800
+
+# Absolute changes below these floors are treated as noise, whatever the ratio
+DRIFT_FLOORS = {
+    "rss_mb": 5.0,
+    "objects": 2000,
+    "loop_lag_ms": 5.0,
+    "turn_latency_ms": 20.0,
+    "buffered_bytes": SAMPLE_RATE * 2,
+}
+# Fewer steady-state samples than this cannot show a trend
+MIN_SAMPLES = 8
+
+
+def rss_mb():
+    """Current resident set size; falls back to peak RSS where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def buffered_bytes(processor):
+    """Total size of the buffers the AudioProcessor holds between turns"""
+    return sum(len(value) for value in vars(processor).values()
+               if isinstance(value, (list, bytearray)))
+
+
+def load_system(persona, url):
+    system = create_system(persona, url=url, audio_backend=NullBackend())
+    system.tracer.enabled = True
+    return system
+
+
+class SyntheticCaller:
+    """Feeds alternating speech/silence blocks into the system's audio callback"""
+    def __init__(self, system, speed, seed=0):
+        self.system = system
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.utterances = 0
+        self.idle_buffers = []  # buffered_bytes() at each turn boundary
+
+    def _block(self, amplitude):
+        return (self.rng.standard_normal((BLOCK_SIZE, 1)) * amplitude).astype(np.int16)
+
+    async def _feed(self, seconds, amplitude):
+        for _ in range(max(1, int(seconds * SAMPLE_RATE / BLOCK_SIZE))):
+            self.system.audio_callback(self._block(amplitude), BLOCK_SIZE, None, None)
+            await asyncio.sleep(BLOCK_SIZE / SAMPLE_RATE / self.speed)
+
+    async def run(self):
+        while True:
+            # Wait for the agent to finish talking before taking the next turn
+            while self.system.audio_processor.is_speaking:
+                await self._feed(0.2, 20)
+            # The previous turn is over: nothing should be left buffered but leaks
+            self.idle_buffers.append(buffered_bytes(self.system.audio_processor))
+            await self._feed(self.random.uniform(0.5, 3.0), 3000)
+            self.utterances += 1
+            await self._feed(self.random.uniform(1.0, 2.5), 20)
+
+
+async def measure_loop_lag(samples, interval=0.05):
+    """Continuously record how late a sleeping task wakes up"""
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        samples.append((time.monotonic() - start - interval) * 1000)
+
+
+def drift(values, floor):
+    """Change over the run along a least-squares line through the values and
+    its ratio to the fitted start value, or None with too few values to tell"""
+    if len(values) < MIN_SAMPLES:
+        return None
+    slope, first = np.polyfit(np.arange(len(values)), values, 1)
+    change = slope * (len(values) - 1)
+    if change <= floor:
+        return change, 0.0
+    return change, change / max(abs(first), floor)
+
+
+async def soak(args):
+    server = MockRealtimeServer(response_seconds=args.response_seconds, speed=args.speed)
+    url = server.start_in_thread()
+    system = load_system(args.persona, url)
+    caller = SyntheticCaller(system, args.speed, seed=args.seed)
+
+    lag_samples = []
+    run_task = asyncio.create_task(system.run())
+    caller_task = asyncio.create_task(caller.run())
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples))
+
+    samples = []
+    latency_hist = system.tracer.histograms["response"]
+    seen_turns = 0
+    sample_interval = args.sample_interval / args.speed
+    steps = int(args.duration / args.sample_interval)
+    output = open(args.output, "w") if args.output else None
+    stopped_early = False
+    try:
+        for step in range(steps):
+            await asyncio.sleep(sample_interval)
+            if run_task.done():
+                error = "cancelled" if run_task.cancelled() else repr(run_task.exception())
+                print(f"Conversation system stopped early after {step * args.sample_interval:.0f} "
+                      f"simulated seconds: {error}")
+                stopped_early = True
+                break
+            new_turns = latency_hist.count - seen_turns
+            seen_turns = latency_hist.count
+            recent = list(latency_hist.samples)[-new_turns:] if new_turns else []
+            lags = lag_samples[:]
+            lag_samples.clear()
+            idle = caller.idle_buffers[:]
+            caller.idle_buffers.clear()
+            sample = {
+                "simulated_seconds": (step + 1) * args.sample_interval,
+                "rss_mb": rss_mb(),
+                "objects": len(gc.get_objects()),
+                # Single late wakeups are noise; the interval's p90 shows a trend
+                "loop_lag_ms": float(np.percentile(lags, 90)) if lags else 0.0,
+                "turn_latency_ms": statistics.median(recent) * 1000 if recent else None,
+                "buffered_bytes": statistics.median(idle) if idle else None,
+                "turns": seen_turns,
+            }
+            samples.append(sample)
+            if output:
+                output.write(json.dumps(sample) + "\n")
+                output.flush()
+            if args.verbose:
+                print(sample)
+    finally:
+        for task in (caller_task, lag_task, run_task):
+            task.cancel()
+        await asyncio.gather(caller_task, lag_task, run_task, return_exceptions=True)
+        server.stop_thread()
+        if output:
+            output.close()
+
+    status = report(samples, args.threshold, args.warmup)
+    if stopped_early:
+        print("FAIL: the conversation system stopped before the end of the run")
+        return 1
+    return status
+
+
+def report(samples, threshold, warmup):
+    steady = samples[int(len(samples) * warmup):]
+    print(f"\n=== Soak report: {len(samples)} samples, "
+          f"{samples[-1]['turns'] if samples else 0} turns ===")
+    failed = False
+    for metric, floor in DRIFT_FLOORS.items():
+        values = [s[metric] for s in steady if s[metric] is not None]
+        result = drift(values, floor)
+        if result is None:
+            failed = True
+            print(f"{metric:<18} {len(values)} samples, need {MIN_SAMPLES}  INCONCLUSIVE")
+            continue
+        change, relative = result
+        status = "FAIL" if relative > threshold else "ok"
+        failed = failed or status == "FAIL"
+        print(f"{metric:<18} change {change:>12.2f}  drift {relative:>7.1%}  {status}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-call soak test")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="insurance")
+    parser.add_argument("--duration", type=float, default=3600,
+                        help="simulated call length in seconds")
+    parser.add_argument("--speed", type=float, default=10.0,
+                        help="how many times faster than real time to run")
+    parser.add_argument("--sample-interval", type=float, default=60.0,
+                        help="simulated seconds between samples")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="maximum allowed relative upward drift")
+    parser.add_argument("--warmup", type=float, default=0.1,
+                        help="fraction of samples ignored at the start")
+    parser.add_argument("--response-seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write samples as JSON lines to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    return asyncio.run(soak(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
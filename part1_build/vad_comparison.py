@@ -0,0 +1,204 @@
+"""Side-by-side turn latency of client-side VAD and server VAD.
+
+Runs the same scripted caller through a ConversationSystem in each mode
+against mock_realtime_server.py (which emulates server_vad) and measures,
+from the caller's point of view:
+
+- turn latency: the last block of the caller's utterance to the first
+  response audio written to the output
+- barge-in latency: the first block of speech over the agent to the moment
+  its audio is dropped
+
+Client mode waits for ``max_silence_seconds`` of quiet in 200 ms blocks and
+then uploads the utterance; server mode streams every block as it is captured
+and reacts to speech_started/speech_stopped.
+
+    python vad_comparison.py --turns 8 --barge-ins 4
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from load_test import start_server
+from realtime_agent.audio_backends import AudioBackend, NullInputStream, NullOutputStream
+from realtime_agent.loop_lag import LoopLagMonitor
+from realtime_agent.personas import PERSONAS, create_system
+
+SAMPLE_RATE = 24000
+BLOCK_SIZE = 4800
+BLOCK_SECONDS = BLOCK_SIZE / SAMPLE_RATE
+MODES = ("client", "server")
+
+
+class TimedOutputStream(NullOutputStream):
+    """Remembers when each chunk of response audio was written"""
+    def __init__(self):
+        super().__init__()
+        self.write_times = []
+
+    def write(self, audio):
+        self.write_times.append(time.monotonic())
+        return super().write(audio)
+
+
+class TimedBackend(AudioBackend):
+    name = "timed"
+
+    def open_input(self, callback, samplerate, channels, blocksize):
+        return NullInputStream()
+
+    def open_output(self, samplerate, channels):
+        return TimedOutputStream()
+
+
+class ScriptedCaller:
+    """Feeds capture blocks in real time and times the agent's reactions"""
+    def __init__(self, system, seed=0, timeout=10.0):
+        self.system = system
+        self.rng = np.random.default_rng(seed)
+        self.timeout = timeout
+        self._next_block = None
+
+    async def _block(self, amplitude):
+        """Deliver one block on the capture clock; return its delivery time"""
+        if self._next_block is None:
+            self._next_block = time.monotonic()
+        await asyncio.sleep(max(0.0, self._next_block - time.monotonic()))
+        block = (self.rng.standard_normal((BLOCK_SIZE, 1)) * amplitude).astype(np.int16)
+        self.system.audio_callback(block, BLOCK_SIZE, None, None)
+        self._next_block += BLOCK_SECONDS
+        return time.monotonic()
+
+    async def _speak(self, seconds):
+        delivered = None
+        for _ in range(int(seconds / BLOCK_SECONDS)):
+            delivered = await self._block(3000)
+        return delivered
+
+    async def _quiet_until(self, condition):
+        deadline = time.monotonic() + self.timeout
+        while not condition() and time.monotonic() < deadline:
+            await self._block(20)
+        return condition()
+
+    def _writes_after(self, moment):
+        return [t for t in self.system.streams['output'].write_times if t > moment]
+
+    @staticmethod
+    async def _when(condition):
+        while not condition():
+            await asyncio.sleep(0.002)
+        return time.monotonic()
+
+    def _idle(self):
+        return not self.system._response_active and not self.system.audio_processor.is_speaking
+
+    async def turn(self):
+        """One utterance; returns seconds until the reply was heard, or None"""
+        return await self.reply_after(await self._speak(1.2))
+
+    async def reply_after(self, speech_end):
+        """Stay quiet until the reply is heard; returns its latency or None"""
+        heard = await self._quiet_until(lambda: self._writes_after(speech_end))
+        latency = self._writes_after(speech_end)[0] - speech_end if heard else None
+        await self._quiet_until(self._idle)
+        for _ in range(5):
+            await self._block(20)
+        return latency
+
+    async def barge_in(self):
+        """Talk over the agent; returns seconds until its audio was dropped, or None"""
+        speech_end = await self._speak(1.2)
+        if not await self._quiet_until(lambda: len(self._writes_after(speech_end)) >= 3):
+            return None
+        started = await self._block(3000)
+        watcher = asyncio.create_task(self._when(lambda: self.system._discard_audio))
+        for _ in range(5):
+            await self._block(3000)
+        try:
+            dropped = await asyncio.wait_for(watcher, 1.0) - started
+        except asyncio.TimeoutError:
+            dropped = None
+        await self._quiet_until(self._idle)
+        for _ in range(5):
+            await self._block(20)
+        return dropped
+
+
+async def measure(mode, url, args):
+    system = create_system(args.persona, url=url, audio_backend=TimedBackend(),
+                           server_vad=mode == "server",
+                           lag_monitor=LoopLagMonitor(enabled=False))
+    caller = ScriptedCaller(system, seed=args.seed)
+    turns, barge_ins = [], []
+    with open(os.devnull, "w") as devnull, \
+            contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+        run_task = asyncio.create_task(system.run())
+        await asyncio.sleep(0.5)
+        try:
+            # Settle the adaptive thresholds on background noise first
+            for _ in range(10):
+                await caller._block(20)
+            for _ in range(args.turns):
+                turns.append(await caller.turn())
+            for _ in range(args.barge_ins):
+                barge_ins.append(await caller.barge_in())
+        finally:
+            run_task.cancel()
+            await asyncio.gather(run_task, return_exceptions=True)
+    return turns, barge_ins
+
+
+def _stats(values):
+    measured = sorted(v * 1000 for v in values if v is not None)
+    if not measured:
+        return None, None, len(values)
+    p95 = measured[min(len(measured) - 1, int(0.95 * len(measured)))]
+    return statistics.median(measured), p95, len(values) - len(measured)
+
+
+async def compare(args):
+    server, url = start_server(argparse.Namespace(speed=1.0,
+                                                  response_seconds=args.response_seconds))
+    results = {}
+    try:
+        for mode in MODES:
+            results[mode] = await measure(mode, url, args)
+            print(f"{mode} VAD measured")
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\n{'mode':<8} {'turn p50':>9} {'turn p95':>9} {'missed':>6} "
+          f"{'barge-in p50':>13} {'barge-in p95':>13} {'missed':>6}")
+    for mode, (turns, barge_ins) in results.items():
+        turn_p50, turn_p95, turn_missed = _stats(turns)
+        barge_p50, barge_p95, barge_missed = _stats(barge_ins)
+
+        def ms(value):
+            return f"{value:.0f} ms" if value is not None else "-"
+        print(f"{mode:<8} {ms(turn_p50):>9} {ms(turn_p95):>9} {turn_missed:>6} "
+              f"{ms(barge_p50):>13} {ms(barge_p95):>13} {barge_missed:>6}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Client VAD vs server VAD latency")
+    parser.add_argument("--persona", choices=sorted(PERSONAS), default="assistant")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--barge-ins", type=int, default=4)
+    parser.add_argument("--response-seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    return asyncio.run(compare(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())